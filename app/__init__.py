@@ -1,34 +1,42 @@
+import logging
 import os
-from copy import deepcopy
+import threading
 from datetime import timedelta
 
-from dmcontent.errors import ContentNotFoundError
 from flask import Flask, request, redirect, session
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
-from werkzeug.local import Local, LocalProxy
+from werkzeug.local import LocalProxy
 
-import dmapiclient
-from dmcontent.content_loader import ContentLoader
 from dmutils import init_app, formats
 from dmutils.timing import logged_duration
 from dmutils.user import User
 from govuk_frontend_jinja.flask_ext import init_govuk_frontend
 
 from config import configs
+from . import concurrency, process_pool, s3_buckets
+from .api_client import RequestCachingDataAPIClient
+from .caching import TTLCache
+from .framework_registry import FrameworkRegistry
+from .manifests import SharedContentLoader
 
 
 csrf = CSRFProtect()
-data_api_client = dmapiclient.DataAPIClient()
+data_api_client = RequestCachingDataAPIClient()
 login_manager = LoginManager()
 
-# we use our own Local for objects we explicitly want to be able to retain between requests but shouldn't
-# share a common object between concurrent threads/contexts
-_local = Local()
-
 # These frameworks pre-date the introduction of the edit_service_as_admin and declaration manifests.
 OLD_FRAMEWORKS_WITH_MISSING_MANIFESTS = ['g-cloud-4', 'g-cloud-5', 'g-cloud-6']
 
+# (question_set, manifest) pairs we make available for every framework
+FRAMEWORK_MANIFESTS = (
+    ('services', 'edit_service_as_admin'),
+    ('declaration', 'declaration'),
+)
+
+# frameworks admins are busiest with get their manifests warmed up first - anything not listed comes last
+MANIFEST_WARM_UP_STATUS_ORDER = ('live', 'open', 'pending', 'standstill')
+
 
 def _log_missing_manifest(application, manifest_name, framework_slug):
     if framework_slug in OLD_FRAMEWORKS_WITH_MISSING_MANIFESTS:
@@ -41,22 +49,78 @@ def _log_missing_manifest(application, manifest_name, framework_slug):
     )
 
 
+def _manifest_warm_up_order(frameworks):
+    return [
+        framework_data['slug'] for framework_data in sorted(
+            frameworks,
+            key=lambda fw: (
+                MANIFEST_WARM_UP_STATUS_ORDER.index(fw['status'])
+                if fw['status'] in MANIFEST_WARM_UP_STATUS_ORDER else len(MANIFEST_WARM_UP_STATUS_ORDER)
+            ),
+        )
+    ]
+
+
+def _warm_up_content_loader(application, content_loader, framework_slugs):
+    with logged_duration(
+        logger=application.logger,
+        message="Warmed up manifests for {framework_count} frameworks in {duration_real}s",
+        log_level=logging.INFO,
+        condition=True,
+    ) as log_context:
+        log_context["framework_count"] = len(framework_slugs)
+        content_loader.warm_up(
+            framework_slugs,
+            on_missing=lambda manifest, framework_slug: _log_missing_manifest(application, manifest, framework_slug),
+        )
+
+
+def _make_primary_content_loader(application):
+    content_loader = SharedContentLoader('app/content')
+
+    snapshot_path = application.config.get('DM_MANIFEST_SNAPSHOT_PATH')
+    if snapshot_path:
+        with logged_duration(
+            logger=application.logger,
+            message=lambda log_context: (
+                "Loaded manifest snapshot {snapshot_path} in {duration_real}s" if log_context["loaded"] else
+                "Manifest snapshot {snapshot_path} missing, unreadable or stale - falling back to loading manifests "
+                "from yaml"
+            ),
+            log_level=logging.INFO,
+            condition=True,
+        ) as log_context:
+            log_context.update(snapshot_path=snapshot_path, loaded=False)
+            log_context["loaded"] = content_loader.load_snapshot(snapshot_path, logger=application.logger)
+
+    return content_loader
+
+
+def _register_framework_manifests(content_loader, frameworks):
+    # manifests are only actually loaded the first time they're asked for, so startup time doesn't grow with the
+    # number of frameworks we know about
+    for framework_data in frameworks:
+        for question_set, manifest in FRAMEWORK_MANIFESTS:
+            content_loader.register_manifest(framework_data['slug'], question_set, manifest)
+
+
 def _make_content_loader_factory(application, frameworks, initial_instance=None):
     # for testing purposes we allow an initial_instance to be provided
-    primary_cl = initial_instance if initial_instance is not None else ContentLoader('app/content')
-    for framework_data in frameworks:
-        try:
-            primary_cl.load_manifest(framework_data['slug'], 'services', 'edit_service_as_admin')
-        except ContentNotFoundError:
-            _log_missing_manifest(application, "edit_service_as_admin", framework_data['slug'])
-        try:
-            primary_cl.load_manifest(framework_data['slug'], 'declaration', 'declaration')
-        except ContentNotFoundError:
-            _log_missing_manifest(application, "declaration", framework_data['slug'])
+    primary_cl = initial_instance if initial_instance is not None else _make_primary_content_loader(application)
+
+    _register_framework_manifests(primary_cl, frameworks)
 
-    # seal primary_cl in a closure by returning a function which will only ever return an independent copy of it.
-    # this is of course only guaranteed when the initial_instance argument wasn't used.
-    return lambda: deepcopy(primary_cl)
+    if application.config.get('DM_WARM_UP_MANIFESTS'):
+        threading.Thread(
+            target=_warm_up_content_loader,
+            args=(application, primary_cl, _manifest_warm_up_order(frameworks)),
+            name="manifest-warm-up",
+            daemon=True,
+        ).start()
+
+    # every thread is handed the same primary_cl - a SharedContentLoader never modifies manifest data once it has been
+    # loaded and gives out fresh ContentManifest objects to be filtered, so there's no need for per-thread copies
+    return lambda: primary_cl
 
 
 def _content_loader_factory():
@@ -66,11 +130,8 @@ def _content_loader_factory():
     raise LookupError("content loader not ready yet: must be initialized & populated by create_app")
 
 
-@logged_duration(message="Spent {duration_real}s in get_content_loader")
 def get_content_loader():
-    if not hasattr(_local, "content_loader"):
-        _local.content_loader = _content_loader_factory()
-    return _local.content_loader
+    return _content_loader_factory()
 
 
 content_loader = LocalProxy(get_content_loader)
@@ -93,13 +154,56 @@ def create_app(config_name):
         login_manager=login_manager,
     )
 
+    framework_registry = FrameworkRegistry(
+        data_api_client,
+        snapshot_path=application.config.get('DM_FRAMEWORKS_SNAPSHOT_PATH'),
+        logger=application.logger,
+    )
+    application.extensions['framework_registry'] = framework_registry
+    application.extensions['frameworks_cache'] = TTLCache('frameworks', application.config['DM_FRAMEWORKS_CACHE_TTL'])
+    application.extensions['signed_urls_cache'] = TTLCache(
+        'signed_urls',
+        application.config['DM_SIGNED_URL_CACHE_TTL'],
+        # entries are 1-tuples of the signed URL, or of None if the key wasn't there - which it might be soon
+        value_ttl=lambda entry: (
+            application.config['DM_SIGNED_URL_CACHE_TTL'] if entry[0] is not None
+            else application.config['DM_S3_MISSING_KEY_CACHE_TTL']
+        ),
+    )
+    application.extensions['communications_listings_cache'] = TTLCache(
+        'communications_listings', application.config['DM_COMMUNICATIONS_LISTINGS_CACHE_TTL']
+    )
+    application.extensions['service_diffs_cache'] = TTLCache(
+        'service_diffs',
+        application.config['DM_SERVICE_DIFFS_CACHE_TTL'],
+        max_size=application.config['DM_SERVICE_DIFFS_CACHE_MAX_SIZE'],
+    )
+    application.extensions['unapproved_updates_pages_cache'] = TTLCache(
+        'unapproved_updates_pages', application.config['DM_UNAPPROVED_UPDATES_PAGES_CACHE_TTL']
+    )
+    concurrency.init_app(application)
+    process_pool.init_app(application)
+    s3_buckets.init_app(application)
+
     # replace placeholder _content_loader_factory with properly initialized one
     global _content_loader_factory
     _content_loader_factory = _make_content_loader_factory(
         application,
-        data_api_client.find_frameworks().get('frameworks'),
+        framework_registry.bootstrap(),
     )
 
+    primary_cl = _content_loader_factory()
+    framework_registry.subscribe(lambda new_frameworks: _register_framework_manifests(primary_cl, new_frameworks))
+    # if we bootstrapped from a snapshot we haven't actually heard from the API yet - catch up with it without
+    # holding up startup
+    if application.config.get('DM_FRAMEWORK_REGISTRY_POLL_INTERVAL'):
+        framework_registry.start_polling(
+            application.config['DM_FRAMEWORK_REGISTRY_POLL_INTERVAL'],
+            refresh_now=framework_registry.bootstrapped_from_snapshot,
+        )
+    elif framework_registry.bootstrapped_from_snapshot:
+        framework_registry.start_background_refresh()
+
     from .metrics import metrics as metrics_blueprint, gds_metrics
     from .main import main as main_blueprint
     from .main import public as public_blueprint
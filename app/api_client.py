@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from copy import deepcopy
+from urllib.parse import parse_qs, urlsplit
+
+from dmapiclient import DataAPIClient
+from flask import g, has_app_context
+
+
+class RequestCachingDataAPIClient(DataAPIClient):
+    """A DataAPIClient which remembers the responses to GET requests for the rest of the current request.
+
+    Views and the helpers they call often end up asking for the same resource more than once - this makes the second
+    and later asks free. Responses are remembered on `flask.g`, so nothing outlives the request that fetched it, and
+    each caller gets its own copy of a response to do what it likes with. Any other kind of request (i.e. one which
+    might change something) makes us forget everything we remembered, so we can never serve a response from before a
+    change we made ourselves.
+
+    Later pages of listings (anything asked for with a ``page``) aren't remembered: those are almost always being
+    walked through by a `*_iter` method, which never asks for the same page twice, and holding on to every page of a
+    long listing until the end of the request would be a waste of memory. Views streaming through more than that
+    (e.g. a lookup per row of an export) can turn remembering off for a while with `request_memo_disabled`.
+
+    Outside an app context this behaves exactly like a plain DataAPIClient.
+    """
+
+    def _get(self, url, params=None, **kwargs):
+        if kwargs or not has_app_context() or g.get('_data_api_get_memo_disabled'):
+            return super()._get(url, params, **kwargs)
+
+        memo_key = self._build_url(url, params)
+        if "page" in parse_qs(urlsplit(memo_key).query):
+            return super()._get(url, params)
+
+        memo = g.setdefault('_data_api_get_memo', {})
+        if memo_key not in memo:
+            memo[memo_key] = super()._get(url, params)
+
+        return deepcopy(memo[memo_key])
+
+    def _forget_gets(self):
+        if has_app_context():
+            # emptied in place rather than dropped, as calls made by `concurrently` share the request's memo through
+            # their own copy of `g`
+            g.get('_data_api_get_memo', {}).clear()
+
+    def _post(self, *args, **kwargs):
+        try:
+            return super()._post(*args, **kwargs)
+        finally:
+            self._forget_gets()
+
+    def _put(self, *args, **kwargs):
+        try:
+            return super()._put(*args, **kwargs)
+        finally:
+            self._forget_gets()
+
+    def _patch(self, *args, **kwargs):
+        try:
+            return super()._patch(*args, **kwargs)
+        finally:
+            self._forget_gets()
+
+    def _delete(self, *args, **kwargs):
+        try:
+            return super()._delete(*args, **kwargs)
+        finally:
+            self._forget_gets()
+
+
+@contextmanager
+def request_memo_disabled():
+    """Don't remember any GET responses made inside this block
+
+    For views streaming through more data than we'd want to hold on to for the rest of the request. This covers calls
+    made by `concurrently` from inside the block too, as they start with a copy of the request's `g`.
+    """
+    g._data_api_get_memo_disabled = True
+    try:
+        yield
+    finally:
+        g.pop('_data_api_get_memo_disabled', None)
@@ -0,0 +1,47 @@
+;(function() {
+
+  "use strict";
+
+  // Fetches the diffs of each changed section of a service listed on its service updates page - when the section
+  // scrolls into view or, failing that, when its "Show changed answers" link is followed
+  var DiffSections = function() {
+
+    var loadSection = function(section) {
+      var $section = $(section);
+      if ($section.data('loading')) {
+        return;
+      }
+      $section.data('loading', true);
+
+      $.get($section.data('diff-section-url')).done(function(tablesHtml) {
+        $section.find('.diff-section-tables').html(tablesHtml);
+      }).fail(function() {
+        $section.data('loading', false);
+      });
+    };
+
+    var $sections = $('.diff-section[data-diff-section-url]');
+
+    $sections.on('click', '.diff-section-tables a', function(event) {
+      event.preventDefault();
+      loadSection(event.delegateTarget);
+    });
+
+    if ('IntersectionObserver' in window) {
+      var observer = new IntersectionObserver(function(entries) {
+        $.each(entries, function(index, entry) {
+          if (entry.isIntersecting) {
+            observer.unobserve(entry.target);
+            loadSection(entry.target);
+          }
+        });
+      }, { rootMargin: '200px 0px' });
+
+      $sections.each(function(index, section) {
+        observer.observe(section);
+      });
+    }
+  };
+
+  DiffSections();
+})();
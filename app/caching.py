@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+from gds_metrics.metrics import Counter
+
+
+CACHE_LOOKUPS_TOTAL = Counter(
+    'admin_frontend_cache_lookups_total',
+    'Lookups in in-process caches, by cache and whether they were served from the cache',
+    ['cache', 'result'],
+)
+
+
+class TTLCache:
+    """A process-wide cache whose entries expire ``ttl`` seconds after they were loaded.
+
+    Safe to share between threads. Lookups missing the same key at the same time are coalesced ("single flight"), so
+    however many requests arrive while an entry is being (re)loaded, only one of them does the loading and the rest
+    wait for its result. Hits and misses are counted in the ``admin_frontend_cache_lookups_total`` metric, labelled
+    with the cache's ``name``.
+
+    A ``ttl`` of zero (or less) disables caching: every lookup calls the loader. If some values should be kept for
+    less time than others, ``value_ttl`` can be given: a function of a loaded value returning how long to keep that
+    value for (capped at ``ttl``). If ``max_size`` is given, no more than that many entries are kept, the least
+    recently used being dropped to make room.
+    """
+
+    def __init__(self, name, ttl, clock=time.monotonic, value_ttl=None, max_size=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._value_ttl = value_ttl
+        self._lock = threading.Lock()
+        # mapping of key to (value, expiry time), least recently used first
+        self._entries = OrderedDict()
+        # mapping of key to an Event set once the load in progress for that key has finished
+        self._loads_in_flight = {}
+        # bumped by every `invalidate` so a load started before an invalidation doesn't go on to store a stale value
+        self._invalidations = 0
+
+    def get(self, key, load):
+        """Return the cached value for ``key``, calling ``load()`` to (re)populate it if it's missing or expired
+
+        A ``load()`` returning ``None`` isn't cached.
+        """
+        if self.ttl <= 0:
+            return load()
+
+        value = self._get_fresh(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            load_in_flight = self._loads_in_flight.get(key)
+            if load_in_flight is None:
+                self._loads_in_flight[key] = threading.Event()
+
+        if load_in_flight is not None:
+            load_in_flight.wait()
+            value = self._get_fresh(key)
+            if value is not None:
+                return value
+            # the load we were waiting on failed or was invalidated - do our own, without holding anyone else up
+            CACHE_LOOKUPS_TOTAL.labels(cache=self.name, result='miss').inc()
+            return load()
+
+        CACHE_LOOKUPS_TOTAL.labels(cache=self.name, result='miss').inc()
+        try:
+            invalidations = self._invalidations
+            value = load()
+            with self._lock:
+                if value is not None and invalidations == self._invalidations:
+                    ttl = self.ttl if self._value_ttl is None else min(self.ttl, self._value_ttl(value))
+                    self._entries[key] = (value, self._clock() + ttl)
+                    if self.max_size is not None:
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_size:
+                            self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._loads_in_flight.pop(key).set()
+
+    def invalidate(self, key=None):
+        """Drop the entry for ``key``, or every entry if no ``key`` is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._invalidations += 1
+
+    def invalidate_matching(self, predicate):
+        """Drop the entries for every key for which ``predicate(key)`` is true"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+            self._invalidations += 1
+
+    def _get_fresh(self, key):
+        value, expires_at = self._entries.get(key, (None, None))
+        if value is None or expires_at <= self._clock():
+            return None
+
+        if self.max_size is not None:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+        CACHE_LOOKUPS_TOTAL.labels(cache=self.name, result='hit').inc()
+        return value
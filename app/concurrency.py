@@ -0,0 +1,129 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import _app_ctx_stack, _request_ctx_stack, current_app, g
+
+
+EXECUTOR_EXTENSION_KEY = 'concurrent_calls_executor'
+MAX_IN_FLIGHT_EXTENSION_KEY = 'concurrent_calls_max_in_flight'
+
+_worker_state = threading.local()
+
+
+def init_app(application):
+    """Give ``application`` a bounded pool of DM_CONCURRENT_CALLS_MAX_WORKERS threads for `concurrently` to use
+
+    With a limit of 1 (or less) no pool is created and `concurrently` just makes its calls one after another. No one
+    `concurrently` (or `iter_concurrently`) has more than DM_CONCURRENT_CALLS_MAX_IN_FLIGHT of its calls on the pool at
+    once (if that's set), so a view making hundreds of calls can't keep every other request's calls waiting.
+    """
+    max_workers = application.config['DM_CONCURRENT_CALLS_MAX_WORKERS']
+    application.extensions[EXECUTOR_EXTENSION_KEY] = (
+        ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="concurrent-calls") if max_workers > 1 else None
+    )
+    application.extensions[MAX_IN_FLIGHT_EXTENSION_KEY] = (
+        application.config.get('DM_CONCURRENT_CALLS_MAX_IN_FLIGHT') or max(max_workers, 1)
+    )
+
+
+def concurrently(*calls):
+    """Make each of ``calls`` (callables taking no arguments) at the same time, returning their results in order
+
+    This is for independent, I/O bound calls - typically API reads - so a view takes as long as its slowest call
+    rather than the sum of them all. Each call runs in a copy of the current request (or app) context, with the same
+    `flask.g`, so `current_user`, `current_app` and the per-request API response memo all work as normal. No more than
+    DM_CONCURRENT_CALLS_MAX_IN_FLIGHT of the calls are on the pool at once, the rest following as they finish.
+
+    If any calls fail, the exception raised by the first of them (in argument order) is re-raised once all the calls
+    have finished.
+
+    Calls are made one after another, in order, stopping at the first exception (exactly as if they had been written
+    out in sequence) if there's no pool configured, or if we're already running inside one of the pool's threads -
+    waiting on the pool from inside it could otherwise deadlock.
+    """
+    executor = current_app.extensions.get(EXECUTOR_EXTENSION_KEY)
+    if executor is None or len(calls) < 2 or getattr(_worker_state, "active", False):
+        return [call() for call in calls]
+
+    futures = []
+    for future in _submit_in_window(executor, calls):
+        wait((future,))
+        futures.append(future)
+    return [future.result() for future in futures]
+
+
+def iter_concurrently(calls):
+    """Like `concurrently`, but a generator - each result is yielded as soon as it (and every result before it) is ready
+
+    Calls are handed to the pool as earlier ones' results are taken, keeping at most DM_CONCURRENT_CALLS_MAX_IN_FLIGHT
+    ahead. Any calls not yet made when the generator is closed early are cancelled.
+    """
+    executor = current_app.extensions.get(EXECUTOR_EXTENSION_KEY)
+    if executor is None or getattr(_worker_state, "active", False):
+        for call in calls:
+            yield call()
+        return
+
+    for future in _submit_in_window(executor, calls):
+        yield future.result()
+
+
+def start_in_background(call):
+    """Start ``call`` on the pool, in a copy of the current request (or app) context, without waiting for it
+
+    For work whose result is optional, such as warming a cache: if there's no pool configured, or we're already
+    running inside one of its threads, the call isn't made at all. Returns its `Future`, or None if it wasn't started.
+    Any exception it raises is logged.
+    """
+    executor = current_app.extensions.get(EXECUTOR_EXTENSION_KEY)
+    if executor is None or getattr(_worker_state, "active", False):
+        return None
+
+    logger = current_app.logger
+
+    def log_exception(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Background call failed", exc_info=future.exception())
+
+    future = executor.submit(_in_current_context(call))
+    future.add_done_callback(log_exception)
+    return future
+
+
+def _submit_in_window(executor, calls):
+    """Submit ``calls`` to ``executor``, yielding their futures in order - a call is only submitted once the future of
+    the call DM_CONCURRENT_CALLS_MAX_IN_FLIGHT before it has been yielded (and waited on by the caller)
+
+    Any futures submitted but not yet yielded when the generator is closed early are cancelled.
+    """
+    max_in_flight = current_app.extensions[MAX_IN_FLIGHT_EXTENSION_KEY]
+    pending = deque()
+    try:
+        for call in calls:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft()
+            pending.append(executor.submit(_in_current_context(call)))
+        while pending:
+            yield pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _in_current_context(call):
+    request_ctx = _request_ctx_stack.top
+    context = request_ctx.copy() if request_ctx is not None else _app_ctx_stack.top.app.app_context()
+    g_attributes = dict(vars(g))
+
+    def call_in_context():
+        with context:
+            # pushing a copy of a request context gets it a new app context, and with that a new (empty) `g`
+            vars(g).update(g_attributes)
+            _worker_state.active = True
+            try:
+                return call()
+            finally:
+                _worker_state.active = False
+
+    return call_in_context
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import threading
+
+
+class FrameworkRegistry:
+    """Keeps track of the frameworks this process knows about.
+
+    Normally the framework list is fetched from the API when the app starts. If given a ``snapshot_path``, every
+    successfully fetched list is also persisted there, and `bootstrap` will start from that persisted list when it's
+    available, leaving the caller to `start_background_refresh` once it is ready to hear about frameworks that have
+    appeared since. This means a worker can start serving traffic without waiting on (or failing because of) a slow
+    API.
+    """
+
+    def __init__(self, data_api_client, snapshot_path=None, logger=None):
+        self._data_api_client = data_api_client
+        self._snapshot_path = snapshot_path
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._frameworks = ()
+        self._generation = 0
+        self._wake_poller = threading.Event()
+        self._poll_thread = None
+        self.bootstrapped_from_snapshot = False
+
+    @property
+    def frameworks(self):
+        return self._frameworks
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def subscribe(self, callback):
+        """Register ``callback`` to be called with a sequence of any newly seen frameworks after each refresh"""
+        self._subscribers.append(callback)
+
+    def bootstrap(self):
+        """Get the initial framework list - from the persisted snapshot if there is one, otherwise from the API"""
+        frameworks = self._load_snapshot()
+        if frameworks is None:
+            self.refresh()
+        else:
+            self._frameworks = tuple(frameworks)
+            self.bootstrapped_from_snapshot = True
+
+        return self._frameworks
+
+    def refresh(self):
+        """Fetch the framework list from the API, notifying subscribers of any frameworks we haven't seen before
+
+        :return: sequence of the newly seen frameworks
+        """
+        frameworks = tuple(self._data_api_client.find_frameworks()['frameworks'])
+
+        with self._lock:
+            known_slugs = frozenset(framework['slug'] for framework in self._frameworks)
+            if frameworks != self._frameworks:
+                self._frameworks = frameworks
+                self._generation += 1
+
+        self._save_snapshot(frameworks)
+
+        new_frameworks = tuple(framework for framework in frameworks if framework['slug'] not in known_slugs)
+        if new_frameworks:
+            for callback in self._subscribers:
+                callback(new_frameworks)
+
+        return new_frameworks
+
+    def start_background_refresh(self):
+        thread = threading.Thread(target=self._safe_refresh, name="framework-registry-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def start_polling(self, interval, refresh_now=False):
+        """Refresh the framework list every ``interval`` seconds (or sooner, if `notify` is called) on a daemon thread
+
+        :param refresh_now: whether to refresh straight away rather than waiting for the first interval to pass
+        """
+        if self._poll_thread is not None:
+            raise RuntimeError("Already polling for framework changes")
+
+        if refresh_now:
+            self._wake_poller.set()
+        self._poll_thread = threading.Thread(
+            target=self._poll,
+            args=(interval,),
+            name="framework-registry-poller",
+            daemon=True,
+        )
+        self._poll_thread.start()
+        return self._poll_thread
+
+    def notify(self):
+        """Let the registry know the framework list has (probably) changed
+
+        If we're polling this just wakes the poller up early, otherwise the list is refreshed right away.
+        """
+        if self._poll_thread is not None:
+            self._wake_poller.set()
+        else:
+            self._safe_refresh()
+
+    def _poll(self, interval):
+        while True:
+            self._wake_poller.wait(interval)
+            self._wake_poller.clear()
+            self._safe_refresh()
+
+    def _safe_refresh(self):
+        try:
+            new_frameworks = self.refresh()
+        except Exception:
+            self._logger.exception("Failed to refresh framework list - continuing with the list we already have")
+        else:
+            self._logger.info(
+                "Refreshed framework list: {new_framework_count} new frameworks, generation {generation}",
+                extra={"new_framework_count": len(new_frameworks), "generation": self._generation},
+            )
+
+    def _load_snapshot(self):
+        if not self._snapshot_path:
+            return None
+
+        try:
+            with open(self._snapshot_path) as f:
+                return json.load(f)['frameworks']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_snapshot(self, frameworks):
+        if not self._snapshot_path:
+            return
+
+        # write to a temporary file first so another process can never read a partially written snapshot
+        tmp_path = f"{self._snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"frameworks": frameworks}, f)
+            os.replace(tmp_path, self._snapshot_path)
+        except OSError:
+            self._logger.warning(
+                "Failed to persist framework list to {snapshot_path}",
+                extra={"snapshot_path": self._snapshot_path},
+            )
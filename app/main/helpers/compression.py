@@ -0,0 +1,48 @@
+import zlib
+
+from flask import Response, request
+
+
+# content codings we can compress a streamed response with, mapped to the zlib `wbits` which produce them
+STREAMING_CONTENT_CODINGS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+# compressed output is flushed on to the client at least once per this many bytes of uncompressed input, so a slowly
+# generated response keeps trickling out rather than sitting in the compressor
+STREAMING_COMPRESSION_FLUSH_SIZE = 64 * 1024
+
+
+def compress_chunks(chunks, content_coding, compress_level=6):
+    """Generator compressing an iterable of bytes ``chunks`` one at a time, without buffering the whole lot"""
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, STREAMING_CONTENT_CODINGS[content_coding])
+    unflushed_size = 0
+    # the first chunk (typically a header row) is always flushed, so the client gets something straight away
+    flushed_yet = False
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        unflushed_size += len(chunk)
+        if not flushed_yet or unflushed_size >= STREAMING_COMPRESSION_FLUSH_SIZE:
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            unflushed_size = 0
+            flushed_yet = True
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def compressed_streaming_response(chunks, **kwargs):
+    """Return a streaming `Response` of ``chunks``, compressed on the fly if the request's Accept-Encoding allows it
+
+    Any other arguments are passed on to `Response`.
+    """
+    content_coding = request.accept_encodings.best_match(STREAMING_CONTENT_CODINGS)
+
+    response = Response(compress_chunks(chunks, content_coding) if content_coding else chunks, **kwargs)
+    if content_coding:
+        response.headers["Content-Encoding"] = content_coding
+    response.vary.add("Accept-Encoding")
+
+    return response
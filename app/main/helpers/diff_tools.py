@@ -1,9 +1,18 @@
 import difflib
-from itertools import chain
+import hashlib
+import json
+import re
+import time
+from functools import partial
+from itertools import chain, zip_longest
 
 from dmcontent.questions import Multiquestion
-from flask import Markup, render_template
-from lxml import html
+from flask import Markup, current_app, render_template
+
+from .sequence_diff import DiffBudgetExceeded, opcodes
+from ...process_pool import process_pool
+
+SERVICE_DIFFS_CACHE_EXTENSION_KEY = 'service_diffs_cache'
 
 
 def _unpack_question(question):
@@ -24,27 +33,119 @@ def _question_iter(question):
         yield sub_question
 
 
+def _changed_questions_iter(section, revision_1, revision_2):
+    for question in chain.from_iterable(_question_iter(question) for question in section['questions']):
+        q1, q2 = (r.get(question['id'], []) for r in (revision_1, revision_2,))
+        if q1 != q2:
+            yield question, q1, q2
+
+
+def changed_sections_iter(sections, revision_1, revision_2):
+    """Yield (section, number of changed questions) for each of ``sections`` with answers that differ between the
+    revisions, without working out any diffs"""
+    for section in sections:
+        changed_question_count = sum(1 for _ in _changed_questions_iter(section, revision_1, revision_2))
+        if changed_question_count:
+            yield section, changed_question_count
+
+
 def html_diff_tables_from_sections_iter(
         sections,
         revision_1,
         revision_2,
         table_preamble_template=None,
+        diff_engine=None,
+        time_budget=None,
+        executor=None,
 ):
-    html_diff = difflib.HtmlDiff()
+    """Yield (section_slug, question_id, table_html) for each question in ``sections`` whose answer differs between
+    the revisions, in manifest order
+
+    Each table is worked out as it's yielded - unless an ``executor`` (anything with a `map` like `Executor.map`'s,
+    such as the app's `ProcessPool`) is given and there's more than one table to do, in which case they're all handed
+    to that at once.
+    """
+    changed_questions = [
+        (section, question, _get_value_for_difflib(q1), _get_value_for_difflib(q2))
+        for section in sections
+        for question, q1, q2 in _changed_questions_iter(section, revision_1, revision_2)
+    ]
+
+    table_htmls = (map if executor is None or len(changed_questions) < 2 else executor.map)(
+        partial(_html_diff_table, diff_engine=diff_engine, time_budget=time_budget),
+        [q1 for _, _, q1, _ in changed_questions],
+        [q2 for _, _, _, q2 in changed_questions],
+        [
+            render_template(
+                table_preamble_template,
+                section=section,
+                question=question,
+            ) if table_preamble_template else ""
+            for section, question, _, _ in changed_questions
+        ],
+    )
+    for (section, question, _, _), table_html in zip(changed_questions, table_htmls):
+        yield section.slug, question.id, Markup(table_html)
+
+
+def service_data_fingerprint(service_data):
+    return hashlib.sha256(json.dumps(service_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def cached_service_diff_tables(
+        service,
+        archived_service_id,
+        archived_service,
+        sections,
+        content_loader,
+        table_preamble_template=None,
+        section_slug=None,
+):
+    """Return a tuple of (question_id, table_html) pairs for the questions which differ between ``archived_service``
+    and ``service``, as `html_diff_tables_from_sections_iter` would yield them - only for the questions in the section
+    ``section_slug`` if it's given
+
+    The tables are kept in the process-wide service diffs cache, so other admins reviewing the same changes don't have
+    to wait for them to be worked out again. The cache key covers everything the tables are made from: the archived
+    service (archived services never change), the current service data and the version of the content ``sections``
+    were loaded from by ``content_loader``.
+    """
+    def diff_tables():
+        return tuple(
+            (question_id, table_html)
+            for _, question_id, table_html in html_diff_tables_from_sections_iter(
+                sections=sections if section_slug is None else [
+                    section for section in sections if section.slug == section_slug
+                ],
+                revision_1=archived_service,
+                revision_2=service,
+                table_preamble_template=table_preamble_template,
+                diff_engine=DIFF_ENGINES[current_app.config['DM_SERVICE_DIFF_ENGINE']],
+                time_budget=current_app.config['DM_SERVICE_DIFF_TIME_BUDGET'],
+                executor=process_pool(),
+            )
+        )
+
+    cache = current_app.extensions[SERVICE_DIFFS_CACHE_EXTENSION_KEY]
+    if cache.ttl <= 0:
+        # don't bother fingerprinting anything
+        return diff_tables()
+
+    return cache.get(
+        (
+            str(service["id"]),
+            str(archived_service_id),
+            section_slug,
+            service_data_fingerprint(service),
+            content_loader.content_version,
+        ),
+        diff_tables,
+    )
 
-    for section in sections:
-        for question in chain.from_iterable(_question_iter(question) for question in section['questions']):
-            q1, q2 = (r.get(question['id'], []) for r in (revision_1, revision_2,))
-            if q1 != q2:
-                q1, q2 = (_get_value_for_difflib(q) for q in (q1, q2,))
-                yield section.slug, question.id, Markup(_clean_difflib_html_table(
-                    html_diff.make_table(q1, q2),
-                    table_preamble_template=table_preamble_template,
-                    table_preamble_context={
-                        "section": section,
-                        "question": question,
-                    },
-                ))
+
+def forget_service_diff_tables(service_id):
+    """Drop every cached diff for ``service_id``, e.g. once its updates have been approved"""
+    current_app.extensions[SERVICE_DIFFS_CACHE_EXTENSION_KEY].invalidate_matching(lambda key: key[0] == str(service_id))
 
 
 def _get_value_for_difflib(thing):
@@ -56,83 +157,162 @@ def _get_value_for_difflib(thing):
         return thing
 
 
-def _strip_nbsp(content):
-    return content.replace(u"\u00a0", u" ")
-
-
-def _strip_element_nbsp(element):
-    element.text = element.text and _strip_nbsp(element.text)
-    element.tail = element.tail and _strip_nbsp(element.tail)
-    for child_element in element:
-        _strip_element_nbsp(child_element)
-
-
-def _clean_difflib_html_table(table_src, table_preamble_template=None, table_preamble_context={}):
-    # difflib doesn't produce html *quite* how we would like, so we do the admittedly slightly strange thing here of
-    # parsing it, modifying the result in-place and re-serializing it for rendering. this is, in my opinion, the least-
-    # worst thing to do, because it allows us to take advantage of the (well tested) logic of difflib.HtmlDiff while
-    # just adding relatively simple style-mangling code of our own.
-    #
-    # another (perhaps more obvious) alternative to this would have been to adapt our stytles to difflib's output,
-    # but... frankly our style scheme for this is more well thought out and, more importantly, already cross-browser
-    # tested.
-    table_element = html.fragment_fromstring(table_src)
-
-    # colgroups not wanted
-    for colgroup in table_element.xpath(".//colgroup"):
-        colgroup.getparent().remove(colgroup)
-
-    # column of links not wanted
-    for diff_next in table_element.xpath(".//td[@class='diff_next']"):
-        diff_next.getparent().remove(diff_next)
-
-    # this isn't even valid html5 anymore
-    for td_nowrap in table_element.xpath(".//td[@nowrap]"):
-        del td_nowrap.attrib["nowrap"]
-
-    for key in table_element.keys():
-        del table_element.attrib[key]
-
-    # we can't really safely use ids (who knows if we're going to use >1 of these in a page?)
-    for element in table_element.xpath(".//*[@id]"):
-        del element.attrib["id"]
-
-    # difflib very helpfully replaces all our spaces with nbsp, which is not something we want
-    _strip_element_nbsp(table_element.xpath("./tbody")[0])
-
-    for line_number_td in table_element.xpath(".//td[@class='diff_header']"):
-        line_number_td.attrib["class"] = "line-number"
-
-    for tr in table_element.xpath("./tbody/tr"):
-        tr[0].attrib["class"] = tr[2].attrib["class"] = "line-number"
-        tr[1].attrib["class"] = tr[3].attrib["class"] = "line-content"
-
-        if (tr[0].text or "").strip() or len(tr[0]):  # i.e. left side has what is presumably a line number
-            if len(tr[1]):  # i.e. left side is interesting because the content has (presumably span.diff_*) child elems
-                tr[0].attrib["class"] += " line-number-removal"
-                tr[1].attrib["class"] += " removal"
-                for span in tr[1].xpath("./span[@class='diff_sub' or @class='diff_chg']"):
-                    span.tag = "del"
-                    del span.attrib["class"]
-        else:
-            tr[0].attrib["class"] += " line-non-existent"
-            tr[1].attrib["class"] += " line-non-existent"
-
-        if (tr[2].text or "").strip() or len(tr[2]):  # i.e. right side has what is presumably a line number
-            if len(tr[3]):  # i.e. right side's interesting because the content has (presumably span.diff_*) child elems
-                tr[2].attrib["class"] += " line-number-addition"
-                tr[3].attrib["class"] += " addition"
-                for span in tr[3].xpath("./span[@class='diff_add' or @class='diff_chg']"):
-                    span.tag = "ins"
-                    del span.attrib["class"]
-        else:
-            tr[2].attrib["class"] += " line-non-existent"
-            tr[3].attrib["class"] += " line-non-existent"
-
-    if table_preamble_template:
-        preamble_src = render_template(table_preamble_template, **table_preamble_context)
-        preamble_elements = html.fragments_fromstring(preamble_src)
-        for element in reversed(preamble_elements):
-            table_element.insert(0, element)
-
-    return html.tostring(table_element, encoding="unicode")
+# the markers difflib puts around the changed parts of a line, and the markup we replace them with on each side
+_CHANGE_MARKUP = (
+    (("\0-", "<del>"), ("\0^", "<del>"), ("\1", "</del>")),
+    (("\0+", "<ins>"), ("\0^", "<ins>"), ("\1", "</ins>")),
+)
+_CHANGED_LINE_CLASSES = (
+    ("line-number line-number-removal", "line-content removal"),
+    ("line-number line-number-addition", "line-content addition"),
+)
+_EMPTY_FILE_ROW = (
+    '<tr>'
+    '<td class="line-number line-non-existent"></td><td class="line-content line-non-existent"> Empty File </td>'
+    '<td class="line-number line-non-existent"></td><td class="line-content line-non-existent"> Empty File </td>'
+    '</tr>'
+)
+
+
+def _expand_tabs(line, tabsize=8):
+    # as difflib.HtmlDiff does - tabs are expanded into runs of tab characters, so replacing tabs with spaces doesn't
+    # register as a change, and are only turned into spaces once the diff is done
+    return line.replace(" ", "\0").expandtabs(tabsize).replace(" ", "\t").replace("\0", " ").rstrip("\n")
+
+
+def _rstrip_non_space(text):
+    # trailing whitespace other than actual spaces isn't shown (difflib.HtmlDiff's own quirk, kept so the rendering of
+    # existing diffs doesn't change)
+    end = len(text)
+    while end and text[end - 1] != " " and text[end - 1].isspace():
+        end -= 1
+    return text[:end]
+
+
+def _html_diff_cells(side, line_number, text):
+    """The line number and line content cells for one side (0 for removals, 1 for additions) of a diffed line"""
+    if line_number == "":
+        # a line which only exists on the other side
+        return '<td class="line-number line-non-existent"></td><td class="line-content line-non-existent"></td>'
+
+    text = _rstrip_non_space(text.replace("&", "&amp;").replace(">", "&gt;").replace("<", "&lt;"))
+    if "\0" in text:
+        line_number_class, line_content_class = _CHANGED_LINE_CLASSES[side]
+        for marker, markup in _CHANGE_MARKUP[side]:
+            text = text.replace(marker, markup)
+    else:
+        line_number_class, line_content_class = "line-number", "line-content"
+
+    return '<td class="{}">{}</td><td class="{}">{}</td>'.format(
+        line_number_class,
+        line_number,
+        line_content_class,
+        text.replace("\t", " ").replace("\u00a0", " "),
+    )
+
+
+def difflib_line_pairs(lines_1, lines_2, time_budget=None):
+    """Pair up ``lines_1`` and ``lines_2`` and mark their changes exactly as `difflib.HtmlDiff` would
+
+    Yields ((line number, text), (line number, text)) for each row of the diff, a line number of "" meaning the line
+    only exists on the other side, and changes within the text marked ``\\0-``/``\\0+``/``\\0^`` ... ``\\1``. difflib's
+    matching can't be interrupted, so ``time_budget`` is ignored.
+    """
+    # _mdiff is private to difflib (it's what HtmlDiff uses internally), so could change with any Python release -
+    # TestDifflibLinePairs pins the Python version it's been checked against, to catch an upgrade
+    return (
+        (line_1, line_2) for line_1, line_2, _ in difflib._mdiff(lines_1, lines_2, charjunk=difflib.IS_CHARACTER_JUNK)
+    )
+
+
+_WORDS_RE = re.compile(r"\s+|\S+")
+
+
+def _marked(marker, text):
+    return "\0{}{}\1".format(marker, text)
+
+
+def _word_diff_texts(line_1, line_2, deadline):
+    """Mark the words (and runs of whitespace) that differ between ``line_1`` and ``line_2``"""
+    words_1, words_2 = _WORDS_RE.findall(line_1), _WORDS_RE.findall(line_2)
+    texts = ([], [])
+    for tag, i1, i2, j1, j2 in opcodes(words_1, words_2, deadline=deadline):
+        for side, words, marker in ((0, words_1[i1:i2], "-"), (1, words_2[j1:j2], "+")):
+            if words:
+                text = "".join(words)
+                texts[side].append(
+                    text if tag == "equal" else _marked("^" if tag == "replace" else marker, text)
+                )
+    return "".join(texts[0]), "".join(texts[1])
+
+
+def _replaced_line_pairs(lines_1, lines_2, line_number_1=1, line_number_2=1):
+    """Show every one of ``lines_1`` as removed and ``lines_2`` as added, side by side"""
+    for index, (line_1, line_2) in enumerate(zip_longest(lines_1, lines_2)):
+        yield (
+            ("", "") if line_1 is None else (line_number_1 + index, _marked("-", line_1)),
+            ("", "") if line_2 is None else (line_number_2 + index, _marked("+", line_2)),
+        )
+
+
+def word_diff_line_pairs(lines_1, lines_2, time_budget=None):
+    """Pair up ``lines_1`` and ``lines_2`` and mark their changes word by word, in the same form as
+    `difflib_line_pairs`
+
+    Lines are matched, and then the words of each changed pair of lines, using `sequence_diff.opcodes`, which keeps
+    to roughly linear time for the usual handful of edits where difflib's character-level matching is quadratic in the
+    length of a line. If ``time_budget`` (in seconds) runs out first, the rest of the answer is shown as simply
+    replaced - each of its lines removed and each new line added - rather than holding up the request any longer.
+    """
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    try:
+        line_opcodes = opcodes(lines_1, lines_2, deadline=deadline)
+    except DiffBudgetExceeded:
+        yield from _replaced_line_pairs(lines_1, lines_2)
+        return
+
+    for tag, i1, i2, j1, j2 in line_opcodes:
+        if tag == "equal":
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                yield (i + 1, lines_1[i]), (j + 1, lines_2[j])
+            continue
+
+        paired_lines = min(i2 - i1, j2 - j1)
+        for i, j in zip(range(i1, i1 + paired_lines), range(j1, j1 + paired_lines)):
+            try:
+                text_1, text_2 = _word_diff_texts(lines_1[i], lines_2[j], deadline)
+            except DiffBudgetExceeded:
+                text_1, text_2 = _marked("-", lines_1[i]), _marked("+", lines_2[j])
+            yield (i + 1, text_1), (j + 1, text_2)
+        yield from _replaced_line_pairs(
+            lines_1[i1 + paired_lines:i2],
+            lines_2[j1 + paired_lines:j2],
+            i1 + paired_lines + 1,
+            j1 + paired_lines + 1,
+        )
+
+
+DIFF_ENGINES = {
+    "difflib": difflib_line_pairs,
+    "words": word_diff_line_pairs,
+}
+
+
+def _html_diff_table(lines_1, lines_2, table_preamble_html="", diff_engine=None, time_budget=None):
+    """Render a side-by-side table of the differences between ``lines_1`` and ``lines_2``
+
+    Lines are paired up and their changes found by ``diff_engine`` (one of `DIFF_ENGINES`, `difflib_line_pairs` by
+    default, within ``time_budget`` seconds if it can keep to one), then each pair is rendered directly as the markup
+    our diff styles expect: ``line-number`` and ``line-content`` cells, with removals and additions in ``<del>`` and
+    ``<ins>``.
+    """
+    rows = "".join(
+        "            <tr>{}{}</tr>\n".format(_html_diff_cells(0, *line_1), _html_diff_cells(1, *line_2))
+        for line_1, line_2 in (diff_engine or difflib_line_pairs)(
+            [_expand_tabs(line) for line in lines_1],
+            [_expand_tabs(line) for line in lines_2],
+            time_budget=time_budget,
+        )
+    ) or "            {}\n".format(_EMPTY_FILE_ROW)
+
+    return "<table>\n        {}<tbody>\n{}        </tbody>\n    </table>".format(table_preamble_html, rows)
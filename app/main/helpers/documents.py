@@ -0,0 +1,36 @@
+from urllib.parse import urlparse
+
+from flask import current_app
+
+
+SIGNED_URLS_CACHE_EXTENSION_KEY = 'signed_urls_cache'
+
+
+def _signed_urls_cache_key(bucket, path):
+    return bucket.bucket_name, path.lstrip('/')
+
+
+def get_signed_url(bucket, path, base_url):
+    """Return a signed URL for downloading ``path`` from ``bucket`` via ``base_url``, or None if there's no such key
+
+    A drop-in for `dmutils.documents.get_signed_url`, except that signed URLs (and keys found not to exist) are
+    remembered in the process-wide signed URLs cache: a URL is handed out again until shortly before it expires, so
+    a popular download only checks for and signs its key once in a while.
+    """
+    signed_url, = current_app.extensions[SIGNED_URLS_CACHE_EXTENSION_KEY].get(
+        _signed_urls_cache_key(bucket, path),
+        # wrapped in a tuple so a missing key (None) is cached too
+        lambda: (bucket.get_signed_url(path, expires_in=current_app.config['DM_SIGNED_URL_EXPIRES_IN']),),
+    )
+
+    if signed_url is not None and base_url is not None:
+        parsed_base_url = urlparse(base_url)
+        signed_url = urlparse(signed_url)._replace(
+            netloc=parsed_base_url.netloc, scheme=parsed_base_url.scheme
+        ).geturl()
+    return signed_url
+
+
+def forget_signed_url(bucket, path):
+    """Forget any cached signed URL (or absence) of ``path`` in ``bucket``, for when it's been uploaded or deleted"""
+    current_app.extensions[SIGNED_URLS_CACHE_EXTENSION_KEY].invalidate(_signed_urls_cache_key(bucket, path))
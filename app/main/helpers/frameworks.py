@@ -1,4 +1,9 @@
-from flask import abort
+from copy import deepcopy
+
+from flask import abort, current_app
+
+
+FRAMEWORKS_CACHE_KEY = 'frameworks'
 
 
 def get_framework_or_404(client, framework_slug, allowed_statuses=None):
@@ -11,3 +16,19 @@ def get_framework_or_404(client, framework_slug, allowed_statuses=None):
         abort(404)
 
     return framework
+
+
+def find_frameworks(client):
+    """Return the list of all frameworks, from the process-wide frameworks cache if it has a fresh copy
+
+    Each caller gets its own copy, so is free to sort or otherwise modify it.
+    """
+    frameworks = current_app.extensions['frameworks_cache'].get(
+        FRAMEWORKS_CACHE_KEY,
+        lambda: client.find_frameworks()['frameworks'],
+    )
+    return deepcopy(frameworks)
+
+
+def invalidate_frameworks_cache():
+    current_app.extensions['frameworks_cache'].invalidate(FRAMEWORKS_CACHE_KEY)
@@ -0,0 +1,145 @@
+import time
+from bisect import bisect_left
+from collections import Counter
+
+
+class DiffBudgetExceeded(Exception):
+    """Raised when working out a diff takes longer than it was allowed to"""
+
+
+def _check_deadline(deadline, clock):
+    if deadline is not None and clock() >= deadline:
+        raise DiffBudgetExceeded
+
+
+def _unique_common_anchors(a, a_lo, a_hi, b, b_lo, b_hi):
+    """The longest run of (i, j) pairs, increasing in both i and j, where a[i] == b[j] is an element that appears
+    exactly once in each of a[a_lo:a_hi] and b[b_lo:b_hi] - patience diff's anchors"""
+    a_counts, b_counts = Counter(a[a_lo:a_hi]), Counter(b[b_lo:b_hi])
+    b_positions = {b[j]: j for j in range(b_lo, b_hi) if b_counts[b[j]] == 1}
+    candidates = [
+        (i, b_positions[a[i]]) for i in range(a_lo, a_hi) if a_counts[a[i]] == 1 and a[i] in b_positions
+    ]
+
+    # patience sorting: the longest subsequence of candidates with increasing j
+    pile_tops, pile_top_indices, predecessors = [], [], []
+    for index, (_, j) in enumerate(candidates):
+        pile = bisect_left(pile_tops, j)
+        if pile == len(pile_tops):
+            pile_tops.append(j)
+            pile_top_indices.append(index)
+        else:
+            pile_tops[pile] = j
+            pile_top_indices[pile] = index
+        predecessors.append(pile_top_indices[pile - 1] if pile else None)
+
+    anchors = []
+    index = pile_top_indices[-1] if pile_top_indices else None
+    while index is not None:
+        anchors.append(candidates[index])
+        index = predecessors[index]
+    return anchors[::-1]
+
+
+def _myers_matches(a, a_lo, a_hi, b, b_lo, b_hi, deadline, clock):
+    """The (i, j) pairs of a shortest edit script between a[a_lo:a_hi] and b[b_lo:b_hi], by Myers' O(ND) algorithm"""
+    n, m = a_hi - a_lo, b_hi - b_lo
+    offset = n + m + 1
+    # furthest x reached on each diagonal k (at index k + offset)
+    v = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(n + m + 1):
+        _check_deadline(deadline, clock)
+        # only diagonals -(d + 1)..(d + 1) of the previous round are needed to retrace this one
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x, y = x + 1, y + 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+
+    matches = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        previous_v = trace[d]
+        k = x - y
+        if k == -d or (k != d and previous_v[k - 1 + d + 1] < previous_v[k + 1 + d + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = previous_v[previous_k + d + 1]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x, y = x - 1, y - 1
+            matches.append((a_lo + x, b_lo + y))
+        x, y = previous_x, previous_y
+    return matches
+
+
+def matching_blocks(a, b, deadline=None, clock=time.monotonic):
+    """Return the blocks of elements common to sequences ``a`` and ``b`` as a list of (i, j, size) triples, in the
+    same form as `difflib.SequenceMatcher.get_matching_blocks`
+
+    Elements which appear exactly once in each sequence anchor the match, as in patience diff, so moved or repeated
+    text doesn't produce confusing matches; the stretches between anchors are matched with Myers' algorithm, which is
+    quick when the changes are few. Raises `DiffBudgetExceeded` if still working once ``clock()`` reaches
+    ``deadline``.
+    """
+    matches = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        _check_deadline(deadline, clock)
+        a_lo, a_hi, b_lo, b_hi = regions.pop()
+
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            matches.append((a_lo, b_lo))
+            a_lo, b_lo = a_lo + 1, b_lo + 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi, b_hi = a_hi - 1, b_hi - 1
+            matches.append((a_hi, b_hi))
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        anchors = _unique_common_anchors(a, a_lo, a_hi, b, b_lo, b_hi)
+        if not anchors:
+            matches.extend(_myers_matches(a, a_lo, a_hi, b, b_lo, b_hi, deadline, clock))
+            continue
+
+        matches.extend(anchors)
+        for (i_lo, j_lo), (i_hi, j_hi) in zip([(a_lo - 1, b_lo - 1)] + anchors, anchors + [(a_hi, b_hi)]):
+            regions.append((i_lo + 1, i_hi, j_lo + 1, j_hi))
+
+    blocks = []
+    for i, j in sorted(matches):
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1][2] += 1
+        else:
+            blocks.append([i, j, 1])
+    return [tuple(block) for block in blocks] + [(len(a), len(b), 0)]
+
+
+def opcodes(a, b, deadline=None, clock=time.monotonic):
+    """Return the (tag, i1, i2, j1, j2) operations turning ``a`` into ``b``, in the same form as
+    `difflib.SequenceMatcher.get_opcodes`, from the `matching_blocks` of the two"""
+    operations = []
+    i = j = 0
+    for block_i, block_j, size in matching_blocks(a, b, deadline=deadline, clock=clock):
+        if i < block_i and j < block_j:
+            operations.append(("replace", i, block_i, j, block_j))
+        elif i < block_i:
+            operations.append(("delete", i, block_i, j, block_j))
+        elif j < block_j:
+            operations.append(("insert", i, block_i, j, block_j))
+        i, j = block_i + size, block_j + size
+        if size:
+            operations.append(("equal", block_i, i, block_j, j))
+    return operations
@@ -1,14 +1,69 @@
+import heapq
+import pickle
+import tempfile
+from itertools import islice
+from operator import itemgetter
+
 from dmutils import csv_generator
 
 
-def generate_user_csv(users):
+# the most users generate_user_csv will hold in memory while sorting - sorted runs of this many are spilled to
+# temporary files and merged back together
+USER_CSV_SORT_BUFFER_SIZE = 10000
+
+
+def _spill(items):
+    run = tempfile.TemporaryFile()
+    for item in items:
+        pickle.dump(item, run, protocol=pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    while True:
+        try:
+            yield pickle.load(run)
+        except EOFError:
+            return
+
+
+def external_sorted(iterable, key, buffer_size):
+    """Generator yielding the items of ``iterable`` in the same (stable) order as ``sorted(iterable, key=key)`` would
+
+    Only ``buffer_size`` items are held in memory at once: once there are more than that, they are sorted in runs of
+    ``buffer_size``, each run spilled to a temporary file, and the runs merged back together as they're yielded.
+    Items must be picklable.
+    """
+    iterator = iter(iterable)
+    runs = []
+    try:
+        while True:
+            buffer = sorted(islice(iterator, buffer_size), key=key)
+            if len(buffer) < buffer_size:
+                break
+            runs.append(_spill(buffer))
+
+        if not runs:
+            # everything fitted in memory
+            yield from buffer
+        else:
+            # heapq.merge is stable, taking equal items from earlier runs first, as sorted() would have
+            yield from heapq.merge(*(_read_run(run) for run in runs), buffer, key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def generate_user_csv(users, buffer_size=USER_CSV_SORT_BUFFER_SIZE):
     header_row = ("email address", "name")
     user_attributes = ("emailAddress", "name")
 
     def rows_iter():
         """Iterator yielding header then rows."""
         yield header_row
-        for user in sorted(users, key=lambda user: user["name"]):
-            yield (user.get(field_name, "") for field_name in user_attributes)
+        # sort just the fields we're going to output, rather than whole users
+        rows = (tuple(user.get(field_name, "") for field_name in user_attributes) for user in users)
+        yield from external_sorted(rows, key=itemgetter(user_attributes.index("name")), buffer_size=buffer_size)
 
     return csv_generator.iter_csv(rows_iter())
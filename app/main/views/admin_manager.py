@@ -1,46 +1,76 @@
+import heapq
 from distutils.util import strtobool
+from functools import partial
+from itertools import islice
 
 from dmutils.email.user_account_email import send_user_account_email
 from dmutils.forms.helpers import get_errors_from_wtform
 from dmutils.flask import timed_render_template as render_template
-from flask import request, redirect, url_for, flash
+from flask import abort, request, redirect, url_for, flash
 from flask_login import current_user
 
 from .. import main
 from ..auth import role_required
 from ..forms import InviteAdminForm, EditAdminUserForm
 from ... import data_api_client
+from ...concurrency import concurrently
 
 
 INVITATION_SENT_MESSAGE = "An invitation has been sent to {email_address}."
 EMAIL_ADDRESS_UPDATED_MESSAGE = "{email_address} has been updated."
 
+ADMIN_USER_ROLES = (
+    'admin',
+    'admin-ccs-category',
+    'admin-ccs-sourcing',
+    'admin-framework-manager',
+    'admin-ccs-data-controller',
+)
+ADMIN_USERS_PER_PAGE = 100
+
+
+def _admin_user_sort_key(user):
+    # We want to sort so all Active users are above all Suspended users, and alphabetical by name within these groups.
+    # In Python False < True (False is zero, True is one) so sorting on "active is False" puts Active users first.
+    return user['active'] is False, user['name']
+
+
+def _sorted_admin_users_with_role(role):
+    return sorted(data_api_client.find_users_iter(role=role), key=_admin_user_sort_key)
+
 
 @main.route('/admin-users', methods=['GET'])
 @role_required('admin-manager')
 def manage_admin_users():
     # The API doesn't support filtering users by multiple roles at once, and it's not worth adding that feature
-    # just for this one view that (currently, and for the foreseeable future) will be very rarely used.
-    # In future, if we have many many admin users and/or this page is heavily used we should:
-    # (1) Fix the API to allow fetching all relevant user roles with a single call
-    # (2) Stop using the _iter method and properly paginate this page
-
-    support_users = data_api_client.find_users_iter(role='admin')
-    category_users = data_api_client.find_users_iter(role='admin-ccs-category')
-    sourcing_users = data_api_client.find_users_iter(role='admin-ccs-sourcing')
-    framework_manager_users = data_api_client.find_users_iter(role='admin-framework-manager')
-    data_controller_users = data_api_client.find_users_iter(role='admin-ccs-data-controller')
-
-    # We want to sort so all Active users are above all Suspended users, and alphabetical by name within these groups.
-    # In Python False < True (False is zero, True is one) so sorting on "active is False" puts Active users first.
-    admin_users = sorted(
-        list(support_users) + list(category_users) +
-        list(sourcing_users) + list(framework_manager_users) + list(data_controller_users),
-        key=lambda k: (k['active'] is False, k['name'])
+    # just for this one view that (currently, and for the foreseeable future) will be very rarely used. Instead we
+    # fetch each role's users at the same time, sort each role's users, and merge them together, only going as far
+    # through the merged list as the page being shown. If we ever have many many admin users we should fix the API to
+    # allow fetching all relevant user roles (sorted and paginated) with a single call.
+    page = request.args.get('page', 1, type=int)
+    if page < 1:
+        abort(404)
+
+    role_users = concurrently(*(partial(_sorted_admin_users_with_role, role) for role in ADMIN_USER_ROLES))
+
+    # heapq.merge is stable, so users with equal sort keys come out in role order, exactly as they would have from
+    # sorting every role's users in one go
+    admin_users = islice(
+        heapq.merge(*role_users, key=_admin_user_sort_key),
+        (page - 1) * ADMIN_USERS_PER_PAGE,
+        # one extra, to see whether there's a next page
+        page * ADMIN_USERS_PER_PAGE + 1,
     )
+    page_admin_users = list(admin_users)
+    if page > 1 and not page_admin_users:
+        abort(404)
 
-    return render_template("view_admin_users.html",
-                           admin_users=admin_users)
+    return render_template(
+        "view_admin_users.html",
+        admin_users=page_admin_users[:ADMIN_USERS_PER_PAGE],
+        prev_link={'page': page - 1} if page > 1 else None,
+        next_link={'page': page + 1} if len(page_admin_users) > ADMIN_USERS_PER_PAGE else None,
+    )
 
 
 @main.route('/admin-users/invite', methods=['GET', 'POST'])
@@ -1,13 +1,16 @@
+from functools import partial
 from pathlib import PurePath
 
-from dmutils import s3  # this style of import so we only have to mock once
-from dmutils.documents import file_is_pdf, file_is_csv, file_is_open_document_format, get_signed_url
+from dmutils.documents import file_is_pdf, file_is_csv, file_is_open_document_format
 from dmutils.flask import timed_render_template as render_template
 from flask import redirect, url_for, current_app, request, flash, abort
 
 from .. import main
 from ..auth import role_required
 from ... import data_api_client
+from ...concurrency import concurrently
+from ...s3_buckets import s3_bucket
+from ..helpers.documents import forget_signed_url, get_signed_url
 from ..helpers.frameworks import get_framework_or_404
 
 
@@ -20,27 +23,44 @@ def _get_comm_type_root(framework_slug, comm_type):
 _comm_types = ("communication", "clarification",)
 
 
-@main.route('/communications/<framework_slug>', methods=['GET'])
-@role_required('admin-framework-manager')
-def manage_communications(framework_slug):
-    communications_bucket = s3.S3(
-        current_app.config['DM_COMMUNICATIONS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
-    framework = get_framework_or_404(data_api_client, framework_slug)
+def _list_comm_type(framework_slug, comm_type):
+    """Return a tuple of s3 object dicts for ``framework_slug``'s ``comm_type`` files
 
-    # generate a dict of comm_type: seq of s3 object dicts
-    comm_type_objs = {
-        comm_type: tuple(
+    Listings are kept in the process-wide communications listings cache (loading their timestamps is slow) until they
+    expire, or are forgotten by `_forget_comm_type_listing` when the files change. The same cached dicts are
+    shared by every request, so mustn't be modified.
+
+    The bucket is looked up here rather than passed in, as listings are made on the concurrent calls pool's threads
+    and each thread has to use its own `S3` instance.
+    """
+    comm_type_root = _get_comm_type_root(framework_slug, comm_type)
+    return current_app.extensions['communications_listings_cache'].get(
+        (framework_slug, comm_type),
+        lambda: tuple(
             {
                 **bucket_item,
                 # annotate on to object dicts their paths relative to comm_type_root
-                "rel_path": PurePath(bucket_item["path"]).relative_to(_get_comm_type_root(framework_slug, comm_type)),
-            } for bucket_item in communications_bucket.list(
-                str(_get_comm_type_root(framework_slug, comm_type)),
-                load_timestamps=True,
+                "rel_path": PurePath(bucket_item["path"]).relative_to(comm_type_root),
+            } for bucket_item in s3_bucket(current_app.config['DM_COMMUNICATIONS_BUCKET']).list(
+                str(comm_type_root), load_timestamps=True
             )
-        ) for comm_type in _comm_types
-    }
+        ),
+    )
+
+
+def _forget_comm_type_listing(framework_slug, comm_type):
+    current_app.extensions['communications_listings_cache'].invalidate((framework_slug, comm_type))
+
+
+@main.route('/communications/<framework_slug>', methods=['GET'])
+@role_required('admin-framework-manager')
+def manage_communications(framework_slug):
+    framework = get_framework_or_404(data_api_client, framework_slug)
+
+    # generate a dict of comm_type: seq of s3 object dicts, listing each comm_type at the same time
+    comm_type_objs = dict(zip(_comm_types, concurrently(*(
+        partial(_list_comm_type, framework_slug, comm_type) for comm_type in _comm_types
+    ))))
 
     return render_template(
         'manage_communications.html',
@@ -58,9 +78,7 @@ def download_communication(framework_slug, comm_type, filepath):
     # ensure this is a real framework
     get_framework_or_404(data_api_client, framework_slug)
 
-    bucket = s3.S3(
-        current_app.config['DM_COMMUNICATIONS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    bucket = s3_bucket(current_app.config['DM_COMMUNICATIONS_BUCKET'])
     full_path = _get_comm_type_root(framework_slug, comm_type) / filepath
     url = get_signed_url(bucket, str(full_path), current_app.config["DM_ASSETS_URL"])
     if not url:
@@ -72,9 +90,7 @@ def download_communication(framework_slug, comm_type, filepath):
 @main.route('/communications/<framework_slug>', methods=['POST'])
 @role_required('admin-framework-manager')
 def upload_communication(framework_slug):
-    communications_bucket = s3.S3(
-        current_app.config['DM_COMMUNICATIONS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    communications_bucket = s3_bucket(current_app.config['DM_COMMUNICATIONS_BUCKET'])
     errors = {}
 
     if request.files.get('communication'):
@@ -88,6 +104,8 @@ def upload_communication(framework_slug):
             communications_bucket.save(
                 path, the_file, acl='bucket-owner-full-control', download_filename=the_file.filename
             )
+            forget_signed_url(communications_bucket, path)
+            _forget_comm_type_listing(framework_slug, 'communication')
             flash('New communication was uploaded.')
 
     if request.files.get('clarification'):
@@ -101,6 +119,8 @@ def upload_communication(framework_slug):
             communications_bucket.save(
                 path, the_file, acl='bucket-owner-full-control', download_filename=the_file.filename
             )
+            forget_signed_url(communications_bucket, path)
+            _forget_comm_type_listing(framework_slug, 'clarification')
             flash('New clarification was uploaded.')
 
     return redirect(url_for('.manage_communications', framework_slug=framework_slug))
@@ -121,9 +141,7 @@ def delete_communication(framework_slug, comm_type, filepath):
         if "confirm" not in request.form:
             abort(400, "Expected 'confirm' parameter in POST request")
 
-        communications_bucket = s3.S3(
-            current_app.config['DM_COMMUNICATIONS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-        )
+        communications_bucket = s3_bucket(current_app.config['DM_COMMUNICATIONS_BUCKET'])
         full_path = _get_comm_type_root(framework_slug, comm_type) / filepath
 
         # do this check ourselves - deleting an object in S3 silently has no effect, forwarding this behaviour to the
@@ -132,6 +150,8 @@ def delete_communication(framework_slug, comm_type, filepath):
             abort(404, f"{filepath} not present in S3 bucket")
 
         communications_bucket.delete_key(str(full_path))
+        forget_signed_url(communications_bucket, str(full_path))
+        _forget_comm_type_listing(framework_slug, comm_type)
 
         flash(f"{comm_type.capitalize()} ‘{filepath}’ was deleted for {framework['name']}.")
         return redirect(url_for('.manage_communications', framework_slug=framework_slug))
@@ -1,73 +1,150 @@
+import logging
+from collections import OrderedDict
 from datetime import datetime
+from functools import partial
+from itertools import islice
 
-from flask import Response, abort, current_app, redirect
+from flask import abort, current_app, redirect, stream_with_context
 
-from dmutils import csv_generator, s3
-from dmutils.documents import get_signed_url
+from dmutils import csv_generator
+from dmutils.timing import logged_duration
 
 from .. import main
 from ..auth import role_required
+from ..helpers.compression import compressed_streaming_response
+from ..helpers.documents import get_signed_url
+from ..helpers.frameworks import find_frameworks
 from ... import data_api_client
+from ...api_client import request_memo_disabled
+from ...concurrency import iter_concurrently
+from ...s3_buckets import s3_bucket
+
+
+DIRECT_AWARD_OUTCOMES_HEADERS = [
+    'ID',
+    'Name',
+    'Submitted at',
+    'Result',
+    'Award service ID',
+    'Award service name',
+    'Award supplier id',
+    'Award supplier name',
+    'Award value',
+    'Awarding organisation name',
+    'Award start date',
+    'Award end date',
+    'User id',
+    'User name',
+    'User email',
+]
+
+
+# how many awarded projects are taken at a time to have their archived services looked up - this bounds how many rows
+# the export holds in memory at once
+DIRECT_AWARD_OUTCOMES_WINDOW = 50
+# how many of the most recently used archived services are remembered between windows, so a service awarded by
+# several projects isn't looked up again
+DIRECT_AWARD_OUTCOMES_REMEMBERED_SERVICES = 500
+
+
+def _archived_service_id(project):
+    return project['outcome']['resultOfDirectAward']['archivedService']['id']
+
+
+def _windows(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        window = list(islice(iterator, size))
+        if not window:
+            return
+        yield window
+
+
+def _with_archived_services(projects):
+    """Pair each of ``projects`` with the archived service it awarded, in order
+
+    Services are looked up concurrently, a window of projects at a time, each (distinct, not recently seen) service
+    being looked up once per window. Results are yielded as soon as they're ready rather than at the end of a window.
+    """
+    services = OrderedDict()
+
+    for window in _windows(projects, DIRECT_AWARD_OUTCOMES_WINDOW):
+        archived_service_ids = []
+        for archived_service_id in dict.fromkeys(_archived_service_id(project) for project in window):
+            if archived_service_id in services:
+                services.move_to_end(archived_service_id)
+            else:
+                archived_service_ids.append(archived_service_id)
+
+        archived_service_responses = zip(archived_service_ids, iter_concurrently(
+            partial(data_api_client.get_archived_service, archived_service_id=archived_service_id)
+            for archived_service_id in archived_service_ids
+        ))
+
+        for project in window:
+            if _archived_service_id(project) not in services:
+                # lookups are made in the order they're first needed, so the next one is always this project's
+                archived_service_id, archived_service_response = next(archived_service_responses)
+                services[archived_service_id] = archived_service_response['services']
+
+            yield project, services[_archived_service_id(project)]
+
+        while len(services) > DIRECT_AWARD_OUTCOMES_REMEMBERED_SERVICES:
+            services.popitem(last=False)
+
+
+def _direct_award_outcome_row(project, service):
+    awardDetails = project['outcome']['award']
+    resultOfDirectAward = project['outcome']['resultOfDirectAward']
+    user = project['users'][0]
+
+    return [
+        project['id'],  # id
+        project['name'],  # name
+        project['outcome']['completedAt'],  # 'Submitted at',
+        project['outcome']['result'],  # 'result',
+        resultOfDirectAward['archivedService']['service']['id'],  # 'Award service',
+        service['serviceName'],  # 'Award service name',
+        service['supplierId'],  # 'Award supplier id',
+        service['supplierName'],  # 'Award supplier name',
+        awardDetails['awardValue'],   # 'awardValue',
+        awardDetails['awardingOrganisationName'],  # 'awardingOrganisationName',
+        awardDetails['startDate'],  # 'awardStartDate',
+        awardDetails['endDate'],  # 'awardEndDate',
+        user['id'],  # 'User id',
+        user['name'],  # 'User name',
+        user['emailAddress'],  # 'User email',
+    ]
 
 
 @main.route('/direct-award/outcomes', methods=['GET'])
 @role_required('admin-ccs-category', 'admin-framework-manager', 'admin-ccs-sourcing')
 def download_direct_award_outcomes():
     download_filename = "direct-award-outcomes-{}.csv".format(datetime.utcnow().strftime('%Y-%m-%d-at-%H-%M-%S'))
-    projects = data_api_client.find_direct_award_projects(having_outcome=True, with_users=True).get('projects', [])
-    headers = [
-        'ID',
-        'Name',
-        'Submitted at',
-        'Result',
-        'Award service ID',
-        'Award service name',
-        'Award supplier id',
-        'Award supplier name',
-        'Award value',
-        'Awarding organisation name',
-        'Award start date',
-        'Award end date',
-        'User id',
-        'User name',
-        'User email',
-    ]
 
-    formatted_rows = []
-    formatted_rows.append(headers)   # add header row
-    for project in projects:
-        if project['outcome']['result'] != 'awarded':
-            continue
-
-        awardDetails = project['outcome']['award']
-        resultOfDirectAward = project['outcome']['resultOfDirectAward']
-        service = data_api_client.get_archived_service(
-            archived_service_id=resultOfDirectAward['archivedService']['id']
-        )['services']
-
-        user = project['users'][0]
-
-        row = [
-            project['id'],  # id
-            project['name'],  # name
-            project['outcome']['completedAt'],  # 'Submitted at',
-            project['outcome']['result'],  # 'result',
-            resultOfDirectAward['archivedService']['service']['id'],  # 'Award service',
-            service['serviceName'],  # 'Award service name',
-            service['supplierId'],  # 'Award supplier id',
-            service['supplierName'],  # 'Award supplier name',
-            awardDetails['awardValue'],   # 'awardValue',
-            awardDetails['awardingOrganisationName'],  # 'awardingOrganisationName',
-            awardDetails['startDate'],  # 'awardStartDate',
-            awardDetails['endDate'],  # 'awardEndDate',
-            user['id'],  # 'User id',
-            user['name'],  # 'User name',
-            user['emailAddress'],  # 'User email',
-        ]
-        formatted_rows.append(row)
-
-    return Response(
-        csv_generator.iter_csv(formatted_rows),
+    def formatted_rows():
+        # the header goes out before we've asked the API for anything
+        yield DIRECT_AWARD_OUTCOMES_HEADERS
+
+        with logged_duration(
+            logger=current_app.logger,
+            message="Streamed {project_count} direct award outcomes in {duration_real}s",
+            log_level=logging.INFO,
+            condition=True,
+        ) as log_context, request_memo_disabled():
+            log_context["project_count"] = 0
+            awarded_projects = (
+                project
+                for project in data_api_client.find_direct_award_projects_iter(having_outcome=True, with_users=True)
+                if project['outcome']['result'] == 'awarded'
+            )
+
+            for project, service in _with_archived_services(awarded_projects):
+                yield _direct_award_outcome_row(project, service)
+                log_context["project_count"] += 1
+
+    return compressed_streaming_response(
+        stream_with_context(csv_generator.iter_csv(formatted_rows())),
         mimetype='text/csv',
         headers={
             "Content-Disposition": "attachment;filename={}".format(download_filename),
@@ -87,16 +164,14 @@ def download_dos_outcomes():
                     fw["family"] == "digital-outcomes-and-specialists"
                     and fw["status"] == "live"
                 ),
-                data_api_client.find_frameworks()["frameworks"]
+                find_frameworks(data_api_client)
             ),
             key=lambda fw: fw["frameworkLiveAtUTC"],
             reverse=True,
         )[0]["slug"]
     )
 
-    reports_bucket = s3.S3(
-        current_app.config["DM_REPORTS_BUCKET"], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    reports_bucket = s3_bucket(current_app.config["DM_REPORTS_BUCKET"])
     url = get_signed_url(
         reports_bucket,
         f"{framework_slug}/reports/opportunity-data.csv",
@@ -1,32 +1,121 @@
+from functools import partial
+
+from dmapiclient import APIError
 from dmapiclient.audit import AuditTypes
-from dmutils import s3
-from dmutils.documents import get_signed_url
 from dmutils.flask import timed_render_template as render_template
-from flask import abort, flash, redirect, url_for, current_app
+from dmutils.flask_init import pluralize
+from flask import abort, flash, redirect, request, url_for, current_app
 from flask_login import current_user
 
 from .. import main
 from ..auth import role_required
+from ..helpers.diff_tools import forget_service_diff_tables
+from ..helpers.documents import get_signed_url
 from ... import data_api_client
+from ...concurrency import concurrently, start_in_background
+from ...s3_buckets import s3_bucket
 
 
 APPROVED_SERVICE_EDITS_MESSAGE = "The changes to service {service_id} were approved."
+APPROVED_SERVICES_EDITS_MESSAGE = (
+    "The changes made to {count} {services} before the list was loaded were approved: {service_ids}."
+)
+NOT_APPROVED_SERVICE_EDITS_MESSAGE = "The changes for edit {audit_id} were not approved: {reason}."
+NO_SERVICE_EDITS_SELECTED_MESSAGE = "Select the services whose changes you want to approve."
+
+UNAPPROVED_UPDATES_PAGES_CACHE_EXTENSION_KEY = 'unapproved_updates_pages_cache'
+
+
+def _unapproved_updates_page(page):
+    """Page ``page`` of the queue of services with unapproved updates - the earliest unapproved update of each, oldest
+    first - from the process-wide cache if it has a fresh copy"""
+    return current_app.extensions[UNAPPROVED_UPDATES_PAGES_CACHE_EXTENSION_KEY].get(
+        page,
+        lambda: data_api_client.find_audit_events(
+            audit_type=AuditTypes.update_service,
+            acknowledged='false',
+            latest_first='false',
+            earliest_for_each_object='true',
+            page=page,
+        ),
+    )
+
+
+def _forget_unapproved_updates_pages():
+    current_app.extensions[UNAPPROVED_UPDATES_PAGES_CACHE_EXTENSION_KEY].invalidate_matching(lambda page: True)
+
+
+def _latest_unapproved_update_id(service_id):
+    """The id of ``service_id``'s latest unapproved update, or None if it hasn't any"""
+    latest_update_events = data_api_client.find_audit_events(
+        object_id=service_id,
+        object_type="services",
+        audit_type=AuditTypes.update_service,
+        acknowledged="false",
+        latest_first="true",
+        per_page=1,
+    )["auditEvents"]
+    return latest_update_events[0]["id"] if latest_update_events else None
 
 
 @main.route('/services/updates/unapproved', methods=['GET'])
 @role_required('admin-ccs-category')
 def service_update_audits():
-    audit_events_response = data_api_client.find_audit_events(
-        audit_type=AuditTypes.update_service,
-        acknowledged='false',
-        latest_first='false',
-        earliest_for_each_object='true',
-    )
+    """The queue of services with unapproved updates, a page at a time
+
+    Pages follow on from a cursor: the id of the last update shown (``after``), along with the API page the queue is
+    expected to carry on from (``page``). Updates anywhere in the queue get approved while admins page through it,
+    moving later ones back onto earlier API pages, so if everything on that page comes after the cursor we look back a
+    page at a time until we find where the cursor was (starting from the last page there is, if the queue has got too
+    short to have page ``page`` any more). While the admin reads a page, the next one is fetched in the
+    background.
+
+    Each service is shown with the id of its latest unapproved update as it is now, which is what selecting it for
+    approval posts - so approving it never approves an update made after the admin loaded the page.
+    """
+    after = request.args.get('after', type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    def after_cursor(page_audit_events):
+        return [audit_event for audit_event in page_audit_events if after is None or audit_event['id'] > after]
+
+    while True:
+        try:
+            response = _unapproved_updates_page(page)
+            break
+        except APIError as e:
+            if e.status_code != 404 or page == 1:
+                raise
+            # approvals have shortened the queue so much since the link was made that this page no longer exists
+            page -= 1
+    audit_events = page_audit_events_after_cursor = after_cursor(response['auditEvents'])
+    look_back_page, page_audit_events = page, response['auditEvents']
+    while after is not None and look_back_page > 1 and len(page_audit_events_after_cursor) == len(page_audit_events):
+        # the queue is in order of id, so the cursor must be further back
+        look_back_page -= 1
+        page_audit_events = _unapproved_updates_page(look_back_page)['auditEvents']
+        page_audit_events_after_cursor = after_cursor(page_audit_events)
+        audit_events = page_audit_events_after_cursor + audit_events
+
+    next_link = None
+    if response['links'].get('next') and audit_events:
+        next_link = {'after': audit_events[-1]['id'], 'page': page + 1}
+        if current_app.extensions[UNAPPROVED_UPDATES_PAGES_CACHE_EXTENSION_KEY].ttl > 0:
+            start_in_background(partial(_unapproved_updates_page, page + 1))
+
+    latest_update_ids = concurrently(*(
+        partial(_latest_unapproved_update_id, audit_event['data']['serviceId']) for audit_event in audit_events
+    ))
 
     return render_template(
         "service_updates_unapproved.html",
-        audit_events=audit_events_response['auditEvents'],
-        has_next=bool(audit_events_response['links'].get('next')),
+        audit_events=[
+            # falling back to the update shown if the service's updates have all been approved meanwhile
+            {**audit_event, "latestUnapprovedUpdateId": latest_update_id or audit_event['id']}
+            for audit_event, latest_update_id in zip(audit_events, latest_update_ids)
+        ],
+        first_link={'page': 1} if after is not None else None,
+        next_link=next_link,
     )
 
 
@@ -46,16 +135,106 @@ def submit_service_update_approval(service_id, audit_id):
         audit_event["id"],
         current_user.email_address
     )
+    forget_service_diff_tables(service_id)
+    _forget_unapproved_updates_pages()
     flash(APPROVED_SERVICE_EDITS_MESSAGE.format(service_id=service_id))
     return redirect(url_for('.service_update_audits'))
 
 
+def _get_audit_event_or_error(audit_id):
+    """The audit event ``audit_id`` and None, or None and why it can't be approved"""
+    try:
+        audit_event = data_api_client.get_audit_event(audit_id)["auditEvents"]
+    except APIError as e:
+        if e.status_code != 404:
+            current_app.logger.warning("Failed to fetch audit event {audit_id}: {error}", extra={
+                "audit_id": audit_id, "error": e.message,
+            })
+            return None, "it couldn't be found just now, try again"
+        return None, "it doesn't exist"
+
+    if audit_event["type"] != AuditTypes.update_service.value:
+        return None, "it isn't an edit to a service"
+    if audit_event["acknowledged"]:
+        return None, "they have already been approved"
+    return audit_event, None
+
+
+def _approve_service_updates(service_id, audit_id):
+    """Approve ``service_id``'s updates up to and including ``audit_id``, returning why not if that fails"""
+    try:
+        data_api_client.acknowledge_service_update_including_previous(
+            service_id,
+            audit_id,
+            current_user.email_address,
+        )
+    except APIError as e:
+        current_app.logger.warning("Failed to approve updates to service {service_id}: {error}", extra={
+            "service_id": service_id, "error": e.message,
+        })
+        return "the API returned an error, try again"
+    return None
+
+
+@main.route('/services/updates/approve', methods=['POST'])
+@role_required('admin-ccs-category')
+def submit_service_update_approvals():
+    """Approve the updates to each service with an update among the ``audit_id``s posted, up to and including the
+    latest of them - the queue posts each selected service's latest update as it was when the page was loaded, so
+    nothing newer, which the admin can't have known about, is approved
+
+    The audit events are fetched and checked all together, then each service's updates approved, making the calls a
+    few at a time on the concurrent calls pool. Each service (or audit event) that couldn't be approved gets a message
+    of its own saying why, the rest are approved regardless.
+    """
+    audit_ids = list(dict.fromkeys(request.form.getlist('audit_id', type=int)))
+    if not audit_ids:
+        flash(NO_SERVICE_EDITS_SELECTED_MESSAGE, 'error')
+        return redirect(url_for('.service_update_audits'))
+
+    errors = {}
+    audit_ids_by_service_id = {}
+    for audit_id, (audit_event, error) in zip(
+        audit_ids,
+        concurrently(*(partial(_get_audit_event_or_error, audit_id) for audit_id in audit_ids)),
+    ):
+        if error:
+            errors[audit_id] = error
+        else:
+            service_id = audit_event["data"]["serviceId"]
+            audit_ids_by_service_id[service_id] = max(audit_id, audit_ids_by_service_id.get(service_id, audit_id))
+
+    approved_service_ids = []
+    for (service_id, audit_id), error in zip(
+        audit_ids_by_service_id.items(),
+        concurrently(*(
+            partial(_approve_service_updates, service_id, audit_id)
+            for service_id, audit_id in audit_ids_by_service_id.items()
+        )),
+    ):
+        if error:
+            errors[audit_id] = error
+        else:
+            approved_service_ids.append(service_id)
+        forget_service_diff_tables(service_id)
+    _forget_unapproved_updates_pages()
+
+    if approved_service_ids:
+        flash(APPROVED_SERVICES_EDITS_MESSAGE.format(
+            count=len(approved_service_ids),
+            services=pluralize(len(approved_service_ids), "service", "services"),
+            service_ids=", ".join(approved_service_ids),
+        ))
+    for audit_id in audit_ids:
+        if audit_id in errors:
+            flash(NOT_APPROVED_SERVICE_EDITS_MESSAGE.format(audit_id=audit_id, reason=errors[audit_id]), 'error')
+    return redirect(url_for('.service_update_audits'))
+
+
 @main.route('/services/updates/approved/<date>', methods=['GET'])
 @role_required('admin-ccs-category')
 def download_approved_service_edits(date):
-    reports_bucket = s3.S3(
-        current_app.config['DM_REPORTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    reports_bucket = s3_bucket(current_app.config['DM_REPORTS_BUCKET'])
 
     path = f"common/reports/approved-service-edits-{date}.csv"
     url = get_signed_url(reports_bucket, path, current_app.config['DM_ASSETS_URL']) or abort(404)
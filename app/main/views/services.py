@@ -1,11 +1,10 @@
 import os
 from collections import OrderedDict
-from itertools import chain, dropwhile, islice
+from functools import partial
 
 from dmapiclient import HTTPError
 from dmapiclient.audit import AuditTypes
 from dmcontent.formats import format_service_price
-from dmutils import s3  # this style of import so we only have to mock once
 from dmutils.documents import upload_service_documents
 from dmutils.flask import timed_render_template as render_template
 from dmutils.forms.errors import govuk_errors
@@ -15,11 +14,13 @@ from flask_login import current_user
 from .. import main
 from ..auth import role_required
 from ..forms import EditFrameworkStatusForm
-from ..helpers.diff_tools import html_diff_tables_from_sections_iter
-from ..helpers.frameworks import get_framework_or_404
+from ..helpers.diff_tools import cached_service_diff_tables, changed_sections_iter
+from ..helpers.frameworks import find_frameworks, get_framework_or_404, invalidate_frameworks_cache
 from ..helpers.service import filter_relevant_frameworks
 from ... import content_loader
 from ... import data_api_client
+from ...concurrency import concurrently
+from ...s3_buckets import s3_bucket
 
 
 NO_SERVICE_MESSAGE = "Could not find a service with ID: {service_id}"
@@ -42,7 +43,7 @@ ALL_ADMIN_ROLES = [
 @main.route('', methods=['GET'])
 @role_required(*ALL_ADMIN_ROLES)
 def index():
-    frameworks = data_api_client.find_frameworks()['frameworks']
+    frameworks = find_frameworks(data_api_client)
     return render_template("index.html", frameworks=filter_relevant_frameworks(frameworks))
 
 
@@ -52,7 +53,7 @@ def view_frameworks():
     if os.getenv("DM_ENVIRONMENT") == 'production':
         abort(404)  # This endpoint isn't safe in production.
 
-    frameworks = data_api_client.find_frameworks()['frameworks']
+    frameworks = find_frameworks(data_api_client)
     frameworks.sort(key=lambda x: (x['family'], x['id']), reverse=True)
 
     return render_template(
@@ -78,6 +79,8 @@ def change_framework_status(framework_slug):
         status = form.data.get('status')
 
         data_api_client.update_framework(framework_slug, {"status": status}, user=current_user.email_address)
+        invalidate_frameworks_cache()
+        current_app.extensions['framework_registry'].notify()
 
         return redirect(url_for('.view_frameworks'))
     else:
@@ -253,7 +256,7 @@ def update_service(service_id, section_id, question_slug=None):
     posted_data = section.get_data(request.form)
 
     uploaded_documents, document_errors = upload_service_documents(
-        s3.S3(current_app.config['DM_S3_DOCUMENT_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")),
+        s3_bucket(current_app.config['DM_S3_DOCUMENT_BUCKET']),
         'documents',
         current_app.config['DM_ASSETS_URL'],
         service, request.files, section)
@@ -296,50 +299,24 @@ def service_updates(service_id):
 
     supplier = data_api_client.get_supplier(service["supplierId"])["suppliers"]
 
-    common_request_kwargs = {
-        "object_id": service_id,
-        "object_type": "services",
-        "audit_type": AuditTypes.update_service,
-        "acknowledged": "false",
-    }
-
-    all_update_events = latest_update_events = oldest_update_events = None
-    latest_update_events_response = data_api_client.find_audit_events(
-        latest_first="true",
-        **common_request_kwargs
-    )
-    latest_update_events = latest_update_events_response["auditEvents"]
-
-    if latest_update_events_response["links"].get("next"):
-        # we haven't got all update events for this object. fetch the oldest
-        oldest_update_events_response = data_api_client.find_audit_events(
-            latest_first="false",
-            **common_request_kwargs
-        )
-        oldest_update_events = oldest_update_events_response["auditEvents"][::-1]
-
-        # now we check to see if we're able to splice together the full list using these two responses. we'll know this
-        # if we are able to find the last of latest_update_events in oldest_update_events. if we're not able to, we'll
-        # have to leave all_update_events as None to signal that we don't have all the events
-        if latest_update_events[-1]["id"] in (audit_event["id"] for audit_event in oldest_update_events):
-            all_update_events = tuple(audit_event for audit_event in chain(
-                latest_update_events,
-                # being careful here to swallow the actual *matching* event using islice
-                islice(dropwhile(lambda ae: ae["id"] != latest_update_events[-1]["id"], oldest_update_events), 1, None),
-            ))
-    else:
-        all_update_events = oldest_update_events = latest_update_events
+    # the service's unacknowledged updates, oldest first, summed up as we go rather than all held at once
+    update_event_count, oldest_update_event, latest_update_event, users_who_made_edits = 0, None, None, set()
+    for audit_event in data_api_client.find_audit_events_iter(
+        object_id=service_id,
+        object_type="services",
+        audit_type=AuditTypes.update_service,
+        acknowledged="false",
+        latest_first="false",
+    ):
+        update_event_count += 1
+        oldest_update_event = oldest_update_event or audit_event
+        latest_update_event = audit_event
+        users_who_made_edits.add(audit_event["user"])
 
-    # so now we should be in the position where, in all cases:
-    # - all_update_events should contain all update events unless this is not possible using two requests, in which
-    #   case it is set to None
-    # - latest_update_events[0] and oldest_update_events[-1] should contain the latest and oldest update events
-    #   respectively
     extra_context = {}
-    if latest_update_events:
-        archived_service_response = data_api_client.get_archived_service(
-            oldest_update_events[-1]["data"]["oldArchivedServiceId"]
-        )
+    if latest_update_event:
+        extra_context["archived_service_id"] = archived_service_id = oldest_update_event["data"]["oldArchivedServiceId"]
+        archived_service_response = data_api_client.get_archived_service(archived_service_id)
 
         if archived_service_response is None:
             raise ValueError("referenced archived_service_id does not exist?")
@@ -352,28 +329,73 @@ def service_updates(service_id):
             'edit_service_as_admin',
         ).filter(service, inplace_allowed=True).sections
 
-        extra_context["diffs"] = OrderedDict(
-            (question_id, table_html,)
-            for section_slug, question_id, table_html in html_diff_tables_from_sections_iter(
-                sections=sections,
-                revision_1=archived_service,
-                revision_2=service,
-                table_preamble_template="diff_table/_table_preamble.html",
-            )
+        lazy_min_changed_questions = current_app.config['DM_SERVICE_DIFFS_LAZY_MIN_CHANGED_QUESTIONS']
+        changed_sections = () if lazy_min_changed_questions is None else tuple(
+            changed_sections_iter(sections, archived_service, service)
         )
+        if changed_sections and sum(count for _, count in changed_sections) >= lazy_min_changed_questions:
+            # too much to diff before showing the page - list the changed sections and let each one's diffs be fetched
+            # from service_update_section_diffs when it's looked at
+            extra_context["changed_sections"] = changed_sections
+        else:
+            extra_context["diffs"] = OrderedDict(cached_service_diff_tables(
+                service,
+                archived_service_id,
+                archived_service,
+                sections,
+                content_loader,
+                table_preamble_template="diff_table/_table_preamble.html",
+            ))
 
     return render_template(
         "compare_revisions.html",
         service=service,
         supplier=supplier,
-        all_update_events=all_update_events,
-        latest_update_events=latest_update_events,
-        oldest_update_events=oldest_update_events,
-        # below number of users who made edits might not be reliable if over 2 default length pages
-        # (100 edits per page at the time of writing) of unapproved edits per service were made
-        min_number_of_users_who_made_edits=len(frozenset(audit_event["user"] for audit_event in chain(
-            latest_update_events,
-            oldest_update_events,
-        ))),
+        update_event_count=update_event_count,
+        oldest_update_event=oldest_update_event,
+        latest_update_event=latest_update_event,
+        number_of_users_who_made_edits=len(users_who_made_edits),
         **extra_context
     )
+
+
+@main.route('/services/<service_id>/updates/<archived_service_id>/sections/<section_slug>', methods=['GET'])
+@role_required('admin-ccs-category')
+def service_update_section_diffs(service_id, archived_service_id, section_slug):
+    """The diffs of one section of a service's unapproved changes, as fetched by the service updates page when it's
+    only listed the changed sections - just the tables when requested by script, otherwise as a page of their own"""
+    service_response, archived_service_response = concurrently(
+        partial(data_api_client.get_service, service_id),
+        partial(data_api_client.get_archived_service, archived_service_id),
+    )
+    if service_response is None or archived_service_response is None:
+        abort(404)
+    service, archived_service = service_response['services'], archived_service_response['services']
+    if str(archived_service['id']) != service_id:
+        abort(404)
+
+    sections = content_loader.get_manifest(
+        service['frameworkSlug'],
+        'edit_service_as_admin',
+    ).filter(service, inplace_allowed=True).sections
+    section = next((section for section in sections if section.slug == section_slug), None) or abort(404)
+
+    diffs = OrderedDict(cached_service_diff_tables(
+        service,
+        archived_service_id,
+        archived_service,
+        sections,
+        content_loader,
+        table_preamble_template="diff_table/_table_preamble.html",
+        section_slug=section_slug,
+    ))
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return render_template("diff_table/_section_diffs.html", diffs=diffs)
+
+    return render_template(
+        "service_update_section_diffs.html",
+        service=service,
+        section=section,
+        diffs=diffs,
+    )
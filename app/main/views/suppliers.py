@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from functools import partial
 from itertools import groupby, chain
 from operator import itemgetter
 
@@ -7,11 +8,10 @@ from dmcontent.errors import ContentNotFoundError
 from dmcontent.utils import count_unanswered_questions
 from dmapiclient import HTTPError, APIError
 from dmapiclient.audit import AuditTypes
-from dmutils import s3
 from dmutils.config import convert_to_boolean
 from dmutils.documents import (
     AGREEMENT_FILENAME, COUNTERPART_FILENAME,
-    file_is_pdf, get_document_path, get_extension, get_signed_url,
+    file_is_pdf, get_document_path, get_extension,
     generate_timestamped_document_upload_path, degenerate_document_path_and_return_doc_name,
     generate_download_filename, upload_declaration_documents)
 from dmutils.email import send_user_account_email
@@ -32,6 +32,8 @@ from ..forms import (
     EditSupplierRegisteredNameForm
 )
 from ..helpers.countries import COUNTRY_TUPLE
+from ..helpers.documents import forget_signed_url, get_signed_url
+from ..helpers.frameworks import find_frameworks
 from ..helpers.pagination import get_nav_args_from_api_response_links
 from ..helpers.supplier_details import (
     get_supplier_frameworks_visible_for_role,
@@ -39,6 +41,8 @@ from ..helpers.supplier_details import (
     DEPRECATED_FRAMEWORK_SLUGS,
 )
 from ... import data_api_client, content_loader
+from ...concurrency import concurrently
+from ...s3_buckets import s3_bucket
 
 
 AGREEMENT_ON_HOLD_MESSAGE = 'The agreement for {organisation_name} was put on hold.'
@@ -51,6 +55,14 @@ COUNTERSIGNED_AGREEMENT_NOT_PDF_MESSAGE = "Countersigned agreement file is not a
 SUPPLIER_SERVICES_REMOVED_MESSAGE = "You suspended all {framework_name} services for ‘{supplier_name}’."
 SUPPLIER_SERVICES_UNSUSPENDED_MESSAGE = "You unsuspended all {framework_name} services for ‘{supplier_name}’."
 SUPPLIER_SERVICES_DELAYED_INDEX_MESSAGE = "Search results may take a few minutes to be updated."
+SUPPLIER_SERVICES_NOT_REMOVED_MESSAGE = (
+    "{failed_count} of {count} {framework_name} services for ‘{supplier_name}’ could not be suspended: "
+    "{service_ids}. Suspend all services again to retry them."
+)
+SUPPLIER_SERVICES_NOT_UNSUSPENDED_MESSAGE = (
+    "{failed_count} of {count} {framework_name} services for ‘{supplier_name}’ could not be unsuspended: "
+    "{service_ids}. Unsuspend all services again to retry them."
+)
 SUPPLIER_USER_MESSAGES = {
     'user_invited': 'User invited',
     'user_moved': 'User moved to this supplier',
@@ -82,7 +94,7 @@ def find_suppliers():
         suppliers = suppliers_response['suppliers']
         links = suppliers_response["links"]
 
-    frameworks = data_api_client.find_frameworks()['frameworks']
+    frameworks = find_frameworks(data_api_client)
     try:
         oldest_interesting_framework_id = [
             fw for fw in frameworks if fw['slug'] == OLDEST_INTERESTING_FRAMEWORK_SLUG
@@ -114,9 +126,11 @@ def find_suppliers():
     "admin", "admin-ccs-category", "admin-ccs-data-controller", "admin-framework-manager", "admin-ccs-sourcing"
 )
 def supplier_details(supplier_id):
-    frameworks = data_api_client.find_frameworks()["frameworks"]
-    supplier = data_api_client.get_supplier(supplier_id)["suppliers"]
-    supplier_frameworks = data_api_client.get_supplier_frameworks(supplier_id)["frameworkInterest"]
+    frameworks, supplier, supplier_frameworks = concurrently(
+        lambda: find_frameworks(data_api_client),
+        lambda: data_api_client.get_supplier(supplier_id)["suppliers"],
+        lambda: data_api_client.get_supplier_frameworks(supplier_id)["frameworkInterest"],
+    )
 
     # Get SupplierFrameworks for frameworks the role is interested in, sorted by oldest frameworkLiveAtUTC first
     visible_supplier_frameworks = get_supplier_frameworks_visible_for_role(
@@ -195,7 +209,7 @@ def edit_supplier_registered_name(supplier_id):
 @role_required('admin-ccs-data-controller')
 def edit_supplier_registered_company_number(supplier_id):
     supplier = data_api_client.get_supplier(supplier_id)['suppliers']
-    frameworks = data_api_client.find_frameworks()['frameworks']
+    frameworks = find_frameworks(data_api_client)
 
     # Take the registered company numbers from the supplier, as we need to know which type it is (CH or other)
     prefill_data = {
@@ -377,11 +391,13 @@ def view_signed_agreement(supplier_id, framework_slug):
     # not properly validating this - all we do is pass it through
     next_status = request.args.get("next_status")
 
-    supplier = data_api_client.get_supplier(supplier_id)['suppliers']
-    framework = data_api_client.get_framework(framework_slug)['frameworks']
+    supplier, framework, supplier_framework = concurrently(
+        lambda: data_api_client.get_supplier(supplier_id)['suppliers'],
+        lambda: data_api_client.get_framework(framework_slug)['frameworks'],
+        lambda: data_api_client.get_supplier_framework_info(supplier_id, framework_slug)['frameworkInterest'],
+    )
     if not framework.get('frameworkAgreementVersion'):
         abort(404)
-    supplier_framework = data_api_client.get_supplier_framework_info(supplier_id, framework_slug)['frameworkInterest']
     if not supplier_framework.get('agreementReturned'):
         abort(404)
 
@@ -399,9 +415,7 @@ def view_signed_agreement(supplier_id, framework_slug):
             if service["status"] == "submitted" and service['lotName'] not in lot_names:
                 lot_names.append(service['lotName'])
 
-    agreements_bucket = s3.S3(
-        current_app.config['DM_AGREEMENTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    agreements_bucket = s3_bucket(current_app.config['DM_AGREEMENTS_BUCKET'])
 
     is_e_signature_flow = framework['isESignatureSupported']
     if not is_e_signature_flow:
@@ -512,9 +526,7 @@ def download_agreement_file(supplier_id, framework_slug, document_name):
     if supplier_framework is None or not supplier_framework.get("declaration"):
         abort(404)
 
-    agreements_bucket = s3.S3(
-        current_app.config['DM_AGREEMENTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    agreements_bucket = s3_bucket(current_app.config['DM_AGREEMENTS_BUCKET'])
     path = get_document_path(framework_slug, supplier_id, 'agreements', document_name)
     url = get_signed_url(agreements_bucket, path, current_app.config['DM_ASSETS_URL'])
     if not url:
@@ -526,14 +538,14 @@ def download_agreement_file(supplier_id, framework_slug, document_name):
 @main.route('/suppliers/<int:supplier_id>/countersigned-agreements/<framework_slug>', methods=['GET'])
 @role_required('admin-ccs-sourcing')
 def list_countersigned_agreement_file(supplier_id, framework_slug):
-    supplier = data_api_client.get_supplier(supplier_id)['suppliers']
-    framework = data_api_client.get_framework(framework_slug)['frameworks']
-    supplier_framework = data_api_client.get_supplier_framework_info(supplier_id, framework_slug)['frameworkInterest']
+    supplier, framework, supplier_framework = concurrently(
+        lambda: data_api_client.get_supplier(supplier_id)['suppliers'],
+        lambda: data_api_client.get_framework(framework_slug)['frameworks'],
+        lambda: data_api_client.get_supplier_framework_info(supplier_id, framework_slug)['frameworkInterest'],
+    )
     if not supplier_framework['onFramework'] or supplier_framework['agreementStatus'] in (None, 'draft'):
         abort(404)
-    agreements_bucket = s3.S3(
-        current_app.config['DM_AGREEMENTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    agreements_bucket = s3_bucket(current_app.config['DM_AGREEMENTS_BUCKET'])
     countersigned_agreement_document = agreements_bucket.get_key(supplier_framework.get('countersignedPath'))
 
     remove_countersigned_agreement_confirm = convert_to_boolean(request.args.get('remove_countersigned_agreement'))
@@ -560,9 +572,7 @@ def upload_countersigned_agreement_file(supplier_id, framework_slug):
     if not supplier_framework['onFramework'] or supplier_framework['agreementStatus'] in (None, 'draft'):
         abort(404)
     agreement_id = supplier_framework['agreementId']
-    agreements_bucket = s3.S3(
-        current_app.config['DM_AGREEMENTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    agreements_bucket = s3_bucket(current_app.config['DM_AGREEMENTS_BUCKET'])
     errors = {}
 
     if request.files.get('countersigned_agreement'):
@@ -618,9 +628,7 @@ def upload_countersigned_agreement_file(supplier_id, framework_slug):
 def remove_countersigned_agreement_file(supplier_id, framework_slug):
     supplier_framework = data_api_client.get_supplier_framework_info(supplier_id, framework_slug)['frameworkInterest']
     document = supplier_framework.get('countersignedPath')
-    agreements_bucket = s3.S3(
-        current_app.config['DM_AGREEMENTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    agreements_bucket = s3_bucket(current_app.config['DM_AGREEMENTS_BUCKET'])
 
     if request.method == 'GET':
         return redirect(url_for(
@@ -638,6 +646,7 @@ def remove_countersigned_agreement_file(supplier_id, framework_slug):
             current_user.email_address
         )
         agreements_bucket.delete_key(document)
+        forget_signed_url(agreements_bucket, document)
 
         data_api_client.create_audit_event(
             audit_type=AuditTypes.delete_countersigned_agreement,
@@ -709,10 +718,7 @@ def update_supplier_declaration_section(supplier_id, framework_slug, section_id)
     posted_data = section.get_data(request.form)
 
     uploaded_documents, document_errors = upload_declaration_documents(
-        uploader=s3.S3(
-            current_app.config['DM_S3_DOCUMENT_BUCKET'],
-            endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-        ),
+        uploader=s3_bucket(current_app.config['DM_S3_DOCUMENT_BUCKET']),
         upload_type='documents',
         documents_url=current_app.config['DM_ASSETS_URL'],
         request_files=request.files,
@@ -845,7 +851,7 @@ def find_supplier_services(supplier_id):
     remove_services_for_framework_slug = request.args.get('remove')
     publish_services_for_framework_slug = request.args.get('publish')
 
-    frameworks = data_api_client.find_frameworks()['frameworks']
+    frameworks = find_frameworks(data_api_client)
     supplier = data_api_client.get_supplier(supplier_id)["suppliers"]
 
     frameworks_services = {
@@ -890,6 +896,24 @@ def find_supplier_services(supplier_id):
     )
 
 
+def _update_service_status(service_id, new_status):
+    """Set ``service_id``'s status to ``new_status``, returning whether that worked"""
+    try:
+        data_api_client.update_service_status(
+            service_id,
+            new_status,
+            current_user.email_address,
+            wait_for_index=False,
+        )
+    except APIError as e:
+        current_app.logger.warning(
+            "Failed to set service {service_id} status to {new_status}: {error}",
+            extra={"service_id": service_id, "new_status": new_status, "error": e.message},
+        )
+        return False
+    return True
+
+
 @main.route('/suppliers/<int:supplier_id>/services', methods=['POST'])
 @role_required('admin-ccs-category')
 def toggle_supplier_services(supplier_id):
@@ -900,7 +924,12 @@ def toggle_supplier_services(supplier_id):
         'framework_slug': remove_services or publish_services,
         'old_status': 'published' if remove_services else 'disabled',
         'new_status': 'disabled' if remove_services else 'published',
-        'flash_message': SUPPLIER_SERVICES_REMOVED_MESSAGE if remove_services else SUPPLIER_SERVICES_UNSUSPENDED_MESSAGE
+        'flash_message': (
+            SUPPLIER_SERVICES_REMOVED_MESSAGE if remove_services else SUPPLIER_SERVICES_UNSUSPENDED_MESSAGE
+        ),
+        'failure_message': (
+            SUPPLIER_SERVICES_NOT_REMOVED_MESSAGE if remove_services else SUPPLIER_SERVICES_NOT_UNSUSPENDED_MESSAGE
+        ),
     }
     if not toggle_action['framework_slug']:
         abort(400, 'Invalid framework')
@@ -917,23 +946,37 @@ def toggle_supplier_services(supplier_id):
     if not services:
         abort(400, 'No {} services on framework'.format(toggle_action['old_status']))
 
-    for service in services:
-        data_api_client.update_service_status(
-            service['id'],
-            toggle_action['new_status'],
-            current_user.email_address,
-            wait_for_index=False,
-        )
-
-    flash(
-        " ".join((
-            toggle_action['flash_message'].format(
+    # a few at a time, so suppliers with hundreds of services don't take so long the request times out - only services
+    # still with the old status are found, so toggling again just retries any that failed
+    failed_service_ids = [
+        service['id']
+        for service, updated in zip(services, concurrently(*(
+            partial(_update_service_status, service['id'], toggle_action['new_status']) for service in services
+        )))
+        if not updated
+    ]
+
+    if failed_service_ids:
+        flash(
+            toggle_action['failure_message'].format(
+                failed_count=len(failed_service_ids),
+                count=len(services),
+                framework_name=services[0]['frameworkName'],
                 supplier_name=services[0]['supplierName'],
-                framework_name=services[0]['frameworkName']
+                service_ids=", ".join(failed_service_ids),
             ),
-            SUPPLIER_SERVICES_DELAYED_INDEX_MESSAGE,
-        ))
-    )
+            'error',
+        )
+    else:
+        flash(
+            " ".join((
+                toggle_action['flash_message'].format(
+                    supplier_name=services[0]['supplierName'],
+                    framework_name=services[0]['frameworkName']
+                ),
+                SUPPLIER_SERVICES_DELAYED_INDEX_MESSAGE,
+            ))
+        )
     return redirect(url_for('.find_supplier_services', supplier_id=supplier_id))
 
 
@@ -957,7 +1000,7 @@ def _draft_services_annotated_unanswered_counts(framework_slug, draft_services):
 @role_required('admin-framework-manager', 'admin-ccs-sourcing')
 def find_supplier_draft_services(supplier_id):
     supplier = data_api_client.get_supplier(supplier_id)["suppliers"]
-    frameworks = data_api_client.find_frameworks()['frameworks']
+    frameworks = find_frameworks(data_api_client)
 
     if current_user.has_role('admin-ccs-sourcing'):
         visible_framework_statuses = ["pending", "standstill", "live", "expired"]
@@ -1,17 +1,19 @@
 from datetime import datetime
 
-from dmutils import s3
-from dmutils.documents import get_signed_url
 from dmutils.flask import timed_render_template as render_template
 from dmutils.forms.errors import get_errors_from_wtform
-from flask import abort, current_app, flash, redirect, request, Response, url_for
+from flask import abort, current_app, flash, redirect, request, url_for
 from flask_login import current_user
 
 from ..forms import EditUserNameForm
+from ..helpers.compression import compressed_streaming_response
+from ..helpers.documents import get_signed_url
+from ..helpers.frameworks import find_frameworks
 from ..helpers.user_downloads import generate_user_csv
 from .. import main
 from ..auth import role_required
 from ... import data_api_client
+from ...s3_buckets import s3_bucket
 
 CLOSED_BRIEF_STATUSES = ['closed', 'awarded', 'cancelled', 'unsuccessful']
 
@@ -88,9 +90,7 @@ def user_list_page_for_framework(framework_slug):
 @main.route('/frameworks/<framework_slug>/users/<report_type>/download', methods=['GET'])
 @role_required('admin-framework-manager', 'admin-ccs-category', 'admin-ccs-data-controller')
 def download_supplier_user_list_report(framework_slug, report_type):
-    reports_bucket = s3.S3(
-        current_app.config['DM_REPORTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    reports_bucket = s3_bucket(current_app.config['DM_REPORTS_BUCKET'])
 
     if report_type == 'official':
         path = f"{framework_slug}/reports/official-details-for-suppliers-{framework_slug}.csv"
@@ -109,7 +109,7 @@ def download_supplier_user_list_report(framework_slug, report_type):
 @main.route('/users/download/suppliers', methods=['GET'])
 @role_required('admin-framework-manager')
 def supplier_user_research_participants_by_framework():
-    frameworks = data_api_client.find_frameworks().get("frameworks")
+    frameworks = find_frameworks(data_api_client)
     frameworks = sorted(
         (fw for fw in frameworks if not (fw['status'] == 'coming' or (
             fw['status'] == 'expired' and fw['family'] != 'digital-outcomes-and-specialists'
@@ -135,9 +135,7 @@ def supplier_user_research_participants_by_framework():
 @role_required('admin-framework-manager')
 def download_supplier_user_research_report(framework_slug):
 
-    reports_bucket = s3.S3(
-        current_app.config['DM_REPORTS_BUCKET'], endpoint_url=current_app.config.get("DM_S3_ENDPOINT_URL")
-    )
+    reports_bucket = s3_bucket(current_app.config['DM_REPORTS_BUCKET'])
     path = "{framework_slug}/reports/user-research-suppliers-on-{framework_slug}.csv"
     url = get_signed_url(
         reports_bucket, path.format(framework_slug=framework_slug), current_app.config['DM_ASSETS_URL']
@@ -155,7 +153,7 @@ def download_buyers():
     download_filename = "all-buyers-on-{}.csv".format(datetime.utcnow().strftime('%Y-%m-%d-at-%H-%M-%S'))
     users = data_api_client.find_users_iter(role="buyer")
 
-    return Response(
+    return compressed_streaming_response(
         generate_user_csv(users),
         mimetype='text/csv',
         headers={
@@ -175,7 +173,7 @@ def download_buyers_for_user_research():
 
     download_filename = "user-research-buyers-on-{}.csv".format(datetime.utcnow().strftime('%Y-%m-%d-at-%H-%M-%S'))
 
-    return Response(
+    return compressed_streaming_response(
         generate_user_csv(users),
         mimetype='text/csv',
         headers={
@@ -0,0 +1,203 @@
+import copyreg
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from types import MappingProxyType
+
+import dmcontent
+from dmcontent.content_loader import ContentLoader, ContentManifest
+from dmcontent.errors import ContentNotFoundError
+from dmcontent.utils import TemplateField
+
+
+# bump this whenever a change is made to what goes into a manifest snapshot
+MANIFEST_SNAPSHOT_FORMAT_VERSION = 1
+
+
+# TemplateFields hold compiled jinja templates, which can't be pickled - so pickle the source they were made from
+# instead, leaving unpickling to recompile it
+copyreg.pickle(TemplateField, lambda field: (TemplateField, (field.source, field.markdown,)))
+
+
+def content_fingerprint(content_path):
+    """Return a digest of every file making up the frameworks content under `content_path`
+
+    This is what we use to tell whether a manifest snapshot was built from the content we have now. Hashing the files
+    is still far cheaper than parsing them all as yaml.
+    """
+    digest = hashlib.sha256()
+    frameworks_path = os.path.join(content_path, "frameworks")
+    for dirpath, dirnames, filenames in os.walk(frameworks_path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            file_path = os.path.join(dirpath, filename)
+            digest.update(os.path.relpath(file_path, frameworks_path).encode("utf-8"))
+            with open(file_path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+
+    return digest.hexdigest()
+
+
+class SharedContentLoader(ContentLoader):
+    """A ContentLoader which a whole process can share between its threads.
+
+    Manifest data, once loaded, is treated as immutable: each framework's manifests are held in a read-only mapping
+    which is *replaced* (under a lock) rather than modified when a new manifest is loaded, so a reader never sees a
+    half-populated structure. `get_manifest` hands out a fresh `ContentManifest` wrapping the shared section data,
+    which is what `.filter(..., inplace_allowed=True)` and `.summary(..., inplace_allowed=True)` go on to modify - those
+    per-call objects act as a lightweight overlay on top of the shared data, so there's no need to give each thread
+    its own deep copy of everything.
+
+    Manifests can also be registered to be loaded lazily, the first time `get_manifest` asks for them, and optionally
+    loaded ahead of time by `warm_up`.
+    """
+
+    def __init__(self, content_path):
+        super().__init__(content_path)
+        self._lock = threading.RLock()
+        # mapping of (framework_slug, manifest) to the question_set needed to load it on demand
+        self._registered_manifests = {}
+        # registered manifests we've already failed to find, so we don't go looking for them on every request
+        self._missing_manifests = set()
+        self._content_version = None
+
+    def get_manifest(self, framework_slug, manifest):
+        # careful to use .get() here - self._content is a defaultdict and we don't want readers inserting into it
+        sections = self._content.get(framework_slug, {}).get(manifest)
+        if sections is None:
+            sections = self._load_registered_manifest(framework_slug, manifest)
+
+        return ContentManifest(sections)
+
+    get_builder = get_manifest
+
+    def has_manifest(self, framework_slug, manifest):
+        return manifest in self._content.get(framework_slug, {})
+
+    def register_manifest(self, framework_slug, question_set, manifest):
+        """Make a manifest available to be loaded on demand the first time `get_manifest` is called for it"""
+        with self._lock:
+            self._registered_manifests[(framework_slug, manifest)] = question_set
+            # give a manifest we previously failed to find another chance - its content may have arrived since
+            self._missing_manifests.discard((framework_slug, manifest))
+
+    def get_registered_manifests(self, framework_slug):
+        return tuple(
+            manifest for slug, manifest in tuple(self._registered_manifests) if slug == framework_slug
+        )
+
+    def _load_registered_manifest(self, framework_slug, manifest):
+        with self._lock:
+            # another thread may have got here first
+            if self.has_manifest(framework_slug, manifest):
+                return self._content[framework_slug][manifest]
+
+            question_set = self._registered_manifests.get((framework_slug, manifest))
+            if question_set is None or (framework_slug, manifest) in self._missing_manifests:
+                raise ContentNotFoundError("Content not found for {} and {}".format(framework_slug, manifest))
+
+            try:
+                self.load_manifest(framework_slug, question_set, manifest)
+            except ContentNotFoundError:
+                self._missing_manifests.add((framework_slug, manifest))
+                raise
+
+            return self._content[framework_slug][manifest]
+
+    def warm_up(self, framework_slugs, on_missing=None):
+        """Load all registered manifests for `framework_slugs`, in the order given
+
+        :param on_missing: optional callable accepting ``(manifest, framework_slug)``, called for each registered
+                           manifest that turns out not to exist
+        """
+        for framework_slug in framework_slugs:
+            for manifest in self.get_registered_manifests(framework_slug):
+                try:
+                    self.get_manifest(framework_slug, manifest)
+                except ContentNotFoundError:
+                    if on_missing:
+                        on_missing(manifest, framework_slug)
+
+    def load_manifest(self, framework_slug, question_set, manifest):
+        with self._lock:
+            if self.has_manifest(framework_slug, manifest):
+                return None
+
+            sections = tuple(self.generate_manifest(framework_slug, question_set, manifest))
+            self._content[framework_slug] = MappingProxyType({
+                **self._content.get(framework_slug, {}),
+                manifest: sections,
+            })
+            return sections
+
+    @property
+    def content_version(self):
+        """A digest of the frameworks content this loader loads manifests from, worked out the first time it's needed
+
+        Manifests are never reloaded once loaded, so this stands for the version of every manifest the loader hands out
+        - anything derived from them can be cached against it.
+        """
+        if self._content_version is None:
+            self._content_version = content_fingerprint(self.content_path)
+        return self._content_version
+
+    def _snapshot_version(self):
+        return (MANIFEST_SNAPSHOT_FORMAT_VERSION, dmcontent.__version__, content_fingerprint(self.content_path),)
+
+    def save_snapshot(self, snapshot_path):
+        """Write all currently loaded manifests to `snapshot_path` for a later `load_snapshot` to pick up"""
+        with self._lock:
+            content = {framework_slug: dict(manifests) for framework_slug, manifests in self._content.items()}
+
+        # write to a temporary file first so a reader can never see a partially written snapshot
+        tmp_path = f"{snapshot_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            # the version goes in first, on its own, so that a stale snapshot can be rejected without unpickling the
+            # rest of it
+            pickle.dump(self._snapshot_version(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+
+    def load_snapshot(self, snapshot_path, logger=None):
+        """Load manifests from a snapshot written by `save_snapshot`, rather than parsing the content's yaml
+
+        :param logger: where to warn about a snapshot that's there but can't be read
+        :return: True if the snapshot was loaded, False if it's missing, unreadable (truncated, say, or pickled by an
+                 incompatible version of Python or a library) or was built from different content (or with a different
+                 version of this code), in which case nothing is loaded
+        """
+        try:
+            with open(snapshot_path, "rb") as f:
+                if pickle.load(f) != self._snapshot_version():
+                    return False
+                content = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError) as e:
+            (logger or logging.getLogger(__name__)).warning(
+                "Failed to load manifest snapshot {snapshot_path}: {error}",
+                extra={"snapshot_path": snapshot_path, "error": repr(e)},
+            )
+            return False
+
+        with self._lock:
+            for framework_slug, manifests in content.items():
+                self._content[framework_slug] = MappingProxyType({
+                    **manifests,
+                    **self._content.get(framework_slug, {}),
+                })
+
+        return True
+
+    def get_question(self, framework_slug, question_set, question):
+        # the question cache is populated as a side effect of loading manifests
+        with self._lock:
+            return super().get_question(framework_slug, question_set, question)
+
+    def lazy_load_manifests(self, framework_slug, manifests_to_question_sets):
+        """Register each of ``manifests_to_question_sets`` (a mapping of manifest to question_set) to be loaded on
+        demand, in place of `ContentLoader`'s own lazy loading"""
+        for manifest, question_set in manifests_to_question_sets.items():
+            self.register_manifest(framework_slug, question_set, manifest)
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+
+PROCESS_POOL_EXTENSION_KEY = 'process_pool'
+
+
+class ProcessPool:
+    """A small pool of worker processes for CPU-bound work (diffing, say), so it doesn't hold the GIL on request threads
+
+    The worker processes are only started the first time they're needed, and are spawned rather than forked - forking
+    a process already running request threads risks copying a lock some other thread holds. A pool inherited across a
+    fork starts again with workers of its own.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = os.getpid()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # the parent's workers belong to the parent
+                self._executor = None
+                self._pid = os.getpid()
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def map(self, fn, *iterables):
+        """Return the list of results of ``fn`` applied to each set of items from ``iterables`` (as the builtin `map`),
+        worked out by the pool's processes
+
+        ``fn`` and the items have to be picklable. If the pool has broken - one of its processes died - it's replaced
+        for next time, and these calls are made here instead.
+        """
+        iterables = [list(iterable) for iterable in iterables]
+        executor = self._get_executor()
+        try:
+            return list(executor.map(fn, *iterables))
+        except BrokenProcessPool:
+            current_app.logger.warning("Process pool broken, replacing it")
+            self._discard_executor(executor)
+            return list(map(fn, *iterables))
+
+
+def init_app(application):
+    """Give ``application`` a `ProcessPool` of DM_PROCESS_POOL_MAX_WORKERS processes, or none if that's 0"""
+    max_workers = application.config['DM_PROCESS_POOL_MAX_WORKERS']
+    application.extensions[PROCESS_POOL_EXTENSION_KEY] = ProcessPool(max_workers) if max_workers > 0 else None
+
+
+def process_pool():
+    """The current app's `ProcessPool`, or None if it hasn't got one"""
+    return current_app.extensions.get(PROCESS_POOL_EXTENSION_KEY)
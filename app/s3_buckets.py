@@ -0,0 +1,62 @@
+import os
+import threading
+
+from botocore.config import Config as BotocoreConfig
+from dmutils import s3  # this style of import so we only have to mock once
+from flask import current_app
+
+
+BUCKETS_EXTENSION_KEY = 's3_buckets'
+
+
+class S3Buckets:
+    """Per-process registry of `dmutils.s3.S3` instances, one per bucket for each thread, reused between requests
+
+    Building an `S3` sets up a whole new boto3 resource - client, endpoint and connection pool - so doing it for every
+    request throws away already-open connections and repeats the setup each time. The registry builds each bucket's
+    `S3` the first time a thread asks for it and hands that thread the same instance from then on. Request threads and
+    the concurrent calls pool's threads live as long as the process, so the connections are still reused.
+
+    An `S3` wraps a boto3 resource and its `Bucket`, and boto3 resources aren't safe to share between threads, hence
+    an instance per thread rather than one for the whole process - only the botocore config is shared. Creating one
+    goes through boto3's default session, which isn't thread safe either, so that's done under a lock. A registry
+    inherited across a fork starts again from empty, as the parent's connections can't be shared with it.
+    """
+
+    def __init__(self, endpoint_url=None, max_pool_connections=None):
+        self._endpoint_url = endpoint_url
+        self._botocore_config = BotocoreConfig(max_pool_connections=max_pool_connections) \
+            if max_pool_connections else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get(self, bucket_name):
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.buckets = {}
+            self._local.pid = os.getpid()
+
+        try:
+            return self._local.buckets[bucket_name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            bucket = self._local.buckets[bucket_name] = s3.S3(
+                bucket_name,
+                endpoint_url=self._endpoint_url,
+                **({"config": self._botocore_config} if self._botocore_config else {}),
+            )
+        return bucket
+
+
+def init_app(application):
+    """Give ``application`` an (empty) `S3Buckets`, with connection pools of DM_S3_MAX_POOL_CONNECTIONS per bucket"""
+    application.extensions[BUCKETS_EXTENSION_KEY] = S3Buckets(
+        endpoint_url=application.config.get("DM_S3_ENDPOINT_URL"),
+        max_pool_connections=application.config["DM_S3_MAX_POOL_CONNECTIONS"],
+    )
+
+
+def s3_bucket(bucket_name):
+    """The current app's `dmutils.s3.S3` for ``bucket_name``, for this thread"""
+    return current_app.extensions[BUCKETS_EXTENSION_KEY].get(bucket_name)
@@ -34,6 +34,51 @@ class Config(object):
     DM_ASSETS_URL = None
     DM_REDIS_SERVICE_NAME = None
 
+    # load framework manifests in a background thread on startup rather than waiting for them to be asked for
+    DM_WARM_UP_MANIFESTS = True
+    # generated by scripts/build_manifest_snapshot.py - if missing or out of date, manifests are loaded from yaml
+    DM_MANIFEST_SNAPSHOT_PATH = 'app/content/manifest-snapshot.pickle'
+    # if set, the framework list is persisted here and startup uses it rather than waiting on the API
+    DM_FRAMEWORKS_SNAPSHOT_PATH = None
+    # how often (in seconds) to check the API for new frameworks, so their manifests become available without a restart
+    DM_FRAMEWORK_REGISTRY_POLL_INTERVAL = 300
+    # how long (in seconds) views can reuse the framework list before asking the API for it again
+    DM_FRAMEWORKS_CACHE_TTL = 60
+    # upper limit on the number of independent API calls a process will make at once for `concurrently`
+    DM_CONCURRENT_CALLS_MAX_WORKERS = 8
+    # upper limit on the number of calls any one `concurrently` can have waiting on or running in that pool at once
+    DM_CONCURRENT_CALLS_MAX_IN_FLIGHT = 4
+    # size of the connection pool of each S3 bucket's (per-thread) client
+    DM_S3_MAX_POOL_CONNECTIONS = 16
+    # how long (in seconds) signed S3 download URLs are valid for
+    DM_SIGNED_URL_EXPIRES_IN = 30
+    # how long (in seconds) a signed download URL is handed out again for - it has to still be valid by the time the
+    # browser follows the redirect to it, so keep this well short of DM_SIGNED_URL_EXPIRES_IN
+    DM_SIGNED_URL_CACHE_TTL = 20
+    # how long (in seconds) to remember that a download's S3 key doesn't exist
+    DM_S3_MISSING_KEY_CACHE_TTL = 5
+    # how long (in seconds) a framework's communications listings are reused for - they're refreshed straight away when
+    # files are uploaded or deleted by the same process, but changes made by any other process (or outside the admin
+    # app altogether) only show up once this process's copy expires, so keep it short
+    DM_COMMUNICATIONS_LISTINGS_CACHE_TTL = 10
+    # how long (in seconds) the rendered diffs of a service's unapproved changes are kept for, and how many of them
+    DM_SERVICE_DIFFS_CACHE_TTL = 600
+    DM_SERVICE_DIFFS_CACHE_MAX_SIZE = 200
+    # how many changed answers a service's unapproved changes need before the page only lists the changed sections,
+    # leaving each section's diffs to be fetched separately when it's looked at (None to always show every diff)
+    DM_SERVICE_DIFFS_LAZY_MIN_CHANGED_QUESTIONS = 20
+    # how long (in seconds) pages of the queue of unapproved service updates are reused for - long enough for the next
+    # page to be fetched in the background while an admin reads one, short enough that approvals made by another
+    # process (which can't drop this one's copies) show up almost straight away
+    DM_UNAPPROVED_UPDATES_PAGES_CACHE_TTL = 5
+    # how changes to service answers are worked out (one of app.main.helpers.diff_tools.DIFF_ENGINES) and how long (in
+    # seconds) an answer's diff may take before it's shown as simply replaced - "difflib" ignores the time limit
+    DM_SERVICE_DIFF_ENGINE = "words"
+    DM_SERVICE_DIFF_TIME_BUDGET = 0.5
+    # number of worker processes each app process keeps for CPU-bound work, such as diffing a service's many changed
+    # answers in parallel (0 to do it all on the request thread)
+    DM_PROCESS_POOL_MAX_WORKERS = 0
+
     STATIC_URL_PATH = '/admin/static'
     ASSET_PATH = STATIC_URL_PATH + '/'
     BASE_TEMPLATE_DATA = {
@@ -98,6 +143,17 @@ class Test(Config):
     INVITE_EMAIL_TOKEN_NS = 'SALT'
     DM_NOTIFY_API_KEY = "not_a_real_key-00000000-fake-uuid-0000-000000000000"
 
+    DM_WARM_UP_MANIFESTS = False
+    DM_MANIFEST_SNAPSHOT_PATH = None
+    DM_FRAMEWORK_REGISTRY_POLL_INTERVAL = None
+    DM_FRAMEWORKS_CACHE_TTL = 0
+    DM_CONCURRENT_CALLS_MAX_WORKERS = 1
+    DM_SIGNED_URL_CACHE_TTL = 0
+    DM_COMMUNICATIONS_LISTINGS_CACHE_TTL = 0
+    DM_SERVICE_DIFFS_CACHE_TTL = 0
+    DM_SERVICE_DIFFS_LAZY_MIN_CHANGED_QUESTIONS = None
+    DM_UNAPPROVED_UPDATES_PAGES_CACHE_TTL = 0
+
 
 class Development(Config):
     DEBUG = True
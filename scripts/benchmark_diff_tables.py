@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Compare rendering service edit diff tables with `difflib.HtmlDiff` followed by reworking its html with lxml (the
+original implementation, reproduced here) against the direct renderer in `app.main.helpers.diff_tools`.
+
+First checks both produce the same table for every changed answer in the `tests/app/test_diff_tool.py` cases (with and
+without a preamble), then times each - along with the direct renderer using the word by word diff engine - on synthetic
+large free-text answers, both many lines long and single paragraphs of many words. Should be run from the repository
+root.
+"""
+import argparse
+import difflib
+import os
+from functools import partial
+import random
+import sys
+import timeit
+
+from lxml import html
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main.helpers.diff_tools import _get_value_for_difflib, _html_diff_table, word_diff_line_pairs  # noqa: E402
+from tests.app.test_diff_tool import TestHtmlDiffTablesFromSections  # noqa: E402
+
+TABLE_PREAMBLE_HTML = (
+    "<caption>Service description &amp; features</caption>\n"
+    "<thead>\n  <tr>\n    <th class=\"line-number\"></th>\n    <th class=\"line-content\"></th>\n  </tr>\n</thead>"
+)
+WORDS = (
+    "cloud hosting support software service data secure backup recovery user access network monitoring "
+    "scalable managed platform integration api migration compliance audit"
+).split()
+
+
+def _strip_element_nbsp(element):
+    element.text = element.text and element.text.replace("\u00a0", " ")
+    element.tail = element.tail and element.tail.replace("\u00a0", " ")
+    for child_element in element:
+        _strip_element_nbsp(child_element)
+
+
+def original_html_diff_table(lines_1, lines_2, table_preamble_html=""):
+    """The original implementation: parse difflib.HtmlDiff's table and rework it in place"""
+    table_element = html.fragment_fromstring(difflib.HtmlDiff().make_table(lines_1, lines_2))
+
+    for colgroup in table_element.xpath(".//colgroup"):
+        colgroup.getparent().remove(colgroup)
+    for diff_next in table_element.xpath(".//td[@class='diff_next']"):
+        diff_next.getparent().remove(diff_next)
+    for td_nowrap in table_element.xpath(".//td[@nowrap]"):
+        del td_nowrap.attrib["nowrap"]
+    for key in table_element.keys():
+        del table_element.attrib[key]
+    for element in table_element.xpath(".//*[@id]"):
+        del element.attrib["id"]
+    _strip_element_nbsp(table_element.xpath("./tbody")[0])
+    for line_number_td in table_element.xpath(".//td[@class='diff_header']"):
+        line_number_td.attrib["class"] = "line-number"
+
+    for tr in table_element.xpath("./tbody/tr"):
+        tr[0].attrib["class"] = tr[2].attrib["class"] = "line-number"
+        tr[1].attrib["class"] = tr[3].attrib["class"] = "line-content"
+
+        if (tr[0].text or "").strip() or len(tr[0]):
+            if len(tr[1]):
+                tr[0].attrib["class"] += " line-number-removal"
+                tr[1].attrib["class"] += " removal"
+                for span in tr[1].xpath("./span[@class='diff_sub' or @class='diff_chg']"):
+                    span.tag = "del"
+                    del span.attrib["class"]
+        else:
+            tr[0].attrib["class"] += " line-non-existent"
+            tr[1].attrib["class"] += " line-non-existent"
+
+        if (tr[2].text or "").strip() or len(tr[2]):
+            if len(tr[3]):
+                tr[2].attrib["class"] += " line-number-addition"
+                tr[3].attrib["class"] += " addition"
+                for span in tr[3].xpath("./span[@class='diff_add' or @class='diff_chg']"):
+                    span.tag = "ins"
+                    del span.attrib["class"]
+        else:
+            tr[2].attrib["class"] += " line-non-existent"
+            tr[3].attrib["class"] += " line-non-existent"
+
+    if table_preamble_html:
+        for element in reversed(html.fragments_fromstring(table_preamble_html)):
+            table_element.insert(0, element)
+
+    return html.tostring(table_element, encoding="unicode")
+
+
+def test_case_answers():
+    """Yield each pair of differing answers from the test_diff_tool cases"""
+    for mark in TestHtmlDiffTablesFromSections.test_common_properties.pytestmark:
+        if mark.args[0].startswith("framework_slug"):
+            for _, _, service_data_a, service_data_b, _, _ in mark.args[1]:
+                for question_id in sorted(set(service_data_a) | set(service_data_b)):
+                    answers = tuple(
+                        service_data.get(question_id, []) for service_data in (service_data_a, service_data_b,)
+                    )
+                    if answers[0] != answers[1]:
+                        yield tuple(_get_value_for_difflib(answer) for answer in answers)
+
+
+def check_equal_output():
+    checked = 0
+    for lines_1, lines_2 in test_case_answers():
+        assert _html_diff_table(lines_1, lines_2) == original_html_diff_table(lines_1, lines_2), (lines_1, lines_2)
+        # the preamble is our own (already valid) html, which the original re-serialised, so compare the parsed trees
+        assert html.tostring(html.fragment_fromstring(
+            _html_diff_table(lines_1, lines_2, TABLE_PREAMBLE_HTML)
+        )) == html.tostring(html.fragment_fromstring(
+            original_html_diff_table(lines_1, lines_2, TABLE_PREAMBLE_HTML)
+        ))
+        checked += 1
+
+    print(f"identical output for all {checked} changed answers in the test_diff_tool cases")
+
+
+def synthetic_answer_pair(line_count, edited_proportion, seed=0):
+    rng = random.Random(seed)
+    lines_1 = [" ".join(rng.choices(WORDS, k=rng.randint(8, 20))) for _ in range(line_count)]
+    lines_2 = [
+        " ".join(rng.choices(WORDS, k=rng.randint(8, 20))) if rng.random() < edited_proportion / 2
+        else line.replace(rng.choice(WORDS), rng.choice(WORDS)) if rng.random() < edited_proportion
+        else line
+        for line in lines_1
+    ]
+    return lines_1, lines_2
+
+
+def synthetic_paragraph_pair(word_count, edited_proportion, seed=0):
+    rng = random.Random(seed)
+    words_1 = rng.choices(WORDS, k=word_count)
+    words_2 = [rng.choice(WORDS) if rng.random() < edited_proportion else word for word in words_1]
+    return [" ".join(words_1)], [" ".join(words_2)]
+
+
+def time_renderers(description, lines_1, lines_2, runs):
+    print(description)
+    timings = {}
+    for label, render in (
+        ("original", original_html_diff_table),
+        ("direct", _html_diff_table),
+        ("words", partial(_html_diff_table, diff_engine=word_diff_line_pairs)),
+    ):
+        timings[label] = min(timeit.repeat(lambda: render(lines_1, lines_2), number=1, repeat=runs))
+        print(f"  {label:>8}: {timings[label] * 1000:.1f}ms")
+    print(f"  speedup: {timings['original'] / timings['direct']:.1f}x direct, "
+          f"{timings['original'] / timings['words']:.1f}x words")
+
+
+def main(line_counts, paragraph_word_counts, edited_proportion, runs):
+    check_equal_output()
+
+    for line_count in line_counts:
+        time_renderers(
+            f"{line_count} lines, ~{edited_proportion:.0%} edited",
+            *synthetic_answer_pair(line_count, edited_proportion),
+            runs,
+        )
+    for word_count in paragraph_word_counts:
+        # a tenth as many edits - a long answer reworded throughout is rare
+        time_renderers(
+            f"one paragraph of {word_count} words, ~{edited_proportion / 10:.0%} of words edited",
+            *synthetic_paragraph_pair(word_count, edited_proportion / 10),
+            runs,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--paragraph-words", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--edited", type=float, default=0.2, help="proportion of lines to edit")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    main(args.lines, args.paragraph_words, args.edited, args.runs)
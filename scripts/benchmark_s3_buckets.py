@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Compare the time a request spends on S3 when it builds a fresh `dmutils.s3.S3` for its bucket (as views used to) against
+reusing the one an `S3Buckets` registry built for the thread before.
+
+A stub S3 is started on localhost which answers every object HEAD with a small document's metadata, standing in for
+localstack. Each simulated request looks up one key (`get_key`), like the agreement and communications views do.
+Should be run from the repository root.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dmutils import s3  # noqa: E402
+
+from app.s3_buckets import S3Buckets  # noqa: E402
+
+BUCKET_NAME = "digitalmarketplace-benchmark"
+
+
+def make_stub_s3(latency):
+    class StubS3Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # so boto can keep connections alive
+
+        def do_HEAD(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", "1024")
+            self.send_header("ETag", '"d41d8cd98f00b204e9800998ecf8427e"')
+            self.send_header("Last-Modified", "Mon, 01 Jan 2018 01:01:01 GMT")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubS3Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_requests(get_bucket, requests):
+    durations = []
+    for i in range(requests):
+        start = time.perf_counter()
+        get_bucket().get_key(f"g-cloud-12/agreements/{i}/{i}-signed-framework-agreement.pdf")
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def main(latency, requests):
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+    server = make_stub_s3(latency)
+    endpoint_url = "http://127.0.0.1:{}".format(server.server_address[1])
+    buckets = S3Buckets(endpoint_url=endpoint_url, max_pool_connections=16)
+
+    implementations = (
+        ("S3 per request", lambda: s3.S3(BUCKET_NAME, endpoint_url=endpoint_url)),
+        ("shared registry", lambda: buckets.get(BUCKET_NAME)),
+    )
+    results = [(label, time_requests(get_bucket, requests)) for label, get_bucket in implementations]
+
+    server.shutdown()
+
+    print(f"stub S3 latency {latency * 1000:.0f}ms, {requests} requests each")
+    for label, durations in results:
+        print(
+            f"  {label:>16}: median {statistics.median(durations) * 1000:.2f}ms, "
+            f"first {durations[0] * 1000:.2f}ms, max {max(durations) * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stub S3 waits before responding")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    main(args.latency, args.requests)
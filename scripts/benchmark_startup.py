@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Compare how long `create_app` takes when it has to wait for the framework list from a slow API, against starting from a
+persisted framework list snapshot (DM_FRAMEWORKS_SNAPSHOT_PATH).
+
+A stub API is started on localhost which answers `/frameworks` with the test fixture framework list after an artificial
+delay. Should be run from the repository root.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+FRAMEWORKS_FIXTURE_PATH = os.path.join("tests", "app", "fixtures", "frameworks.json")
+
+
+def make_stub_api(latency):
+    with open(FRAMEWORKS_FIXTURE_PATH, "rb") as f:
+        frameworks_response = f.read()
+
+    class StubAPIHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(frameworks_response)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_create_app(runs):
+    from app import create_app
+
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        create_app("test")
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def main(latency, runs):
+    server = make_stub_api(latency)
+    os.environ["DM_DATA_API_URL"] = "http://127.0.0.1:{}".format(server.server_address[1])
+    os.environ["DM_DATA_API_AUTH_TOKEN"] = "benchmark"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot_path = os.path.join(tmpdir, "frameworks.json")
+
+        os.environ.pop("DM_FRAMEWORKS_SNAPSHOT_PATH", None)
+        blocking = time_create_app(runs)
+
+        with open(FRAMEWORKS_FIXTURE_PATH) as src, open(snapshot_path, "w") as dest:
+            json.dump(json.load(src), dest)
+        os.environ["DM_FRAMEWORKS_SNAPSHOT_PATH"] = snapshot_path
+        from_snapshot = time_create_app(runs)
+
+    server.shutdown()
+
+    print(f"API latency {latency:.2f}s, {runs} runs each")
+    for label, durations in (("blocking on API", blocking), ("from snapshot", from_snapshot)):
+        print(f"  {label:>16}: median {statistics.median(durations):.3f}s, max {max(durations):.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds the stub API waits before responding")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    main(args.latency, args.runs)
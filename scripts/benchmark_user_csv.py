@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Compare generating a buyer CSV by sorting every user in memory against `generate_user_csv`'s bounded-memory external
+sort, on synthetic users. Reports total time, time to the first sorted row and peak (traced) memory for each.
+
+Should be run from the repository root.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dmutils import csv_generator  # noqa: E402
+
+from app.main.helpers.user_downloads import USER_CSV_SORT_BUFFER_SIZE, generate_user_csv  # noqa: E402
+
+
+def synthetic_users(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        name = "".join(rng.choices(string.ascii_letters, k=12))
+        yield {
+            "id": i,
+            "emailAddress": f"{name.lower()}.{i}@example.gov.uk",
+            "name": name,
+            "role": "buyer",
+            "active": True,
+            "userResearchOptedIn": bool(i % 2),
+        }
+
+
+def in_memory_user_csv(users):
+    """The original implementation, sorting a list of every user"""
+    def rows_iter():
+        yield ("email address", "name")
+        for user in sorted(users, key=lambda user: user["name"]):
+            yield (user.get(field_name, "") for field_name in ("emailAddress", "name"))
+
+    return csv_generator.iter_csv(rows_iter())
+
+
+def measure(make_csv, user_count):
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    chunks = make_csv(synthetic_users(user_count))
+    next(chunks)  # header
+    next(chunks)  # first user
+    first_row = time.perf_counter() - start
+    for _ in chunks:
+        pass
+
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return total, first_row, peak
+
+
+def main(user_counts, buffer_size):
+    implementations = (
+        ("in memory", in_memory_user_csv),
+        (f"external ({buffer_size})", lambda users: generate_user_csv(users, buffer_size=buffer_size)),
+    )
+
+    for user_count in user_counts:
+        print(f"{user_count} users")
+        for label, make_csv in implementations:
+            total, first_row, peak = measure(make_csv, user_count)
+            print(
+                f"  {label:>18}: total {total:.2f}s, first row {first_row:.2f}s, peak memory {peak / 2 ** 20:.1f}MiB"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--buffer-size", type=int, default=USER_CSV_SORT_BUFFER_SIZE)
+    args = parser.parse_args()
+
+    main(args.users, args.buffer_size)
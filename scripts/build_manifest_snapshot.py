@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Parse the manifests of every framework in the content directory and write them to a snapshot file, which
+`create_app` will load instead of parsing the yaml itself as long as the content hasn't changed since.
+
+Should be run from the repository root after the frontend build (scripts/build.sh) has put the frameworks content in
+place.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dmcontent.errors import ContentNotFoundError  # noqa: E402
+
+from app import FRAMEWORK_MANIFESTS  # noqa: E402
+from app.manifests import SharedContentLoader  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def build_manifest_snapshot(content_path, snapshot_path):
+    content_loader = SharedContentLoader(content_path)
+
+    for framework_slug in sorted(os.listdir(os.path.join(content_path, "frameworks"))):
+        for question_set, manifest in FRAMEWORK_MANIFESTS:
+            try:
+                content_loader.load_manifest(framework_slug, question_set, manifest)
+            except ContentNotFoundError:
+                print(f"No {manifest} manifest for {framework_slug}", file=sys.stderr)
+
+    content_loader.save_snapshot(snapshot_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--content-path", default="app/content")
+    parser.add_argument("--snapshot-path", default=Config.DM_MANIFEST_SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    build_manifest_snapshot(args.content_path, args.snapshot_path)
+    print(args.snapshot_path)
@@ -3,7 +3,6 @@ import mock
 import re
 import os
 
-from dmcontent import ContentLoader
 from dmutils.user import User
 from flask import json, Blueprint
 from werkzeug.datastructures import MultiDict
@@ -11,6 +10,7 @@ from flask_login import login_user
 
 from app import create_app, data_api_client, _make_content_loader_factory
 from app import login_manager
+from app.manifests import SharedContentLoader
 
 
 login_for_tests = Blueprint('login_for_tests', __name__)
@@ -33,7 +33,7 @@ def auto_login():
 
 
 class BaseApplicationTest(object):
-    injected_content_loader = ContentLoader('app/content')
+    injected_content_loader = SharedContentLoader('app/content')
 
     def setup_method(self, method):
 
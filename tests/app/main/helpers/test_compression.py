@@ -0,0 +1,42 @@
+import gzip
+import zlib
+
+import mock
+import pytest
+
+from app.main.helpers.compression import compress_chunks
+
+
+class TestCompressChunks:
+    chunks = [b"email address,name\r\n"] + [f"user-{i}@example.com,User {i}\r\n".encode() for i in range(5000)]
+
+    @pytest.mark.parametrize("content_coding, decompress", (
+        ("gzip", gzip.decompress),
+        ("deflate", zlib.decompress),
+    ))
+    def test_round_trip(self, content_coding, decompress):
+        compressed = b"".join(compress_chunks(iter(self.chunks), content_coding))
+
+        assert decompress(compressed) == b"".join(self.chunks)
+        assert len(compressed) < len(b"".join(self.chunks)) / 4
+
+    def test_first_chunk_available_before_the_rest_are_read(self):
+        chunks = iter(self.chunks)
+        compressed_chunks = compress_chunks(chunks, "deflate")
+
+        first = next(compressed_chunks)
+
+        assert zlib.decompressobj().decompress(first) == self.chunks[0]
+        assert next(chunks) == self.chunks[1]
+
+    @mock.patch("app.main.helpers.compression.STREAMING_COMPRESSION_FLUSH_SIZE", 1024)
+    def test_output_flushed_regularly(self):
+        decompressor = zlib.decompressobj()
+        decompressed_so_far = []
+
+        for compressed in compress_chunks(iter(self.chunks), "deflate"):
+            decompressed_so_far.append(len(decompressor.decompress(compressed)))
+
+        # output should trickle out in many pieces rather than all arriving at the end
+        assert len(decompressed_so_far) > len(b"".join(self.chunks)) // 1024 // 2
+        assert sum(decompressed_so_far) == len(b"".join(self.chunks))
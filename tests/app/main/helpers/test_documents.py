@@ -0,0 +1,78 @@
+import mock
+import pytest
+from flask import Flask
+
+from app.caching import TTLCache
+from app.main.helpers.documents import forget_signed_url, get_signed_url
+
+
+class TestGetSignedUrl:
+    @pytest.fixture(autouse=True)
+    def app_context(self):
+        self.now = 1000
+        flask_app = Flask(__name__)
+        flask_app.config["DM_SIGNED_URL_EXPIRES_IN"] = 30
+        flask_app.extensions["signed_urls_cache"] = TTLCache(
+            "signed_urls",
+            20,
+            clock=lambda: self.now,
+            value_ttl=lambda entry: 20 if entry[0] is not None else 5,
+        )
+        with flask_app.app_context():
+            yield
+
+    def make_bucket(self, bucket_name="agreements", signed_url="https://s3.example.com/g-cloud-12/foo.pdf?sig=1"):
+        bucket = mock.Mock(bucket_name=bucket_name)
+        bucket.get_signed_url.return_value = signed_url
+        return bucket
+
+    def test_signed_url_with_base_url(self):
+        bucket = self.make_bucket()
+
+        assert get_signed_url(bucket, "g-cloud-12/foo.pdf", "https://assets.example.com") == \
+            "https://assets.example.com/g-cloud-12/foo.pdf?sig=1"
+        assert get_signed_url(bucket, "g-cloud-12/foo.pdf", None) == "https://s3.example.com/g-cloud-12/foo.pdf?sig=1"
+        assert bucket.get_signed_url.call_args_list == [mock.call("g-cloud-12/foo.pdf", expires_in=30)]
+
+    def test_signed_url_reused_until_shortly_before_expiry(self):
+        bucket = self.make_bucket()
+
+        get_signed_url(bucket, "g-cloud-12/foo.pdf", None)
+        self.now += 19
+        get_signed_url(bucket, "/g-cloud-12/foo.pdf", None)
+        assert bucket.get_signed_url.call_count == 1
+
+        self.now += 1
+        get_signed_url(bucket, "g-cloud-12/foo.pdf", None)
+        assert bucket.get_signed_url.call_count == 2
+
+    def test_cached_per_bucket_and_path(self):
+        bucket, other_bucket = self.make_bucket(), self.make_bucket(bucket_name="reports")
+
+        get_signed_url(bucket, "g-cloud-12/foo.pdf", None)
+        get_signed_url(bucket, "g-cloud-12/bar.pdf", None)
+        get_signed_url(other_bucket, "g-cloud-12/foo.pdf", None)
+
+        assert bucket.get_signed_url.call_count == 2
+        assert other_bucket.get_signed_url.call_count == 1
+
+    def test_missing_key_remembered_briefly(self):
+        bucket = self.make_bucket(signed_url=None)
+
+        assert get_signed_url(bucket, "g-cloud-12/foo.pdf", "https://assets.example.com") is None
+        self.now += 4
+        assert get_signed_url(bucket, "g-cloud-12/foo.pdf", "https://assets.example.com") is None
+        assert bucket.get_signed_url.call_count == 1
+
+        self.now += 1
+        bucket.get_signed_url.return_value = "https://s3.example.com/g-cloud-12/foo.pdf?sig=1"
+        assert get_signed_url(bucket, "g-cloud-12/foo.pdf", None) == "https://s3.example.com/g-cloud-12/foo.pdf?sig=1"
+
+    def test_forget_signed_url(self):
+        bucket = self.make_bucket(signed_url=None)
+        get_signed_url(bucket, "g-cloud-12/foo.pdf", None)
+
+        forget_signed_url(bucket, "g-cloud-12/foo.pdf")
+        bucket.get_signed_url.return_value = "https://s3.example.com/g-cloud-12/foo.pdf?sig=1"
+
+        assert get_signed_url(bucket, "g-cloud-12/foo.pdf", None) == "https://s3.example.com/g-cloud-12/foo.pdf?sig=1"
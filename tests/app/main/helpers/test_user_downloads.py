@@ -0,0 +1,70 @@
+import random
+
+import mock
+import pytest
+
+from app.main.helpers import user_downloads
+from app.main.helpers.user_downloads import external_sorted, generate_user_csv
+
+
+class TestExternalSorted:
+    @pytest.mark.parametrize("item_count", (0, 1, 4, 5, 12, 15))
+    def test_same_order_as_sorted(self, item_count):
+        # plenty of equal keys, to check we're as stable as sorted()
+        items = [(random.randint(0, 3), i) for i in range(item_count)]
+
+        assert list(external_sorted(items, key=lambda item: item[0], buffer_size=5)) == sorted(
+            items, key=lambda item: item[0]
+        )
+
+    def test_spills_runs_beyond_buffer_size(self):
+        with mock.patch.object(user_downloads, "_spill", wraps=user_downloads._spill) as spill:
+            assert list(external_sorted(range(11, 0, -1), key=lambda item: item, buffer_size=5)) == list(range(1, 12))
+
+        assert [list(call[0][0]) for call in spill.call_args_list] == [[7, 8, 9, 10, 11], [2, 3, 4, 5, 6]]
+
+    def test_no_spill_when_everything_fits(self):
+        with mock.patch.object(user_downloads, "_spill") as spill:
+            assert list(external_sorted([3, 1, 2], key=lambda item: item, buffer_size=5)) == [1, 2, 3]
+
+        assert spill.called is False
+
+    def test_runs_closed_if_abandoned(self):
+        real_spill = user_downloads._spill
+        runs = []
+
+        def spill(items):
+            runs.append(real_spill(items))
+            return runs[-1]
+
+        with mock.patch.object(user_downloads, "_spill", side_effect=spill):
+            sorted_items = external_sorted(range(20), key=lambda item: item, buffer_size=5)
+            assert next(sorted_items) == 0
+            sorted_items.close()
+
+        assert len(runs) == 4
+        assert all(run.closed for run in runs)
+
+
+class TestGenerateUserCsv:
+    users = [
+        {"emailAddress": "zara@example.com", "name": "Zara"},
+        {"emailAddress": "adam@example.com", "name": "Adam"},
+        {"emailAddress": "no-name@example.com", "name": ""},
+        {"emailAddress": "mo@example.com", "name": "Mo"},
+    ]
+
+    @pytest.mark.parametrize("buffer_size", (1, 2, 10))
+    def test_sorted_by_name(self, buffer_size):
+        assert b"".join(generate_user_csv(iter(self.users), buffer_size=buffer_size)).decode("utf-8").splitlines() == [
+            "email address,name",
+            "no-name@example.com,",
+            "adam@example.com,Adam",
+            "mo@example.com,Mo",
+            "zara@example.com,Zara",
+        ]
+
+    def test_header_output_before_users_read(self):
+        users = mock.Mock(__iter__=mock.Mock(side_effect=AssertionError("users read too early")))
+
+        assert next(generate_user_csv(users)) == b"email address,name\r\n"
@@ -122,6 +122,67 @@ class TestAdminManagerListView(LoggedInApplicationTest):
         assert response.status_code == 200
         assert len(document.cssselect(".summary-item-row")) == 10
 
+    def _role_users_side_effect(self):
+        return [
+            iter(self.SUPPORT_USERS),
+            iter(self.CATEGORY_USERS),
+            iter(self.SOURCING_USERS),
+            iter(self.FRAMEWORK_MANAGER_USERS),
+            iter(self.DATA_CONTROLLER_USERS),
+        ]
+
+    @mock.patch('app.main.views.admin_manager.ADMIN_USERS_PER_PAGE', 4)
+    @pytest.mark.parametrize("page, expected_names, has_prev, has_next", (
+        ("1", [
+            "CCS Category Support", "Extra Support", "Rashguy Support", "Sourcing Support",
+        ], False, True),
+        ("2", [
+            "Wonderful Framework Manager",
+            "Youthful Admin Data Controller",
+            "CCS Category Support - Retired",
+            "Has-been Framework Manager",
+        ], True, True),
+        ("3", ["Has-been Sourcing Support", "Suspended Admin Data Controller"], True, False),
+    ))
+    def test_should_paginate_admin_users(self, page, expected_names, has_prev, has_next):
+        self.data_api_client.find_users_iter.side_effect = self._role_users_side_effect()
+
+        response = self.client.get(f"/admin/admin-users?page={page}")
+        document = html.fromstring(response.get_data(as_text=True))
+
+        assert response.status_code == 200
+        assert [
+            row.cssselect(".summary-item-field-first")[0].text_content().strip()
+            for row in document.cssselect(".summary-item-row")
+        ] == expected_names
+        assert len(document.xpath(
+            f"//a[normalize-space(string())='Previous page'][contains(@href, 'page={int(page) - 1}')]"
+        )) == has_prev
+        assert len(document.xpath(
+            f"//a[normalize-space(string())='Next page'][contains(@href, 'page={int(page) + 1}')]"
+        )) == has_next
+
+    @pytest.mark.parametrize("page", ("0", "2"))
+    def test_should_404_for_page_out_of_range(self, page):
+        self.data_api_client.find_users_iter.side_effect = self._role_users_side_effect()
+
+        response = self.client.get(f"/admin/admin-users?page={page}")
+
+        assert response.status_code == 404
+
+    def test_should_fetch_users_for_each_admin_role(self):
+        self.data_api_client.find_users_iter.side_effect = self._role_users_side_effect()
+
+        self.client.get("/admin/admin-users")
+
+        assert self.data_api_client.find_users_iter.call_args_list == [
+            mock.call(role='admin'),
+            mock.call(role='admin-ccs-category'),
+            mock.call(role='admin-ccs-sourcing'),
+            mock.call(role='admin-framework-manager'),
+            mock.call(role='admin-ccs-data-controller'),
+        ]
+
     def test_should_list_alphabetically_with_all_suspended_users_below_active_users(self):
         self.data_api_client.find_users_iter.side_effect = [
             iter(self.SUPPORT_USERS),
@@ -1,4 +1,5 @@
 # coding=utf-8
+import threading
 from io import BytesIO
 from urllib.parse import urljoin
 
@@ -10,6 +11,8 @@ from dmtestutils.api_model_stubs import FrameworkStub
 from dmtestutils.comparisons import RestrictedAny
 from dmtestutils.fixtures import valid_pdf_bytes
 
+from app import concurrency
+from app.caching import TTLCache
 from ...helpers import LoggedInApplicationTest
 
 
@@ -65,7 +68,7 @@ class TestManageCommunicationsView(_BaseTestCommunicationsView):
             mock.call.get_framework(self.framework_slug)
         ]
         assert self.s3.mock_calls == [
-            mock.call("flop-slop-slap", endpoint_url=None),
+            mock.call("flop-slop-slap", endpoint_url=None, config=mock.ANY),
             mock.call().list('g-things-23/communications/updates/communications', load_timestamps=True),
             mock.call().list('g-things-23/communications/updates/clarifications', load_timestamps=True),
         ]
@@ -181,11 +184,57 @@ class TestManageCommunicationsView(_BaseTestCommunicationsView):
             mock.call.get_framework(self.framework_slug)
         ]
         assert self.s3.mock_calls == [
-            mock.call("flop-slop-slap", endpoint_url=None),
+            mock.call("flop-slop-slap", endpoint_url=None, config=mock.ANY),
             mock.call().list('g-things-23/communications/updates/communications', load_timestamps=True),
             mock.call().list('g-things-23/communications/updates/clarifications', load_timestamps=True),
         ]
 
+    def test_listings_made_with_their_own_threads_bucket(self):
+        self.app.config["DM_CONCURRENT_CALLS_MAX_WORKERS"] = 2
+        concurrency.init_app(self.app)
+        listings = []
+
+        def s3(bucket_name, **kwargs):
+            bucket = mock.Mock()
+            made_on = threading.get_ident()
+            bucket.list.side_effect = lambda *args, **kwargs: listings.append((made_on, threading.get_ident())) or []
+            return bucket
+
+        self.s3.side_effect = s3
+
+        response = self.client.get(f"/admin/communications/{self.framework_slug}")
+
+        assert response.status_code == 200
+        assert len(listings) == 2
+        assert all(made_on == listed_on for made_on, listed_on in listings)
+
+    def test_listings_cached_until_files_change(self):
+        self.app.extensions["communications_listings_cache"] = TTLCache("communications_listings", 300)
+        self.s3.return_value.list.side_effect = lambda *args, **kwargs: []
+        self.s3.return_value.path_exists.return_value = True
+        list_calls = [
+            mock.call('g-things-23/communications/updates/communications', load_timestamps=True),
+            mock.call('g-things-23/communications/updates/clarifications', load_timestamps=True),
+        ]
+
+        self.client.get(f"/admin/communications/{self.framework_slug}")
+        self.client.get(f"/admin/communications/{self.framework_slug}")
+        assert self.s3.return_value.list.call_args_list == list_calls
+
+        self.client.post(
+            f"/admin/communications/{self.framework_slug}",
+            data={'clarification': (BytesIO(valid_pdf_bytes), 'test-clar.pdf')},
+        )
+        self.client.get(f"/admin/communications/{self.framework_slug}")
+        assert self.s3.return_value.list.call_args_list == list_calls + list_calls[1:]
+
+        self.client.post(
+            f"/admin/communications/{self.framework_slug}/delete/communication/foo.csv",
+            data={"confirm": "1"},
+        )
+        self.client.get(f"/admin/communications/{self.framework_slug}")
+        assert self.s3.return_value.list.call_args_list == list_calls + list_calls[1:] + list_calls[:1]
+
 
 class TestUploadCommunicationsView(_BaseTestCommunicationsView):
     def test_post_documents_for_framework(self):
@@ -199,7 +248,7 @@ class TestUploadCommunicationsView(_BaseTestCommunicationsView):
 
         # check that we did actually mock-send two files
         assert self.s3.mock_calls == [
-            mock.call('flop-slop-slap', endpoint_url=None),
+            mock.call('flop-slop-slap', endpoint_url=None, config=mock.ANY),
             mock.call().save(
                 f'{self.framework_slug}/communications/updates/communications/test-comm.pdf',
                 RestrictedAny(lambda other: other.filename == "test-comm.pdf"),
@@ -261,7 +310,7 @@ class TestUploadCommunicationsView(_BaseTestCommunicationsView):
         ) == f"http://localhost/admin/communications/{self.framework_slug}"
 
         # nothing was uploaded
-        assert self.s3.mock_calls == [mock.call('flop-slop-slap', endpoint_url=None)]
+        assert self.s3.mock_calls == [mock.call('flop-slop-slap', endpoint_url=None, config=mock.ANY)]
 
 
 class TestDownloadCommunicationsView(_BaseTestCommunicationsView):
@@ -291,9 +340,10 @@ class TestDownloadCommunicationsView(_BaseTestCommunicationsView):
         assert response.location == "https://basket.market.net/green/goldenly/lagoons.pdf"
 
         assert self.s3.mock_calls == [
-            mock.call('flop-slop-slap', endpoint_url=None),
+            mock.call('flop-slop-slap', endpoint_url=None, config=mock.ANY),
             mock.call().get_signed_url(
-                f'{self.framework_slug}/communications/updates/{comm_type}s/floating/foampool.pdf'
+                f'{self.framework_slug}/communications/updates/{comm_type}s/floating/foampool.pdf',
+                expires_in=30,
             ),
         ]
         # should have checked framework exists
@@ -323,9 +373,10 @@ class TestDownloadCommunicationsView(_BaseTestCommunicationsView):
         assert response.status_code == 404
 
         assert self.s3.mock_calls == [
-            mock.call('flop-slop-slap', endpoint_url=None),
+            mock.call('flop-slop-slap', endpoint_url=None, config=mock.ANY),
             mock.call().get_signed_url(
-                f'{self.framework_slug}/communications/updates/{comm_type}s/floating/foampool.pdf'
+                f'{self.framework_slug}/communications/updates/{comm_type}s/floating/foampool.pdf',
+                expires_in=30,
             ),
         ]
         # should have checked framework exists
@@ -478,7 +529,7 @@ class TestDeleteCommunicationsPost(_BaseTestCommunicationsView):
         ]
 
         assert self.s3.mock_calls == [
-            mock.call('flop-slop-slap', endpoint_url=None),
+            mock.call('flop-slop-slap', endpoint_url=None, config=mock.ANY),
             mock.call().path_exists(
                 f'{self.framework_slug}/communications/updates/{comm_type}s/{file_path}'
             ),
@@ -504,7 +555,7 @@ class TestDeleteCommunicationsPost(_BaseTestCommunicationsView):
         ]
 
         assert self.s3.mock_calls == [
-            mock.call('flop-slop-slap', endpoint_url=None),
+            mock.call('flop-slop-slap', endpoint_url=None, config=mock.ANY),
             mock.call().path_exists(f'{self.framework_slug}/communications/updates/{comm_type}s/floating/foampool.pdf'),
             # no deletion call
         ]
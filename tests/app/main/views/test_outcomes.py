@@ -1,10 +1,13 @@
 import csv
 
+import flask
 import mock
 import pytest
 
 from dmtestutils.api_model_stubs import FrameworkStub
 
+from app.api_client import RequestCachingDataAPIClient
+from app.main.views.outcomes import _with_archived_services
 from ...helpers import LoggedInApplicationTest
 
 
@@ -116,7 +119,9 @@ class TestDirectAwardView(LoggedInApplicationTest):
         }
 
         self.data_api_client.get_archived_service.return_value = get_archived_service_result
-        self.data_api_client.find_direct_award_projects.return_value = find_direct_award_projects_result
+        self.data_api_client.find_direct_award_projects_iter.return_value = iter(
+            find_direct_award_projects_result["projects"]
+        )
 
         response = self.client.get('/admin/direct-award/outcomes')
         assert response.status_code == 200
@@ -150,6 +155,128 @@ class TestDirectAwardView(LoggedInApplicationTest):
             '123', 'A Buyer', 'buyer@example.com'
         ]
 
+    @staticmethod
+    def _awarded_project(project_id, archived_service_id):
+        return {
+            "id": project_id,
+            "name": f"Project {project_id}",
+            "outcome": {
+                "award": {
+                    "awardValue": "1234.00",
+                    "awardingOrganisationName": "123321",
+                    "endDate": "2020-12-12",
+                    "startDate": "2002-12-12"
+                },
+                "completedAt": "2018-06-19T13:37:59.713497Z",
+                "result": "awarded",
+                "resultOfDirectAward": {
+                    "archivedService": {"id": archived_service_id, "service": {"id": f"{archived_service_id}0"}},
+                },
+            },
+            "users": [{"emailAddress": "buyer@example.com", "id": 123, "name": "A Buyer"}],
+        }
+
+    def test_outcomes_csv_download_looks_up_each_archived_service_once(self):
+        self.user_role = 'admin-ccs-sourcing'
+        self.data_api_client.find_direct_award_projects_iter.return_value = iter([
+            self._awarded_project(1, 111),
+            self._awarded_project(2, 222),
+            self._awarded_project(3, 111),
+        ])
+        self.data_api_client.get_archived_service.side_effect = lambda archived_service_id: {"services": {
+            "serviceName": f"Service {archived_service_id}",
+            "supplierId": 1,
+            "supplierName": "Supplier",
+        }}
+
+        response = self.client.get('/admin/direct-award/outcomes')
+
+        rows = list(csv.reader(response.get_data(as_text=True).splitlines()))
+        assert [(row[0], row[5]) for row in rows[1:]] == [
+            ("1", "Service 111"),
+            ("2", "Service 222"),
+            ("3", "Service 111"),
+        ]
+        assert self.data_api_client.get_archived_service.call_args_list == [
+            mock.call(archived_service_id=111),
+            mock.call(archived_service_id=222),
+        ]
+
+    def test_outcomes_csv_download_header_sent_before_api_called(self):
+        self.user_role = 'admin-ccs-sourcing'
+
+        response = self.client.get('/admin/direct-award/outcomes', buffered=False)
+
+        assert next(iter(response.response)).startswith(b"ID,Name,Submitted at,")
+        assert self.data_api_client.find_direct_award_projects_iter.call_args_list == []
+        response.close()
+
+    def test_outcomes_csv_download_doesnt_remember_archived_services_for_the_request(self):
+        self.user_role = 'admin-ccs-sourcing'
+        client = RequestCachingDataAPIClient(base_url="http://baseurl", auth_token="auth-token")
+        memo_sizes = []
+
+        def _request(method, url, **kwargs):
+            memo_sizes.append(len(flask.g.get('_data_api_get_memo', {})))
+            if url.startswith("/direct-award/projects"):
+                return {
+                    "projects": [self._awarded_project(project_id, project_id * 111) for project_id in range(1, 51)],
+                    "links": {},
+                }
+            return {"services": {"serviceName": url, "supplierId": 1, "supplierName": "Supplier"}}
+
+        with mock.patch('app.main.views.outcomes.data_api_client', client), \
+                mock.patch.object(client, '_request', side_effect=_request):
+            response = self.client.get('/admin/direct-award/outcomes')
+
+            assert len(response.get_data(as_text=True).splitlines()) == 51
+
+        # the projects listing plus a lookup for each of the 50 distinct archived services
+        assert len(memo_sizes) == 51
+        assert set(memo_sizes) == {0}
+
+    @mock.patch('app.main.views.outcomes.DIRECT_AWARD_OUTCOMES_REMEMBERED_SERVICES', 2)
+    @mock.patch('app.main.views.outcomes.DIRECT_AWARD_OUTCOMES_WINDOW', 2)
+    def test_archived_services_looked_up_a_window_at_a_time(self):
+        projects_taken = []
+
+        def projects():
+            for project_id, archived_service_id in enumerate((111, 222, 111, 333, 444, 555, 111), start=1):
+                projects_taken.append(project_id)
+                yield self._awarded_project(project_id, archived_service_id)
+
+        self.data_api_client.get_archived_service.side_effect = lambda archived_service_id: {"services": {
+            "serviceName": f"Service {archived_service_id}",
+        }}
+
+        with self.app.test_request_context():
+            results = _with_archived_services(projects())
+
+            project, service = next(results)
+            assert (project["id"], service["serviceName"]) == (1, "Service 111")
+            # nothing beyond the first window has been read yet
+            assert projects_taken == [1, 2]
+
+            assert [(project["id"], service["serviceName"]) for project, service in results] == [
+                (2, "Service 222"),
+                (3, "Service 111"),
+                (4, "Service 333"),
+                (5, "Service 444"),
+                (6, "Service 555"),
+                (7, "Service 111"),
+            ]
+
+        assert self.data_api_client.get_archived_service.call_args_list == [
+            mock.call(archived_service_id=111),
+            mock.call(archived_service_id=222),
+            # 111 is remembered from the first window
+            mock.call(archived_service_id=333),
+            mock.call(archived_service_id=444),
+            mock.call(archived_service_id=555),
+            # by now 111 has been forgotten
+            mock.call(archived_service_id=111),
+        ]
+
 
 class TestDOSView(LoggedInApplicationTest):
 
@@ -172,10 +299,10 @@ class TestDOSView(LoggedInApplicationTest):
 
     @pytest.fixture(autouse=True)
     def s3(self):
-        with mock.patch("app.main.views.outcomes.s3") as s3:
+        with mock.patch("app.s3_buckets.s3") as s3:
             bucket = s3.S3()
             bucket.get_signed_url.side_effect = \
-                lambda path: f"https://s3.example.com/{path}?signature=deadbeef"
+                lambda path, expires_in: f"https://s3.example.com/{path}?signature=deadbeef"
             yield s3
 
     @pytest.mark.parametrize("role,expected_code", [
@@ -234,6 +361,6 @@ class TestDOSView(LoggedInApplicationTest):
         response = self.client.get(self.url)
 
         assert s3.S3().get_signed_url.call_args == mock.call(
-            f"{latest_dos_framework}/reports/opportunity-data.csv"
+            f"{latest_dos_framework}/reports/opportunity-data.csv", expires_in=30
         )
         assert latest_dos_framework in response.location
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
+from urllib.parse import parse_qs, urlsplit
+
 import mock
 import pytest
+from dmapiclient import HTTPError
+from dmapiclient.audit import AuditTypes
 from lxml import html
 
-from ...helpers import LoggedInApplicationTest
+from app.caching import TTLCache
+from ...helpers import LoggedInApplicationTest, Response
 
 
 class TestServiceUpdates(LoggedInApplicationTest):
@@ -71,7 +76,7 @@ class TestServiceUpdates(LoggedInApplicationTest):
         ),
     ))
     def test_should_show_unacknowledged_services(self, audit_events, expected_table_contents, expected_count):
-        self.data_api_client.find_audit_events.return_value = {
+        self._mock_find_audit_events({
             "auditEvents": [
                 {
                     "data": {
@@ -86,7 +91,7 @@ class TestServiceUpdates(LoggedInApplicationTest):
                 ) in audit_events
             ],
             "links": {},
-        }
+        })
 
         response = self.client.get('/admin/services/updates/unapproved')
 
@@ -95,7 +100,7 @@ class TestServiceUpdates(LoggedInApplicationTest):
 
         assert tuple(
             tuple(
-                td.xpath('normalize-space(string())') for td in tr.xpath('./td')[:-1]
+                td.xpath('normalize-space(string())') for td in tr.xpath('./td')[1:-1]
             ) + (tr.xpath('./td[last()]//a/@href')[0],)
             for tr in document.xpath('//table[@class="summary-item-body"]/tbody/tr')
         ) == expected_table_contents
@@ -106,7 +111,148 @@ class TestServiceUpdates(LoggedInApplicationTest):
             assert tuple(
                 tuple(th.xpath('normalize-space(string())') for th in tr.xpath('./th'))
                 for tr in document.xpath('//table[@class="summary-item-body"]/thead/tr')
-            ) == (('Supplier', 'Service ID', 'Edited', 'Changes'),)
+            ) == (('Select', 'Supplier', 'Service ID', 'Edited', 'Changes'),)
+
+    @staticmethod
+    def _unapproved_updates_page(*audit_event_ids, has_next=False):
+        return {
+            "auditEvents": [
+                {
+                    "id": audit_event_id,
+                    "data": {"serviceId": str(audit_event_id), "supplierName": "Clouded Networks"},
+                    "createdAt": "2015-06-17T08:49:22.999Z",
+                } for audit_event_id in audit_event_ids
+            ],
+            "links": {"next": "http://localhost:5000/audit-events?page=2"} if has_next else {},
+        }
+
+    def _mock_find_audit_events(self, queue_pages, latest_update_ids=None):
+        """Answer requests for pages of the queue from ``queue_pages`` (one response for every page, a dict of them by
+        page, or a function of the page), and for a service's latest unapproved update from ``latest_update_ids`` (by
+        service id, defaulting to the id of the update the queue shows for it)"""
+        def find_audit_events(object_id=None, page=None, **kwargs):
+            if object_id is not None:
+                latest_update_id = (latest_update_ids or {}).get(object_id, int(object_id))
+                return {"auditEvents": [{"id": latest_update_id}] if latest_update_id else [], "links": {}}
+            if callable(queue_pages):
+                return queue_pages(page)
+            return queue_pages[page] if "auditEvents" not in queue_pages else queue_pages
+
+        self.data_api_client.find_audit_events.side_effect = find_audit_events
+
+    def _queue_pages_requested(self):
+        return [
+            call[1]["page"] for call in self.data_api_client.find_audit_events.call_args_list
+            if call[1].get("earliest_for_each_object") == "true"
+        ]
+
+    def _shown_service_ids_and_next_link(self, url):
+        response = self.client.get(url)
+        assert response.status_code == 200
+        document = html.fromstring(response.get_data(as_text=True))
+
+        next_links = document.xpath("//a[normalize-space(string())='Next page']/@href")
+        return (
+            [
+                tr.xpath('normalize-space(string(./td[3]))')
+                for tr in document.xpath('//table[@class="summary-item-body"]/tbody/tr')
+            ],
+            parse_qs(urlsplit(next_links[0]).query) if next_links else None,
+        )
+
+    def test_first_page_links_to_next_by_cursor(self):
+        self._mock_find_audit_events(self._unapproved_updates_page(1, 2, 3, has_next=True))
+
+        assert self._shown_service_ids_and_next_link('/admin/services/updates/unapproved') == (
+            ["1", "2", "3"],
+            {"after": ["3"], "page": ["2"]},
+        )
+        assert self.data_api_client.find_audit_events.call_args_list[:1] == [mock.call(
+            audit_type=AuditTypes.update_service,
+            acknowledged='false',
+            latest_first='false',
+            earliest_for_each_object='true',
+            page=1,
+        )]
+
+    def test_page_after_cursor(self):
+        # an update after the cursor has been approved meanwhile, moving 4 back onto page 2
+        self._mock_find_audit_events(self._unapproved_updates_page(3, 4, 6))
+
+        assert self._shown_service_ids_and_next_link('/admin/services/updates/unapproved?after=3&page=2') == (
+            ["4", "6"],
+            None,
+        )
+        assert self._queue_pages_requested() == [2]
+
+    def test_page_after_cursor_looks_back_for_moved_updates(self):
+        # updates before the cursor have been approved meanwhile, moving 4 and 5 back onto page 1
+        self._mock_find_audit_events({
+            1: self._unapproved_updates_page(2, 4, 5),
+            2: self._unapproved_updates_page(6, 7),
+            3: self._unapproved_updates_page(),
+        })
+
+        assert self._shown_service_ids_and_next_link('/admin/services/updates/unapproved?after=3&page=3') == (
+            ["4", "5", "6", "7"],
+            None,
+        )
+        assert self._queue_pages_requested() == [3, 2, 1]
+
+    def test_page_after_cursor_past_end_of_queue(self):
+        # so many updates have been approved meanwhile that the queue no longer has a third page
+        pages = {
+            1: self._unapproved_updates_page(2, 4, has_next=True),
+            2: self._unapproved_updates_page(5),
+        }
+
+        def queue_page(page):
+            if page not in pages:
+                raise HTTPError(Response(status_code=404))
+            return pages[page]
+
+        self._mock_find_audit_events(queue_page)
+
+        assert self._shown_service_ids_and_next_link('/admin/services/updates/unapproved?after=3&page=3') == (
+            ["4", "5"],
+            None,
+        )
+        assert self._queue_pages_requested() == [3, 2, 1]
+
+    def test_next_page_prefetched(self):
+        self.app.extensions['unapproved_updates_pages_cache'] = TTLCache('unapproved_updates_pages', 30)
+        self._mock_find_audit_events({
+            1: self._unapproved_updates_page(1, 2, has_next=True),
+            2: self._unapproved_updates_page(3),
+        })
+
+        with mock.patch('app.main.views.service_updates.start_in_background') as start_in_background:
+            self.client.get('/admin/services/updates/unapproved')
+        with self.app.app_context():
+            start_in_background.call_args[0][0]()
+
+        assert self._shown_service_ids_and_next_link('/admin/services/updates/unapproved?after=2&page=2') == (
+            ["3"],
+            None,
+        )
+        assert self._queue_pages_requested() == [1, 2]
+
+    def test_approval_forgets_unapproved_updates_pages(self):
+        self.app.extensions['unapproved_updates_pages_cache'] = TTLCache('unapproved_updates_pages', 30)
+        self._mock_find_audit_events(self._unapproved_updates_page(123))
+        self.data_api_client.get_audit_event.return_value = {'auditEvents': {
+            'id': 123,
+            'acknowledged': False,
+            'type': 'update_service',
+            'data': {'serviceId': '321'},
+        }}
+
+        self.client.get('/admin/services/updates/unapproved')
+        self.client.get('/admin/services/updates/unapproved')
+        self.client.post('/admin/services/321/updates/123/approve')
+        self.client.get('/admin/services/updates/unapproved')
+
+        assert len(self._queue_pages_requested()) == 2
 
     def test_acknowledge_audit_event_happy_path(self):
         audit_event = {
@@ -130,7 +276,8 @@ class TestServiceUpdates(LoggedInApplicationTest):
         }
 
         self.data_api_client.get_audit_event.side_effect = lambda audit_event_id: {123: audit_event}[audit_event_id]
-        response = self.client.post('/admin/services/321/updates/123/approve')
+        with mock.patch('app.main.views.service_updates.forget_service_diff_tables') as forget_service_diff_tables:
+            response = self.client.post('/admin/services/321/updates/123/approve')
         assert response.status_code == 302
         self.assert_flashes("The changes to service 321 were approved.")
         assert response.location == 'http://localhost/admin/services/updates/unapproved'
@@ -140,6 +287,7 @@ class TestServiceUpdates(LoggedInApplicationTest):
             123,
             'test@example.com'
         )
+        forget_service_diff_tables.assert_called_once_with('321')
 
     def test_should_404_wrong_service_id(self):
         response = self.client.post('/admin/services/123/updates/321/approve')
@@ -201,7 +349,129 @@ class TestServiceUpdates(LoggedInApplicationTest):
         response = self.client.post('/admin/services/321/updates/123/approve')
         assert response.status_code == 404
 
-    @mock.patch('app.main.views.service_updates.s3')
+    def test_unapproved_updates_can_be_selected_for_approval(self):
+        # service 1 was updated again after the update the queue shows, service 2 has had all its updates approved
+        self._mock_find_audit_events(self._unapproved_updates_page(1, 2), latest_update_ids={"1": 7, "2": None})
+
+        response = self.client.get('/admin/services/updates/unapproved')
+        document = html.fromstring(response.get_data(as_text=True))
+
+        form = document.xpath("//form[.//input[@name='audit_id']]")[0]
+        assert form.attrib["action"] == "/admin/services/updates/approve"
+        # each service's latest update as it is now, so approving it can't approve anything made after this
+        assert form.xpath(".//input[@name='audit_id']/@value") == ["7", "2"]
+        assert form.xpath("normalize-space(string(.//button))") == "Approve all changes to selected services"
+        assert [
+            call for call in self.data_api_client.find_audit_events.call_args_list if "object_id" in call[1]
+        ] == [
+            mock.call(
+                object_id=service_id,
+                object_type="services",
+                audit_type=AuditTypes.update_service,
+                acknowledged="false",
+                latest_first="true",
+                per_page=1,
+            ) for service_id in ("1", "2")
+        ]
+
+    @staticmethod
+    def _update_service_audit_event(audit_id, service_id, acknowledged=False, audit_type='update_service'):
+        return {'auditEvents': {
+            'id': audit_id,
+            'acknowledged': acknowledged,
+            'type': audit_type,
+            'data': {'serviceId': service_id},
+        }}
+
+    def test_bulk_approval(self):
+        audit_events = {
+            1: self._update_service_audit_event(1, '101'),
+            2: self._update_service_audit_event(2, '102'),
+            3: self._update_service_audit_event(3, '101'),
+            4: self._update_service_audit_event(4, '104', acknowledged=True),
+            5: self._update_service_audit_event(5, '105', audit_type='update_service_status'),
+            7: self._update_service_audit_event(7, '107'),
+        }
+
+        def get_audit_event(audit_id):
+            if audit_id not in audit_events:
+                raise HTTPError(Response(status_code=404))
+            return audit_events[audit_id]
+
+        def acknowledge_service_update_including_previous(service_id, audit_id, user):
+            if service_id == '107':
+                raise HTTPError(Response(status_code=500))
+
+        self.data_api_client.get_audit_event.side_effect = get_audit_event
+        self.data_api_client.acknowledge_service_update_including_previous.side_effect = (
+            acknowledge_service_update_including_previous
+        )
+
+        with mock.patch('app.main.views.service_updates.forget_service_diff_tables') as forget_service_diff_tables:
+            response = self.client.post(
+                '/admin/services/updates/approve',
+                data={'audit_id': ['1', '2', '3', '4', '5', '6', '7', '2', 'not-an-id']},
+            )
+
+        assert response.status_code == 302
+        assert response.location == 'http://localhost/admin/services/updates/unapproved'
+        self.assert_flashes("The changes made to 2 services before the list was loaded were approved: 101, 102.")
+        for audit_id, reason in (
+            (4, "they have already been approved"),
+            (5, "it isn't an edit to a service"),
+            (6, "it doesn't exist"),
+            (7, "the API returned an error, try again"),
+        ):
+            self.assert_flashes(
+                f"The changes for edit {audit_id} were not approved: {reason}.",
+                expected_category='error',
+            )
+
+        assert sorted(self.data_api_client.get_audit_event.call_args_list) == [
+            mock.call(audit_id) for audit_id in range(1, 8)
+        ]
+        # each service's updates are approved once, up to the latest of its selected updates
+        assert sorted(self.data_api_client.acknowledge_service_update_including_previous.call_args_list) == [
+            mock.call('101', 3, 'test@example.com'),
+            mock.call('102', 2, 'test@example.com'),
+            mock.call('107', 7, 'test@example.com'),
+        ]
+        assert self.data_api_client.find_audit_events.called is False
+        assert sorted(forget_service_diff_tables.call_args_list) == [
+            mock.call('101'), mock.call('102'), mock.call('107'),
+        ]
+
+    def test_bulk_approval_approves_updates_up_to_when_queue_loaded(self):
+        # the queue shows service 101's earliest unapproved update, 1 - its latest when the queue is loaded is 5
+        self._mock_find_audit_events(self._unapproved_updates_page(1), latest_update_ids={"1": 5})
+        response = self.client.get('/admin/services/updates/unapproved')
+        selected = html.fromstring(response.get_data(as_text=True)).xpath("//input[@name='audit_id']/@value")
+
+        # then the supplier makes update 9, before the admin submits
+        self.data_api_client.get_audit_event.side_effect = lambda audit_id: self._update_service_audit_event(
+            audit_id, '1',
+        )
+        self.client.post('/admin/services/updates/approve', data={'audit_id': selected})
+
+        self.assert_flashes("The changes made to 1 service before the list was loaded were approved: 1.")
+        assert self.data_api_client.acknowledge_service_update_including_previous.call_args_list == [
+            mock.call('1', 5, 'test@example.com'),
+        ]
+
+    def test_bulk_approval_with_nothing_selected(self):
+        response = self.client.post('/admin/services/updates/approve', data={})
+
+        assert response.status_code == 302
+        self.assert_flashes("Select the services whose changes you want to approve.", expected_category='error')
+        assert self.data_api_client.acknowledge_service_update_including_previous.called is False
+
+    @pytest.mark.parametrize("role_not_allowed", ["admin", "admin-ccs-sourcing", "admin-manager"])
+    def test_bulk_approval_forbidden_user_roles(self, role_not_allowed):
+        self.user_role = role_not_allowed
+        response = self.client.post('/admin/services/updates/approve', data={'audit_id': '1'})
+        assert response.status_code == 403
+
+    @mock.patch('app.s3_buckets.s3')
     @mock.patch('app.main.views.service_updates.get_signed_url')
     def test_report_download_redirects_to_s3(self, get_signed_url, s3):
         get_signed_url.return_value = 'http://asseturl/path/to/csv?querystring'
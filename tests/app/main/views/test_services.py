@@ -1,4 +1,5 @@
 import os
+import re
 from functools import partial
 from io import BytesIO
 from itertools import chain
@@ -14,6 +15,9 @@ from lxml import html
 
 from dmtestutils.fixtures import valid_pdf_bytes
 
+from app import content_loader
+from app.caching import TTLCache
+from app.main.helpers.diff_tools import word_diff_line_pairs
 from ...helpers import LoggedInApplicationTest
 
 
@@ -83,6 +87,25 @@ class TestChangeFrameworkStatus(LoggedInApplicationTest):
             mock.call('foo', {'status': 'expired'}, user='test@example.com')
         ]
 
+    def test_changing_status_notifies_framework_registry(self):
+        self.data_api_client.get_framework.return_value = {'frameworks': {'slug': 'foo', 'status': 'live'}}
+
+        with mock.patch.object(self.app.extensions['framework_registry'], 'notify') as notify:
+            self.client.post('/admin/frameworks/foo/status', data={"status": "expired"})
+
+        assert notify.called
+
+    def test_changing_status_invalidates_frameworks_cache(self):
+        self.app.extensions['frameworks_cache'] = TTLCache('frameworks', 60)
+        self.data_api_client.get_framework.return_value = {'frameworks': {'slug': 'foo', 'status': 'live'}}
+        self.data_api_client.find_frameworks.return_value = self._get_frameworks_list_fixture_data()
+
+        self.client.get('/admin')
+        self.client.post('/admin/frameworks/foo/status', data={"status": "expired"})
+        self.client.get('/admin')
+
+        assert self.data_api_client.find_frameworks.call_count == 2
+
 
 class TestServiceFind(LoggedInApplicationTest):
 
@@ -1623,7 +1646,7 @@ class TestServiceStatusUpdate(LoggedInApplicationTest):
         assert response.status_code == 404
 
 
-@mock.patch("app.main.views.services.html_diff_tables_from_sections_iter", autospec=True)
+@mock.patch("app.main.helpers.diff_tools.html_diff_tables_from_sections_iter", autospec=True)
 class TestServiceUpdates(LoggedInApplicationTest):
 
     def setup_method(self, method):
@@ -1692,22 +1715,38 @@ class TestServiceUpdates(LoggedInApplicationTest):
         }[supplier_id]}
 
     @staticmethod
-    def _mock_find_audit_events_side_effect(find_audit_events_api_response, implicit_page_len, **kwargs):
-        if kwargs.get("page") or kwargs.get("page_len"):
+    def _mock_find_audit_events_side_effect(find_audit_events_api_response, implicit_page_len, page=1, **kwargs):
+        if kwargs.get("per_page"):
             raise NotImplementedError
 
         links = {
             "self": "http://example.com/dummy",
         }
-        if len(find_audit_events_api_response) > implicit_page_len:
+        if len(find_audit_events_api_response) > implicit_page_len * page:
             links["next"] = "http://example.com/dummy_next"
         if kwargs.get("latest_first") == "true":
             find_audit_events_api_response = find_audit_events_api_response[::-1]
         return {
-            "auditEvents": find_audit_events_api_response[:implicit_page_len],
+            "auditEvents": find_audit_events_api_response[implicit_page_len * (page - 1):implicit_page_len * page],
             "links": links,
         }
 
+    @classmethod
+    def _mock_find_audit_events_iter_side_effect(cls, find_audit_events_api_response, implicit_page_len, **kwargs):
+        # as the real find_audit_events_iter does, a page at a time until there's no "next" link
+        page = 1
+        while True:
+            response = cls._mock_find_audit_events_side_effect(
+                find_audit_events_api_response,
+                implicit_page_len,
+                page=page,
+                **kwargs,
+            )
+            yield from response["auditEvents"]
+            if "next" not in response["links"]:
+                return
+            page += 1
+
     _service_status_labels = {
         "disabled": "Removed",
         "enabled": "Private",
@@ -1929,7 +1968,9 @@ class TestServiceUpdates(LoggedInApplicationTest):
         (
             (5, expected_message_about_latest_edit_4),
             (3, expected_message_about_latest_edit_4),
-            (2, expected_message_about_latest_edit_4)
+            (2, expected_message_about_latest_edit_4),
+            # cissy's edit is only on a page between the first and the last
+            (1, expected_message_about_latest_edit_4),
         )
     )
 
@@ -1970,8 +2011,8 @@ class TestServiceUpdates(LoggedInApplicationTest):
         resultant_diff,
     ):
         self.data_api_client.get_service.side_effect = partial(self._mock_get_service_side_effect, service_status)
-        self.data_api_client.find_audit_events.side_effect = partial(
-            self._mock_find_audit_events_side_effect,
+        self.data_api_client.find_audit_events_iter.side_effect = partial(
+            self._mock_find_audit_events_iter_side_effect,
             find_audit_events_api_response,
             find_audit_events_page_length,
         )
@@ -1990,15 +2031,15 @@ class TestServiceUpdates(LoggedInApplicationTest):
         assert response.status_code == 200
         doc = html.fromstring(response.get_data(as_text=True))
 
-        assert all(
-            kwargs == {
-                "object_id": "151",
-                "object_type": "services",
-                "audit_type": AuditTypes.update_service,
-                "acknowledged": "false",
-                "latest_first": mock.ANY,
-            } for args, kwargs in self.data_api_client.find_audit_events.call_args_list
-        )
+        assert self.data_api_client.find_audit_events_iter.call_args_list == [
+            mock.call(
+                object_id="151",
+                object_type="services",
+                audit_type=AuditTypes.update_service,
+                acknowledged="false",
+                latest_first="false",
+            )
+        ]
 
         assert doc.cssselect('.govuk-caption-l')[0].text == "Barrington's"
         assert doc.cssselect('.govuk-heading-l')[0].text == "Lemonflavoured soap"
@@ -2026,6 +2067,9 @@ class TestServiceUpdates(LoggedInApplicationTest):
                         old_versions_of_services[find_audit_events_api_response[0]["data"]["oldArchivedServiceId"]],
                     "revision_2": self._mock_get_service_side_effect(service_status, "151")["services"],
                     "table_preamble_template": "diff_table/_table_preamble.html",
+                    "diff_engine": word_diff_line_pairs,
+                    "time_budget": 0.5,
+                    "executor": None,
                 },),
             ]
 
@@ -2103,8 +2147,8 @@ class TestServiceUpdates(LoggedInApplicationTest):
         expected_latest_edit_info,
     ):
         self.data_api_client.get_service.side_effect = partial(self._mock_get_service_side_effect, service_status)
-        self.data_api_client.find_audit_events.side_effect = partial(
-            self._mock_find_audit_events_side_effect,
+        self.data_api_client.find_audit_events_iter.side_effect = partial(
+            self._mock_find_audit_events_iter_side_effect,
             find_audit_events_api_response,
             find_audit_events_page_length,
         )
@@ -2121,3 +2165,94 @@ class TestServiceUpdates(LoggedInApplicationTest):
         doc = html.fromstring(response.get_data(as_text=True))
 
         assert doc.xpath("//p[normalize-space(string())=$expected_text]", expected_text=expected_latest_edit_info)
+
+    def test_large_changes_list_changed_sections(self, html_diff_tables_from_sections_iter):
+        find_audit_events_api_response, old_versions_of_services = self.disabled_service_one_edit[:2]
+        self.app.config["DM_SERVICE_DIFFS_LAZY_MIN_CHANGED_QUESTIONS"] = 1
+        self.data_api_client.get_service.side_effect = partial(self._mock_get_service_side_effect, "disabled")
+        self.data_api_client.find_audit_events_iter.side_effect = partial(
+            self._mock_find_audit_events_iter_side_effect,
+            find_audit_events_api_response,
+            5,
+        )
+        self.data_api_client.get_archived_service.side_effect = partial(
+            self._mock_get_archived_service_side_effect,
+            old_versions_of_services,
+        )
+        self.data_api_client.get_supplier.side_effect = self._mock_get_supplier_side_effect
+
+        self.user_role = "admin-ccs-category"
+        response = self.client.get('/admin/services/151/updates')
+
+        assert response.status_code == 200
+        doc = html.fromstring(response.get_data(as_text=True))
+
+        assert html_diff_tables_from_sections_iter.called is False
+        # only the section containing serviceName has changed
+        changed_sections = doc.xpath("//*[@data-diff-section-url]")
+        assert len(changed_sections) == 1
+        assert re.fullmatch(
+            r"/admin/services/151/updates/789/sections/[a-z0-9-]+",
+            changed_sections[0].attrib["data-diff-section-url"],
+        )
+        assert changed_sections[0].xpath("string(.//a/@href)") == changed_sections[0].attrib["data-diff-section-url"]
+        assert changed_sections[0].xpath("normalize-space(string(.//a))") == "Show 1 changed answer"
+        assert not doc.xpath(
+            "//*[normalize-space(string())=$reverted_text]",
+            reverted_text="All changes were reversed.",
+        )
+
+    def _first_section_slug(self):
+        return content_loader.get_manifest("g-cloud-9", "edit_service_as_admin").filter(
+            self._mock_get_service_side_effect("published", "151")["services"],
+        ).sections[0].slug
+
+    @pytest.mark.parametrize("xhr", (False, True))
+    def test_section_diffs(self, html_diff_tables_from_sections_iter, xhr):
+        section_slug = self._first_section_slug()
+        self.data_api_client.get_service.side_effect = partial(self._mock_get_service_side_effect, "published")
+        self.data_api_client.get_archived_service.return_value = {"services": {
+            "id": "151",
+            "frameworkSlug": "g-cloud-9",
+            "lot": "cloud-hosting",
+            "serviceName": "Melonflavoured soap",
+        }}
+        html_diff_tables_from_sections_iter.side_effect = lambda *a, **ka: iter((
+            (section_slug, "serviceName", Markup("<div class='dummy-diff-table'>dummy</div>")),
+        ))
+
+        self.user_role = "admin-ccs-category"
+        response = self.client.get(
+            f'/admin/services/151/updates/789/sections/{section_slug}',
+            headers={"X-Requested-With": "XMLHttpRequest"} if xhr else {},
+        )
+
+        assert response.status_code == 200
+        doc = html.fromstring(response.get_data(as_text=True))
+        assert len(doc.xpath("//*[@class='dummy-diff-table']")) == 1
+        assert bool(doc.xpath("//h1")) is not xhr
+
+        assert self.data_api_client.get_archived_service.call_args_list == [mock.call("789")]
+        assert [section.slug for section in html_diff_tables_from_sections_iter.call_args[1]["sections"]] == [
+            section_slug,
+        ]
+
+    @pytest.mark.parametrize("archived_service_id,section_slug", (
+        ("152", None),
+        ("151", "no-such-section"),
+    ))
+    def test_section_diffs_404(self, html_diff_tables_from_sections_iter, archived_service_id, section_slug):
+        section_slug = section_slug or self._first_section_slug()
+        self.data_api_client.get_service.side_effect = partial(self._mock_get_service_side_effect, "published")
+        self.data_api_client.get_archived_service.return_value = {"services": {
+            "id": archived_service_id,
+            "frameworkSlug": "g-cloud-9",
+            "lot": "cloud-hosting",
+            "serviceName": "Melonflavoured soap",
+        }}
+
+        self.user_role = "admin-ccs-category"
+        response = self.client.get(f'/admin/services/151/updates/789/sections/{section_slug}')
+
+        assert response.status_code == 404
+        assert html_diff_tables_from_sections_iter.called is False
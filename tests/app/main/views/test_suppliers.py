@@ -1285,6 +1285,34 @@ class TestToggleSupplierServicesView(LoggedInApplicationTest):
         with self.client.session_transaction() as session:
             assert session['_flashes'][0][1] == expected_flash_message
 
+    @pytest.mark.parametrize('action, message_action, retry_action', [
+        ('remove', 'suspended', 'Suspend'), ('publish', 'unsuspended', 'Unsuspend')
+    ])
+    def test_reports_services_that_could_not_be_toggled(self, action, message_action, retry_action):
+        service_1 = self.load_example_listing('services_response')['services'][0]
+        service_2 = dict(service_1, id='5687123785023489')
+        service_3 = dict(service_1, id='5687123785023490')
+        self.data_api_client.find_services_iter.side_effect = lambda *a, **k: iter((service_1, service_2, service_3,))
+
+        def update_service_status(service_id, *args, **kwargs):
+            if service_id == '5687123785023489':
+                raise HTTPError(Response(status_code=500))
+
+        self.data_api_client.update_service_status.side_effect = update_service_status
+
+        response = self.client.post('/admin/suppliers/1000/services?{}=g-cloud-8'.format(action))
+
+        assert response.status_code == 302
+        # the others are still updated
+        assert self.data_api_client.update_service_status.call_count == 3
+        self.assert_flashes(
+            "1 of 3 G-Cloud 8 services for ‘PROACTIS Group Ltd’ could not be {}: 5687123785023489. "
+            "{} all services again to retry them.".format(message_action, retry_action),
+            expected_category='error',
+        )
+        with self.client.session_transaction() as session:
+            assert [category for category, _ in session['_flashes']] == ['error']
+
 
 class TestSupplierDraftServicesView(LoggedInApplicationTest):
     user_role = 'admin-framework-manager'
@@ -2271,7 +2299,7 @@ class TestDownloadSignedAgreementFile(LoggedInApplicationTest):
         assert download_agreement_file.called is False
 
 
-@mock.patch('app.main.views.suppliers.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestDownloadAgreementFile(LoggedInApplicationTest):
     user_role = 'admin-ccs-sourcing'
 
@@ -2319,7 +2347,9 @@ class TestDownloadAgreementFile(LoggedInApplicationTest):
 
         response = self.client.get('/admin/suppliers/1234/agreements/g-cloud-7/foo.pdf')
 
-        s3.S3.return_value.get_signed_url.assert_called_once_with('g-cloud-7/agreements/1234/1234-foo.pdf')
+        s3.S3.return_value.get_signed_url.assert_called_once_with(
+            'g-cloud-7/agreements/1234/1234-foo.pdf', expires_in=30
+        )
         assert response.status_code == 404
 
     def test_should_redirect(self, s3):
@@ -2329,7 +2359,9 @@ class TestDownloadAgreementFile(LoggedInApplicationTest):
 
         response = self.client.get('/admin/suppliers/1234/agreements/g-cloud-7/foo.pdf')
 
-        s3.S3.return_value.get_signed_url.assert_called_once_with('g-cloud-7/agreements/1234/1234-foo.pdf')
+        s3.S3.return_value.get_signed_url.assert_called_once_with(
+            'g-cloud-7/agreements/1234/1234-foo.pdf', expires_in=30
+        )
         assert response.status_code == 302
         assert response.location == 'https://example/blah?extra'
 
@@ -2342,12 +2374,12 @@ class TestDownloadAgreementFile(LoggedInApplicationTest):
         )
 
         s3.S3.return_value.get_signed_url.assert_called_once_with(
-            'g-cloud-7/agreements/1234/1234-countersigned-framework-agreement.pdf'
+            'g-cloud-7/agreements/1234/1234-countersigned-framework-agreement.pdf', expires_in=30
         )
         assert response.status_code == 302
 
 
-@mock.patch('app.main.views.suppliers.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestListCountersignedAgreementFile(LoggedInApplicationTest):
     user_role = 'admin-ccs-sourcing'
 
@@ -2430,7 +2462,7 @@ class TestListCountersignedAgreementFile(LoggedInApplicationTest):
 
 
 @freeze_time('2016-12-25 06:30:01')
-@mock.patch('app.main.views.suppliers.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestUploadCountersignedAgreementFile(LoggedInApplicationTest):
     user_role = 'admin-ccs-sourcing'
 
@@ -2632,7 +2664,7 @@ class TestUploadCountersignedAgreementFile(LoggedInApplicationTest):
         )
 
 
-@mock.patch('app.main.views.suppliers.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestRemoveCountersignedAgreementFile(LoggedInApplicationTest):
     user_role = 'admin-ccs-sourcing'
 
@@ -2680,7 +2712,7 @@ class TestRemoveCountersignedAgreementFile(LoggedInApplicationTest):
         assert response.status_code == 200
 
 
-@mock.patch('app.main.views.suppliers.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestViewingSignedAgreement(LoggedInApplicationTest):
     user_role = 'admin-ccs-sourcing'
 
@@ -3081,7 +3113,7 @@ class TestUnapproveAgreement(LoggedInApplicationTest):
 
 
 @mock.patch('app.main.views.suppliers.get_signed_url')
-@mock.patch('app.main.views.suppliers.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestCorrectButtonsAreShownDependingOnContext(LoggedInApplicationTest):
     user_role = 'admin-ccs-sourcing'
 
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import gzip
+import zlib
+
 import mock
 import pytest
 from lxml import html
@@ -230,7 +233,7 @@ class TestChangeUserName(LoggedInApplicationTest):
         assert response.status_code == 400
 
 
-@mock.patch('app.main.views.users.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestUserListPage(LoggedInApplicationTest):
     user_role = 'admin-framework-manager'
 
@@ -308,7 +311,7 @@ class TestUserListPage(LoggedInApplicationTest):
         ]
 
 
-@mock.patch('app.main.views.users.s3')
+@mock.patch('app.s3_buckets.s3')
 class TestUserResearchParticipantsExport(LoggedInApplicationTest):
     user_role = 'admin-framework-manager'
 
@@ -370,6 +373,24 @@ class TestUserResearchParticipantsExport(LoggedInApplicationTest):
         assert 'mariah@example.com,Mariah Carey' in response.get_data(as_text=True)
         self.data_api_client.find_users_iter.assert_called_once_with(role='buyer')
 
+    @pytest.mark.parametrize('accept_encoding, content_encoding, decompress', (
+        ('gzip, deflate', 'gzip', gzip.decompress),
+        ('deflate', 'deflate', zlib.decompress),
+        ('identity', None, lambda data: data),
+    ))
+    def test_download_list_of_all_buyers_compressed_if_accepted(
+        self, s3, accept_encoding, content_encoding, decompress
+    ):
+        response = self.client.get('/admin/users/download/buyers', headers={'Accept-Encoding': accept_encoding})
+
+        assert response.headers.get('Content-Encoding') == content_encoding
+        assert 'Accept-Encoding' in response.vary
+        assert decompress(response.get_data()).decode('utf-8').splitlines() == [
+            'email address,name',
+            'mariah@example.com,Mariah Carey',
+            'shania@example.com,Shania Twain',
+        ]
+
     @pytest.mark.parametrize(
         ('role', 'status_code'),
         (
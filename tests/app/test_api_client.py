@@ -0,0 +1,114 @@
+import mock
+import flask
+import pytest
+from flask import Flask
+
+from app import concurrency
+from app.api_client import RequestCachingDataAPIClient, request_memo_disabled
+from app.concurrency import concurrently
+
+
+class TestRequestCachingDataAPIClient:
+    def setup_method(self, method):
+        self.client = RequestCachingDataAPIClient(base_url="http://baseurl", auth_token="auth-token", user="user")
+        self.request_patch = mock.patch.object(self.client, "_request", autospec=True)
+        self._request = self.request_patch.start()
+        self._request.side_effect = lambda method, url, **kwargs: {"suppliers": {"id": 1234, "url": url}}
+        self.flask_app = Flask(__name__)
+
+    def teardown_method(self, method):
+        self.request_patch.stop()
+
+    def test_repeated_get_only_requested_once_per_request(self):
+        with self.flask_app.test_request_context():
+            first = self.client.get_supplier(1234)
+            second = self.client.get_supplier(1234)
+
+        assert first == second
+        assert self._request.call_count == 1
+
+    def test_different_resources_requested_separately(self):
+        with self.flask_app.test_request_context():
+            self.client.get_supplier(1234)
+            self.client.get_supplier(5678)
+            self.client.get_framework("g-cloud-12")
+            self.client.get_framework("g-cloud-13")
+
+        assert self._request.call_count == 4
+
+    def test_responses_not_shared_between_requests(self):
+        for _ in range(2):
+            with self.flask_app.test_request_context():
+                self.client.get_supplier(1234)
+
+        assert self._request.call_count == 2
+
+    def test_callers_get_their_own_copy(self):
+        with self.flask_app.test_request_context():
+            self.client.get_supplier(1234)["suppliers"]["id"] = "mangled"
+
+            assert self.client.get_supplier(1234)["suppliers"]["id"] == 1234
+
+    @pytest.mark.parametrize("mutation", (
+        lambda client: client.update_supplier(1234, {"name": "New name"}),
+        lambda client: client.create_supplier({"name": "New supplier"}),
+        lambda client: client.delete_draft_service(5678),
+    ))
+    def test_mutation_forgets_remembered_responses(self, mutation):
+        with self.flask_app.test_request_context():
+            self.client.get_supplier(1234)
+            mutation(self.client)
+            self.client.get_supplier(1234)
+
+        assert [call[0][0] for call in self._request.call_args_list] == ["GET", mock.ANY, "GET"]
+
+    def test_mutation_in_concurrent_call_forgets_request_responses(self):
+        self.flask_app.config['DM_CONCURRENT_CALLS_MAX_WORKERS'] = 2
+        concurrency.init_app(self.flask_app)
+
+        with self.flask_app.test_request_context():
+            self.client.get_supplier(1234)
+            concurrently(lambda: self.client.update_supplier(1234, {"name": "New name"}), lambda: None)
+            self.client.get_supplier(1234)
+
+        assert [call[0][0] for call in self._request.call_args_list] == ["GET", mock.ANY, "GET"]
+
+    def test_outside_app_context_nothing_remembered(self):
+        self.client.get_supplier(1234)
+        self.client.get_supplier(1234)
+
+        assert self._request.call_count == 2
+
+    def test_later_pages_of_listings_not_remembered(self):
+        self._request.side_effect = lambda method, url, **kwargs: {
+            "services": [],
+            "links": {} if "page=2" in url else {"next": "http://baseurl/services?supplier_id=1234&page=2"},
+        }
+
+        with self.flask_app.test_request_context():
+            for _ in range(2):
+                list(self.client.find_services_iter(supplier_id=1234))
+            self.client.find_services(supplier_id=1234, page=2)
+
+            assert list(flask.g._data_api_get_memo) == ["http://baseurl/services?supplier_id=1234"]
+
+        # the first page just the once, the second every time
+        assert self._request.call_count == 4
+
+    def test_nothing_remembered_with_request_memo_disabled(self):
+        self.flask_app.config['DM_CONCURRENT_CALLS_MAX_WORKERS'] = 2
+        concurrency.init_app(self.flask_app)
+
+        with self.flask_app.test_request_context():
+            with request_memo_disabled():
+                self.client.get_supplier(1234)
+                self.client.get_supplier(1234)
+                concurrently(lambda: self.client.get_supplier(5678), lambda: self.client.get_supplier(5678))
+
+                assert flask.g.get('_data_api_get_memo', {}) == {}
+
+            # and remembering picks up again afterwards
+            self.client.get_supplier(1234)
+            self.client.get_supplier(1234)
+
+        assert self._request.call_count == 5
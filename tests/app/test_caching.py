@@ -0,0 +1,120 @@
+import threading
+
+import mock
+import pytest
+
+from app.caching import CACHE_LOOKUPS_TOTAL, TTLCache
+
+
+def lookups(cache_name, result):
+    return CACHE_LOOKUPS_TOTAL.labels(cache=cache_name, result=result)._value.get()
+
+
+class TestTTLCache:
+    def setup_method(self, method):
+        self.now = 1000
+        self.cache = TTLCache(method.__name__, 60, clock=lambda: self.now)
+        self.load = mock.Mock(side_effect=lambda: ["value", self.load.call_count])
+
+    def test_value_reused_until_expiry(self):
+        assert self.cache.get("key", self.load) == ["value", 1]
+        self.now += 59
+        assert self.cache.get("key", self.load) == ["value", 1]
+        self.now += 1
+        assert self.cache.get("key", self.load) == ["value", 2]
+
+    def test_keys_cached_separately(self):
+        assert self.cache.get("key", self.load) == ["value", 1]
+        assert self.cache.get("other-key", self.load) == ["value", 2]
+
+    def test_zero_ttl_disables_caching(self):
+        cache = TTLCache("uncached", 0)
+
+        cache.get("key", self.load)
+        cache.get("key", self.load)
+
+        assert self.load.call_count == 2
+
+    def test_value_ttl(self):
+        cache = TTLCache("value_ttl", 60, clock=lambda: self.now, value_ttl=lambda value: 10 if value[1] == 1 else 600)
+
+        assert cache.get("key", self.load) == ["value", 1]
+        self.now += 10
+        assert cache.get("key", self.load) == ["value", 2]
+        # capped at the cache's ttl
+        self.now += 60
+        assert cache.get("key", self.load) == ["value", 3]
+
+    def test_invalidate(self):
+        self.cache.get("key", self.load)
+        self.cache.invalidate("key")
+
+        assert self.cache.get("key", self.load) == ["value", 2]
+
+    def test_invalidate_during_load_does_not_store_stale_value(self):
+        def load():
+            self.cache.invalidate("key")
+            return "stale"
+
+        assert self.cache.get("key", load) == "stale"
+        assert self.cache.get("key", self.load) == ["value", 1]
+
+    def test_invalidate_matching(self):
+        self.cache.get(("service", 1), self.load)
+        self.cache.get(("service", 2), self.load)
+        self.cache.invalidate_matching(lambda key: key[1] == 1)
+
+        assert self.cache.get(("service", 1), self.load) == ["value", 3]
+        assert self.cache.get(("service", 2), self.load) == ["value", 2]
+
+    def test_max_size_drops_least_recently_used(self):
+        cache = TTLCache("max_size", 60, clock=lambda: self.now, max_size=2)
+
+        cache.get("a", self.load)
+        cache.get("b", self.load)
+        cache.get("a", self.load)
+        cache.get("c", self.load)
+
+        assert cache.get("a", self.load) == ["value", 1]
+        assert cache.get("c", self.load) == ["value", 3]
+        assert cache.get("b", self.load) == ["value", 4]
+
+    def test_failed_load_not_cached(self):
+        with pytest.raises(ValueError):
+            self.cache.get("key", mock.Mock(side_effect=ValueError))
+
+        assert self.cache.get("key", self.load) == ["value", 1]
+
+    def test_concurrent_misses_load_once(self):
+        loading = threading.Event()
+        finish_loading = threading.Event()
+
+        def slow_load():
+            loading.set()
+            finish_loading.wait(5)
+            return self.load()
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(self.cache.get("key", slow_load)))
+        leader.start()
+        loading.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(self.cache.get("key", slow_load))) for _ in range(4)
+        ]
+        for thread in followers:
+            thread.start()
+        finish_loading.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        assert results == [["value", 1]] * 5
+        assert self.load.call_count == 1
+
+    def test_hits_and_misses_counted(self, request):
+        cache_name = request.node.name
+
+        for _ in range(3):
+            self.cache.get("key", self.load)
+
+        assert lookups(cache_name, "miss") == 1
+        assert lookups(cache_name, "hit") == 2
@@ -0,0 +1,157 @@
+import threading
+import time
+from functools import partial
+
+import mock
+import pytest
+from flask import Flask, g, request
+
+from app import concurrency
+from app.concurrency import concurrently, iter_concurrently, start_in_background
+
+
+class TestConcurrently:
+    def make_app(self, max_workers, max_in_flight=None):
+        flask_app = Flask(__name__)
+        flask_app.config['DM_CONCURRENT_CALLS_MAX_WORKERS'] = max_workers
+        flask_app.config['DM_CONCURRENT_CALLS_MAX_IN_FLIGHT'] = max_in_flight
+        concurrency.init_app(flask_app)
+        return flask_app
+
+    def test_calls_made_at_the_same_time(self):
+        # only passable if all three calls are waiting on the barrier together
+        barrier = threading.Barrier(3, timeout=5)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        with self.make_app(4).test_request_context():
+            assert concurrently(lambda: call(1), lambda: call(2), lambda: call(3)) == [1, 2, 3]
+
+    def test_calls_see_request_and_g(self):
+        with self.make_app(4).test_request_context('/suppliers/1234'):
+            g.shared = {}
+
+            def call(key):
+                g.shared[key] = request.path
+                return threading.current_thread().name
+
+            thread_names = concurrently(lambda: call('a'), lambda: call('b'))
+
+            assert g.shared == {'a': '/suppliers/1234', 'b': '/suppliers/1234'}
+        assert all(name.startswith("concurrent-calls") for name in thread_names)
+
+    def test_first_exception_reraised_after_all_calls_finish(self):
+        other_call = mock.Mock(return_value=3)
+
+        def fail(exception):
+            raise exception
+
+        with self.make_app(4).test_request_context():
+            with pytest.raises(KeyError):
+                concurrently(lambda: 1, lambda: fail(KeyError()), lambda: fail(ValueError()), other_call)
+
+        assert other_call.called
+
+    def test_without_pool_calls_made_in_order_stopping_at_exception(self):
+        calls = []
+
+        def call(value):
+            calls.append((value, threading.current_thread()))
+            if value == 2:
+                raise ValueError()
+            return value
+
+        with self.make_app(1).test_request_context():
+            with pytest.raises(ValueError):
+                concurrently(lambda: call(1), lambda: call(2), lambda: call(3))
+
+        assert calls == [(1, threading.current_thread()), (2, threading.current_thread())]
+
+    def test_nested_calls_do_not_deadlock(self):
+        with self.make_app(2).test_request_context():
+            assert concurrently(
+                lambda: concurrently(lambda: 1, lambda: 2),
+                lambda: concurrently(lambda: 3, lambda: 4),
+            ) == [[1, 2], [3, 4]]
+
+    def test_app_context_only(self):
+        with self.make_app(4).app_context():
+            g.value = 5
+            assert concurrently(lambda: g.value, lambda: g.value + 1) == [5, 6]
+
+    def test_iter_concurrently_yields_results_in_order(self):
+        with self.make_app(4).test_request_context():
+            results = iter_concurrently(partial(lambda value: value, value) for value in range(10))
+
+            assert list(results) == list(range(10))
+
+    def test_iter_concurrently_yields_first_result_before_later_calls_finish(self):
+        finish_second_call = threading.Event()
+
+        with self.make_app(4).test_request_context():
+            results = iter_concurrently([lambda: 1, lambda: finish_second_call.wait(5) and 2])
+
+            assert next(results) == 1
+            finish_second_call.set()
+            assert next(results) == 2
+
+    @staticmethod
+    def _in_flight_counting_calls(count):
+        lock = threading.Lock()
+        in_flight = [0]
+        peak_in_flight = [0]
+
+        def call(value):
+            with lock:
+                in_flight[0] += 1
+                peak_in_flight[0] = max(peak_in_flight[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return value
+
+        return [partial(call, value) for value in range(count)], peak_in_flight
+
+    def test_calls_in_flight_limited(self):
+        calls, peak_in_flight = self._in_flight_counting_calls(20)
+
+        with self.make_app(8, max_in_flight=3).test_request_context():
+            assert concurrently(*calls) == list(range(20))
+
+        assert 1 < peak_in_flight[0] <= 3
+
+    def test_iter_concurrently_calls_in_flight_limited(self):
+        calls, peak_in_flight = self._in_flight_counting_calls(20)
+
+        with self.make_app(8, max_in_flight=3).test_request_context():
+            assert list(iter_concurrently(calls)) == list(range(20))
+
+        assert 1 < peak_in_flight[0] <= 3
+
+    def test_start_in_background(self):
+        with self.make_app(4).test_request_context('/suppliers/1234'):
+            future = start_in_background(lambda: request.path)
+
+            assert future.result(timeout=5) == '/suppliers/1234'
+
+    def test_start_in_background_failure_logged(self):
+        flask_app = self.make_app(4)
+        with flask_app.app_context(), mock.patch.object(flask_app.logger, 'warning') as warning:
+            future = start_in_background(mock.Mock(side_effect=ValueError))
+
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+            concurrency_executor = flask_app.extensions[concurrency.EXECUTOR_EXTENSION_KEY]
+            concurrency_executor.shutdown(wait=True)
+
+        assert warning.call_args[0] == ("Background call failed",)
+
+    def test_start_in_background_without_pool(self):
+        call = mock.Mock()
+
+        with self.make_app(1).app_context():
+            assert start_in_background(call) is None
+
+        assert call.called is False
@@ -1,11 +1,26 @@
+import pickle
+import sys
 from collections import OrderedDict
+from functools import partial
 from itertools import chain
 
+import mock
 import pytest
+from flask import Flask
 from lxml import html
 
 from app import content_loader
-from app.main.helpers.diff_tools import html_diff_tables_from_sections_iter
+from app.caching import TTLCache
+from app.main.helpers.diff_tools import (
+    _html_diff_table,
+    cached_service_diff_tables,
+    changed_sections_iter,
+    difflib_line_pairs,
+    forget_service_diff_tables,
+    html_diff_tables_from_sections_iter,
+    word_diff_line_pairs,
+)
+from app.main.helpers.sequence_diff import DiffBudgetExceeded, opcodes
 from .helpers import BaseApplicationTest
 
 
@@ -343,3 +358,283 @@ class TestHtmlDiffTablesFromSections(BaseApplicationTest):
         ).filter(service_data_b).sections
 
         assert not tuple(html_diff_tables_from_sections_iter(content_sections, service_data_a, service_data_b))
+
+    def test_executor(self):
+        service_data_a = {"serviceName": "Metempsychosis", "serviceDescription": "Heir of Rudolf Virag."}
+        service_data_b = {"serviceName": "Met him pike hoses", "serviceDescription": "Heir of Rudolf Bloom."}
+        content_sections = content_loader.get_manifest(
+            "g-cloud-9",
+            'edit_service_as_admin',
+        ).filter(service_data_b).sections
+        executor = mock.Mock(map=mock.Mock(side_effect=map))
+
+        assert tuple(html_diff_tables_from_sections_iter(
+            content_sections, service_data_a, service_data_b, executor=executor,
+        )) == tuple(html_diff_tables_from_sections_iter(
+            content_sections, service_data_a, service_data_b,
+        ))
+        assert executor.map.call_count == 1
+
+    def test_changed_sections(self):
+        service_data_a = {"serviceName": "Metempsychosis", "serviceDescription": "Heir of Rudolf Virag."}
+        service_data_b = {"serviceName": "Met him pike hoses", "serviceDescription": "Heir of Rudolf Bloom."}
+        content_sections = content_loader.get_manifest(
+            "g-cloud-9",
+            'edit_service_as_admin',
+        ).filter(service_data_b).sections
+
+        changed_sections = tuple(changed_sections_iter(content_sections, service_data_a, service_data_b))
+
+        assert sum(count for _, count in changed_sections) == 2
+        assert [section.slug for section, _ in changed_sections] == list(OrderedDict.fromkeys(
+            section_slug for section_slug, _, _ in html_diff_tables_from_sections_iter(
+                content_sections, service_data_a, service_data_b,
+            )
+        ))
+        assert not tuple(changed_sections_iter(content_sections, service_data_a, service_data_a))
+
+
+class TestHtmlDiffTable:
+    def test_markup(self):
+        assert _html_diff_table(["a b", "same", "x & y"], ["a c", "same", "new <line>", ""]) == (
+            '<table>\n'
+            '        <tbody>\n'
+            '            <tr><td class="line-number line-number-removal">1</td><td class="line-content removal">'
+            '<del>a b</del></td><td class="line-number line-number-addition">1</td><td class="line-content addition">'
+            '<ins>a c</ins></td></tr>\n'
+            '            <tr><td class="line-number">2</td><td class="line-content">same</td>'
+            '<td class="line-number">2</td><td class="line-content">same</td></tr>\n'
+            '            <tr><td class="line-number line-number-removal">3</td><td class="line-content removal">'
+            '<del>x &amp; y</del></td><td class="line-number line-number-addition">3</td>'
+            '<td class="line-content addition"><ins>new &lt;line&gt;</ins></td></tr>\n'
+            '            <tr><td class="line-number line-non-existent"></td>'
+            '<td class="line-content line-non-existent"></td><td class="line-number line-number-addition">4</td>'
+            '<td class="line-content addition"><ins> </ins></td></tr>\n'
+            '        </tbody>\n'
+            '    </table>'
+        )
+
+    def test_changes_within_line(self):
+        table_element = html.fragment_fromstring(_html_diff_table(["tabs\tand  spaces"], ["tabs\tor  spaces"]))
+
+        assert [td.xpath("string()") for td in table_element.xpath("./tbody/tr/td")] == [
+            "1", "tabs    and  spaces", "1", "tabs    or  spaces",
+        ]
+        assert table_element.xpath("string(./tbody/tr/td[2]/del)") == "and"
+        assert table_element.xpath("string(./tbody/tr/td[4]/ins)") == "or"
+
+    def test_preamble(self):
+        table_element = html.fragment_fromstring(
+            _html_diff_table(["a"], ["b"], table_preamble_html="<caption>A</caption>")
+        )
+
+        assert [child.tag for child in table_element] == ["caption", "tbody"]
+
+    def test_empty(self):
+        table_element = html.fragment_fromstring(_html_diff_table([], []))
+
+        assert [td.xpath("string()") for td in table_element.xpath("./tbody/tr/td")] == [
+            "", " Empty File ", "", " Empty File ",
+        ]
+
+
+class TestDifflibLinePairs:
+    # difflib_line_pairs relies on difflib._mdiff, which is private and can change in any Python release, so when
+    # upgrading check it still works as below and then move this on
+    CHECKED_PYTHON_VERSION = (3, 9)
+
+    def test_checked_against_this_python_version(self):
+        assert sys.version_info[:2] == self.CHECKED_PYTHON_VERSION, (
+            "difflib_line_pairs hasn't been checked against this version of Python's private difflib._mdiff"
+        )
+
+    def test_changes_marked(self):
+        assert list(difflib_line_pairs(
+            ["same", "the quick brown fox", "gone"],
+            ["same", "the quack brown fox!"],
+        )) == [
+            ((1, "same"), (1, "same")),
+            ((2, "the qu\0^i\1ck brown fox"), (2, "the qu\0^a\1ck brown fox\0+!\1")),
+            ((3, "\0-gone\1"), ("", "\n")),
+        ]
+
+
+class TestWordDiffLinePairs:
+    def test_changed_words_marked(self):
+        assert list(word_diff_line_pairs(
+            ["same", "the quick brown fox", "gone"],
+            ["same", "the quick red fox jumps"],
+        )) == [
+            ((1, "same"), (1, "same")),
+            ((2, "the quick \0^brown\1 fox"), (2, "the quick \0^red\1 fox\0+ jumps\1")),
+            ((3, "\0-gone\1"), ("", "")),
+        ]
+
+    def test_added_lines(self):
+        assert list(word_diff_line_pairs(["a"], ["a", "b", "c"])) == [
+            ((1, "a"), (1, "a")),
+            (("", ""), (2, "\0+b\1")),
+            (("", ""), (3, "\0+c\1")),
+        ]
+
+    def test_long_line_changes_stay_local(self):
+        words = [f"word{i}" for i in range(5000)]
+        changed_words = list(words)
+        changed_words[2500] = "changed"
+
+        (_, text_1), (_, text_2) = next(word_diff_line_pairs([" ".join(words)], [" ".join(changed_words)]))
+
+        assert text_1.count("\0") == text_2.count("\0") == 1
+        assert "\0^word2500\1" in text_1 and "\0^changed\1" in text_2
+
+    def test_replaced_when_out_of_time(self):
+        with mock.patch("app.main.helpers.diff_tools.opcodes", side_effect=DiffBudgetExceeded):
+            assert list(word_diff_line_pairs(["a", "b c"], ["b d"], time_budget=0.1)) == [
+                ((1, "\0-a\1"), (1, "\0+b d\1")),
+                ((2, "\0-b c\1"), ("", "")),
+            ]
+
+    def test_words_replaced_when_out_of_time(self):
+        line_opcodes = opcodes(["a", "b c"], ["a", "b d"])
+        with mock.patch(
+            "app.main.helpers.diff_tools.opcodes",
+            side_effect=[line_opcodes, DiffBudgetExceeded],
+        ):
+            assert list(word_diff_line_pairs(["a", "b c"], ["a", "b d"], time_budget=0.1)) == [
+                ((1, "a"), (1, "a")),
+                ((2, "\0-b c\1"), (2, "\0+b d\1")),
+            ]
+
+    def test_picklable_for_process_pool(self):
+        render = pickle.loads(pickle.dumps(partial(_html_diff_table, diff_engine=word_diff_line_pairs)))
+
+        assert render(["a"], ["b"]) == _html_diff_table(["a"], ["b"], diff_engine=word_diff_line_pairs)
+
+    def test_rendered(self):
+        table_element = html.fragment_fromstring(_html_diff_table(
+            ["fox & hound"], ["fox & <b>"], diff_engine=word_diff_line_pairs,
+        ))
+
+        assert [td.attrib["class"] for td in table_element.xpath("./tbody/tr/td")] == [
+            "line-number line-number-removal",
+            "line-content removal",
+            "line-number line-number-addition",
+            "line-content addition",
+        ]
+        assert table_element.xpath("string(./tbody/tr/td[2]/del)") == "hound"
+        assert table_element.xpath("string(./tbody/tr/td[4]/ins)") == "<b>"
+
+
+class TestSequenceDiff:
+    @pytest.mark.parametrize("a,b", (
+        ("", ""),
+        ("abc", "abc"),
+        ("abcabba", "cbabac"),
+        ("the cat sat on the mat", "the dog sat on a mat"),
+        ("xaxbxcx", "xcxbxax"),
+        ("aaaa", ""),
+        ("", "bbb"),
+    ))
+    def test_opcodes_turn_a_into_b(self, a, b):
+        rebuilt = []
+        for tag, i1, i2, j1, j2 in opcodes(a, b):
+            if tag == "equal":
+                assert a[i1:i2] == b[j1:j2]
+            rebuilt.append(b[j1:j2])
+
+        assert "".join(rebuilt) == b
+
+    def test_shortest_edit(self):
+        # the classic example from Myers' paper: an edit distance of 5 leaves 4 elements matched
+        assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes("abcabba", "cbabac") if tag == "equal") == 4
+
+    def test_deadline(self):
+        with pytest.raises(DiffBudgetExceeded):
+            opcodes("ab" * 100, "ba" * 100, deadline=10, clock=mock.Mock(side_effect=[0, 0, 10]))
+
+
+class TestCachedServiceDiffTables:
+    @pytest.fixture(autouse=True)
+    def app_context(self):
+        flask_app = Flask(__name__)
+        flask_app.config["DM_SERVICE_DIFF_ENGINE"] = "words"
+        flask_app.config["DM_SERVICE_DIFF_TIME_BUDGET"] = 0.5
+        self.cache = flask_app.extensions["service_diffs_cache"] = TTLCache("service_diffs", 600)
+        with flask_app.app_context():
+            yield
+
+    @pytest.fixture(autouse=True)
+    def diff_tables_iter(self):
+        with mock.patch(
+            "app.main.helpers.diff_tools.html_diff_tables_from_sections_iter",
+            side_effect=lambda **kwargs: iter((
+                ("section", "serviceName", f"<table>{kwargs['revision_2']['serviceName']}"),
+            )),
+        ) as diff_tables_iter:
+            yield diff_tables_iter
+
+    def diff_tables(self, service, archived_service_id=1, content_version="v1"):
+        return cached_service_diff_tables(
+            service,
+            archived_service_id,
+            {"id": 123, "serviceName": "Old"},
+            mock.sentinel.sections,
+            mock.Mock(content_version=content_version),
+            table_preamble_template="diff_table/_table_preamble.html",
+        )
+
+    def test_tables_reused(self, diff_tables_iter):
+        service = {"id": 123, "serviceName": "New"}
+
+        assert self.diff_tables(service) == (("serviceName", "<table>New"),)
+        assert self.diff_tables(dict(service)) == (("serviceName", "<table>New"),)
+        assert diff_tables_iter.call_args_list == [mock.call(
+            sections=mock.sentinel.sections,
+            revision_1={"id": 123, "serviceName": "Old"},
+            revision_2=service,
+            table_preamble_template="diff_table/_table_preamble.html",
+            diff_engine=word_diff_line_pairs,
+            time_budget=0.5,
+            executor=None,
+        )]
+
+    @pytest.mark.parametrize("changed_kwargs", (
+        {"service": {"id": 123, "serviceName": "Newer"}},
+        {"archived_service_id": 2},
+        {"content_version": "v2"},
+    ))
+    def test_tables_recomputed_when_inputs_change(self, diff_tables_iter, changed_kwargs):
+        self.diff_tables({"id": 123, "serviceName": "New"})
+        self.diff_tables(**{"service": {"id": 123, "serviceName": "New"}, **changed_kwargs})
+
+        assert diff_tables_iter.call_count == 2
+
+    def test_forget_service_diff_tables(self, diff_tables_iter):
+        self.diff_tables({"id": 123, "serviceName": "New"})
+        self.diff_tables({"id": 456, "serviceName": "Other"})
+
+        forget_service_diff_tables("123")
+        self.diff_tables({"id": 123, "serviceName": "New"})
+        self.diff_tables({"id": 456, "serviceName": "Other"})
+
+        assert diff_tables_iter.call_count == 3
+
+    def test_section_tables_cached_separately(self, diff_tables_iter):
+        sections = (mock.Mock(slug="about"), mock.Mock(slug="pricing"))
+
+        for section_slug in (None, "pricing", "pricing"):
+            cached_service_diff_tables(
+                {"id": 123, "serviceName": "New"}, 1, {}, sections, mock.Mock(content_version="v1"),
+                section_slug=section_slug,
+            )
+
+        assert [call[1]["sections"] for call in diff_tables_iter.call_args_list] == [sections, [sections[1]]]
+
+    def test_zero_ttl_skips_cache(self, diff_tables_iter):
+        self.cache.ttl = 0
+        content_loader = mock.Mock(spec=[])
+
+        for _ in range(2):
+            cached_service_diff_tables({"id": 123, "serviceName": "New"}, 1, {}, (), content_loader)
+
+        assert diff_tables_iter.call_count == 2
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+
+import mock
+
+from app import _register_framework_manifests
+from app.framework_registry import FrameworkRegistry
+from app.manifests import SharedContentLoader
+
+
+class TestFrameworkRegistry:
+    def setup_method(self, method):
+        self.data_api_client = mock.Mock()
+        self.data_api_client.find_frameworks.return_value = {"frameworks": [
+            {"slug": "g-cloud-12", "status": "live"},
+            {"slug": "g-cloud-13", "status": "open"},
+        ]}
+
+    def _write_snapshot(self, snapshot_path, frameworks):
+        with open(snapshot_path, "w") as f:
+            json.dump({"frameworks": frameworks}, f)
+
+    def test_bootstrap_without_snapshot_fetches_from_api(self):
+        registry = FrameworkRegistry(self.data_api_client)
+
+        assert [fw["slug"] for fw in registry.bootstrap()] == ["g-cloud-12", "g-cloud-13"]
+        assert self.data_api_client.find_frameworks.called
+        assert registry.bootstrapped_from_snapshot is False
+
+    def test_bootstrap_persists_fetched_frameworks(self, tmpdir):
+        snapshot_path = str(tmpdir.join("frameworks.json"))
+        FrameworkRegistry(self.data_api_client, snapshot_path=snapshot_path).bootstrap()
+
+        with open(snapshot_path) as f:
+            assert [fw["slug"] for fw in json.load(f)["frameworks"]] == ["g-cloud-12", "g-cloud-13"]
+
+    def test_bootstrap_from_snapshot_does_not_call_api(self, tmpdir):
+        snapshot_path = str(tmpdir.join("frameworks.json"))
+        self._write_snapshot(snapshot_path, [{"slug": "g-cloud-12", "status": "live"}])
+        registry = FrameworkRegistry(self.data_api_client, snapshot_path=snapshot_path)
+
+        assert [fw["slug"] for fw in registry.bootstrap()] == ["g-cloud-12"]
+        assert not self.data_api_client.find_frameworks.called
+        assert registry.bootstrapped_from_snapshot is True
+
+    def test_bootstrap_ignores_unreadable_snapshot(self, tmpdir):
+        snapshot_path = tmpdir.join("frameworks.json")
+        snapshot_path.write("{not json")
+        registry = FrameworkRegistry(self.data_api_client, snapshot_path=str(snapshot_path))
+
+        assert [fw["slug"] for fw in registry.bootstrap()] == ["g-cloud-12", "g-cloud-13"]
+        assert registry.bootstrapped_from_snapshot is False
+
+    def test_refresh_notifies_subscribers_of_new_frameworks(self, tmpdir):
+        snapshot_path = str(tmpdir.join("frameworks.json"))
+        self._write_snapshot(snapshot_path, [{"slug": "g-cloud-12", "status": "live"}])
+        registry = FrameworkRegistry(self.data_api_client, snapshot_path=snapshot_path)
+        registry.bootstrap()
+        subscriber = mock.Mock()
+        registry.subscribe(subscriber)
+
+        assert registry.refresh() == ({"slug": "g-cloud-13", "status": "open"},)
+
+        assert subscriber.call_args_list == [mock.call(({"slug": "g-cloud-13", "status": "open"},))]
+        assert [fw["slug"] for fw in registry.frameworks] == ["g-cloud-12", "g-cloud-13"]
+
+        # nothing new the second time round
+        registry.refresh()
+        assert subscriber.call_count == 1
+
+    def test_background_refresh_failure_keeps_persisted_list(self, tmpdir):
+        snapshot_path = str(tmpdir.join("frameworks.json"))
+        self._write_snapshot(snapshot_path, [{"slug": "g-cloud-12", "status": "live"}])
+        self.data_api_client.find_frameworks.side_effect = Exception("API unavailable")
+        logger = mock.Mock()
+        registry = FrameworkRegistry(self.data_api_client, snapshot_path=snapshot_path, logger=logger)
+        registry.bootstrap()
+
+        registry.start_background_refresh().join()
+
+        assert logger.exception.called
+        assert [fw["slug"] for fw in registry.frameworks] == ["g-cloud-12"]
+
+    def test_generation_only_bumped_when_frameworks_change(self):
+        registry = FrameworkRegistry(self.data_api_client)
+        registry.bootstrap()
+        assert registry.generation == 1
+
+        registry.refresh()
+        assert registry.generation == 1
+
+        self.data_api_client.find_frameworks.return_value = {"frameworks": [
+            {"slug": "g-cloud-12", "status": "live"},
+            {"slug": "g-cloud-13", "status": "pending"},
+        ]}
+        registry.refresh()
+        assert registry.generation == 2
+
+    def test_notify_without_poller_refreshes_immediately(self):
+        registry = FrameworkRegistry(self.data_api_client)
+        subscriber = mock.Mock()
+        registry.subscribe(subscriber)
+
+        registry.notify()
+
+        assert subscriber.call_args_list == [mock.call((
+            {"slug": "g-cloud-12", "status": "live"},
+            {"slug": "g-cloud-13", "status": "open"},
+        ))]
+
+    def test_notify_wakes_poller(self):
+        registry = FrameworkRegistry(self.data_api_client)
+        refreshed = threading.Event()
+        registry.subscribe(lambda new_frameworks: refreshed.set())
+
+        # with an interval this long the only way to see a refresh is to be woken up
+        registry.start_polling(3600)
+        registry.notify()
+
+        assert refreshed.wait(5)
+        assert registry.generation == 1
+
+    def test_polling_registers_manifests_for_new_frameworks(self):
+        content_loader = SharedContentLoader('app/content')
+        registry = FrameworkRegistry(self.data_api_client)
+        registry.subscribe(lambda new_frameworks: _register_framework_manifests(content_loader, new_frameworks))
+
+        registry.start_polling(3600, refresh_now=True)
+        for _ in range(50):
+            if content_loader.get_registered_manifests("g-cloud-12"):
+                break
+            time.sleep(0.1)
+
+        assert content_loader.get_manifest("g-cloud-12", "edit_service_as_admin").sections
@@ -0,0 +1,206 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import mock
+import pytest
+from dmcontent.errors import ContentNotFoundError
+
+from app import _make_content_loader_factory, _make_primary_content_loader
+from app.manifests import SharedContentLoader
+
+
+class TestSharedContentLoader:
+    def setup_method(self, method):
+        self.content_loader = SharedContentLoader('app/content')
+        self.content_loader.load_manifest('g-cloud-9', 'services', 'edit_service_as_admin')
+
+    def test_load_manifest_only_loads_once(self):
+        assert self.content_loader.has_manifest('g-cloud-9', 'edit_service_as_admin')
+        assert self.content_loader.load_manifest('g-cloud-9', 'services', 'edit_service_as_admin') is None
+
+    def test_get_manifest_unknown_framework(self):
+        with pytest.raises(ContentNotFoundError):
+            self.content_loader.get_manifest('g-cloud-1', 'edit_service_as_admin')
+
+        # a failed lookup shouldn't have left anything behind
+        assert 'g-cloud-1' not in self.content_loader._content
+
+    def test_inplace_filter_does_not_affect_shared_data(self):
+        service_data = {"lot": "cloud-support"}
+        unfiltered_question_ids = [
+            question.id
+            for section in self.content_loader.get_manifest('g-cloud-9', 'edit_service_as_admin').sections
+            for question in section.questions
+        ]
+
+        filtered = self.content_loader.get_manifest('g-cloud-9', 'edit_service_as_admin').filter(
+            service_data,
+            inplace_allowed=True,
+        ).summary(service_data, inplace_allowed=True)
+
+        assert len([q for section in filtered.sections for q in section.questions]) < len(unfiltered_question_ids)
+        assert [
+            question.id
+            for section in self.content_loader.get_manifest('g-cloud-9', 'edit_service_as_admin').sections
+            for question in section.questions
+        ] == unfiltered_question_ids
+
+    def test_shared_data_is_read_only(self):
+        with pytest.raises(TypeError):
+            self.content_loader._content['g-cloud-9']['edit_service_as_admin'] = ()
+
+    def test_registered_manifest_loaded_on_demand(self):
+        self.content_loader.register_manifest('g-cloud-10', 'declaration', 'declaration')
+        assert not self.content_loader.has_manifest('g-cloud-10', 'declaration')
+
+        assert self.content_loader.get_manifest('g-cloud-10', 'declaration').sections
+        assert self.content_loader.has_manifest('g-cloud-10', 'declaration')
+
+    def test_lazy_load_manifests_registers_manifests(self):
+        self.content_loader.lazy_load_manifests('g-cloud-10', {
+            'declaration': 'declaration',
+            'edit_service_as_admin': 'services',
+        })
+        assert self.content_loader.get_registered_manifests('g-cloud-10') == ('declaration', 'edit_service_as_admin')
+        assert not self.content_loader.has_manifest('g-cloud-10', 'declaration')
+
+        assert self.content_loader.get_manifest('g-cloud-10', 'declaration').sections
+        assert self.content_loader.has_manifest('g-cloud-10', 'declaration')
+        # the framework's other manifests are still left until they're asked for
+        assert not self.content_loader.has_manifest('g-cloud-10', 'edit_service_as_admin')
+
+    def test_missing_registered_manifest_only_looked_for_once(self):
+        self.content_loader.register_manifest('g-cloud-4', 'services', 'edit_service_as_admin')
+
+        with mock.patch.object(self.content_loader, 'generate_manifest', wraps=self.content_loader.generate_manifest):
+            for _ in range(2):
+                with pytest.raises(ContentNotFoundError):
+                    self.content_loader.get_manifest('g-cloud-4', 'edit_service_as_admin')
+
+            assert self.content_loader.generate_manifest.call_count == 1
+
+    def test_warm_up(self):
+        for framework_slug in ('g-cloud-4', 'g-cloud-10',):
+            self.content_loader.register_manifest(framework_slug, 'services', 'edit_service_as_admin')
+        on_missing = mock.Mock()
+
+        self.content_loader.warm_up(('g-cloud-10', 'g-cloud-4',), on_missing=on_missing)
+
+        assert self.content_loader.has_manifest('g-cloud-10', 'edit_service_as_admin')
+        assert on_missing.call_args_list == [mock.call('edit_service_as_admin', 'g-cloud-4')]
+
+    def test_content_version_only_worked_out_once(self):
+        with mock.patch('app.manifests.content_fingerprint', return_value='abc123') as content_fingerprint:
+            assert self.content_loader.content_version == 'abc123'
+            assert self.content_loader.content_version == 'abc123'
+
+        content_fingerprint.assert_called_once_with('app/content')
+
+
+class TestManifestSnapshot:
+    def setup_method(self, method):
+        self.content_loader = SharedContentLoader('app/content')
+        self.content_loader.load_manifest('g-cloud-9', 'services', 'edit_service_as_admin')
+
+    def test_snapshot_round_trip(self, tmpdir):
+        snapshot_path = str(tmpdir.join("manifest-snapshot.pickle"))
+        self.content_loader.save_snapshot(snapshot_path)
+
+        new_content_loader = SharedContentLoader('app/content')
+        with mock.patch.object(new_content_loader, 'generate_manifest') as generate_manifest:
+            assert new_content_loader.load_snapshot(snapshot_path) is True
+            manifest = new_content_loader.get_manifest('g-cloud-9', 'edit_service_as_admin')
+
+        assert not generate_manifest.called
+        original_manifest = self.content_loader.get_manifest('g-cloud-9', 'edit_service_as_admin')
+        assert [section.name for section in manifest.sections] == [
+            section.name for section in original_manifest.sections
+        ]
+        assert [question.question for section in manifest.sections for question in section.questions] == [
+            question.question for section in original_manifest.sections for question in section.questions
+        ]
+
+    def test_missing_snapshot(self, tmpdir):
+        assert self.content_loader.load_snapshot(str(tmpdir.join("no-such-snapshot.pickle"))) is False
+
+    @pytest.mark.parametrize("truncate_to", (0, 10, -10))
+    def test_truncated_snapshot(self, tmpdir, truncate_to):
+        snapshot_path = str(tmpdir.join("manifest-snapshot.pickle"))
+        self.content_loader.save_snapshot(snapshot_path)
+        with open(snapshot_path, "rb+") as f:
+            f.truncate(truncate_to if truncate_to >= 0 else os.path.getsize(snapshot_path) + truncate_to)
+
+        new_content_loader = SharedContentLoader('app/content')
+        logger = mock.Mock()
+        assert new_content_loader.load_snapshot(snapshot_path, logger=logger) is False
+
+        assert logger.warning.called
+        assert not new_content_loader.has_manifest('g-cloud-9', 'edit_service_as_admin')
+
+    def test_stale_snapshot(self, tmpdir):
+        snapshot_path = str(tmpdir.join("manifest-snapshot.pickle"))
+        self.content_loader.save_snapshot(snapshot_path)
+
+        new_content_loader = SharedContentLoader('app/content')
+        with mock.patch('app.manifests.content_fingerprint', return_value="something else"):
+            assert new_content_loader.load_snapshot(snapshot_path) is False
+
+        assert not new_content_loader.has_manifest('g-cloud-9', 'edit_service_as_admin')
+
+    def test_primary_content_loader_falls_back_without_snapshot(self, tmpdir):
+        application = mock.Mock(config={
+            'DM_MANIFEST_SNAPSHOT_PATH': str(tmpdir.join("no-such-snapshot.pickle")),
+        })
+
+        content_loader = _make_primary_content_loader(application)
+
+        assert isinstance(content_loader, SharedContentLoader)
+        assert not content_loader._content
+
+
+class TestMakeContentLoaderFactory:
+    frameworks = [
+        {"slug": "g-cloud-6", "status": "expired"},
+        {"slug": "g-cloud-10", "status": "live"},
+        {"slug": "digital-outcomes-and-specialists-4", "status": "coming"},
+        {"slug": "g-cloud-12", "status": "open"},
+    ]
+
+    def test_manifests_registered_but_not_loaded(self):
+        content_loader = SharedContentLoader('app/content')
+        application = mock.Mock(config={'DM_WARM_UP_MANIFESTS': False})
+
+        _make_content_loader_factory(application, self.frameworks, initial_instance=content_loader)
+
+        for framework in self.frameworks:
+            assert content_loader.get_registered_manifests(framework['slug']) == (
+                'edit_service_as_admin', 'declaration',
+            )
+        assert not content_loader._content
+
+    def test_warm_up_thread_started(self):
+        content_loader = SharedContentLoader('app/content')
+        application = mock.Mock(config={'DM_WARM_UP_MANIFESTS': True})
+
+        with mock.patch('app.threading.Thread') as thread:
+            _make_content_loader_factory(application, self.frameworks, initial_instance=content_loader)
+
+        assert thread.call_args[1]['args'] == (
+            application,
+            content_loader,
+            ['g-cloud-10', 'g-cloud-12', 'g-cloud-6', 'digital-outcomes-and-specialists-4'],
+        )
+        assert thread.return_value.start.called
+
+    def test_all_threads_share_one_loader(self):
+        content_loader = SharedContentLoader('app/content')
+        factory = _make_content_loader_factory(
+            mock.Mock(config={'DM_WARM_UP_MANIFESTS': False}),
+            [],
+            initial_instance=content_loader,
+        )
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            loaders = list(executor.map(lambda _: factory(), range(8)))
+
+        assert all(loader is content_loader for loader in loaders)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
 
+from app.caching import TTLCache
 from tests.app.helpers import BaseApplicationTest, LoggedInApplicationTest
 
 
@@ -56,3 +57,22 @@ class TestMetricsPageRegistersPageViews(LoggedInApplicationTest):
 
         assert expected_metric_name in results
         assert metric_value - initial_metric_value == 3
+
+
+class TestMetricsPageRegistersCacheLookups(LoggedInApplicationTest):
+
+    def test_metrics_page_registers_frameworks_cache_hits_and_misses(self):
+        self.app.extensions['frameworks_cache'] = TTLCache('frameworks', 60)
+        hit_metric_name = b'admin_frontend_cache_lookups_total{cache="frameworks",result="hit"}'
+        miss_metric_name = b'admin_frontend_cache_lookups_total{cache="frameworks",result="miss"}'
+
+        initial_results = load_prometheus_metrics(self.client.get('/admin/_metrics').data)
+
+        for _ in range(3):
+            res = self.client.get('/admin')
+            assert res.status_code == 200
+
+        results = load_prometheus_metrics(self.client.get('/admin/_metrics').data)
+
+        assert int(results[miss_metric_name]) - int(initial_results.get(miss_metric_name, 0)) == 1
+        assert int(results[hit_metric_name]) - int(initial_results.get(hit_metric_name, 0)) == 2
@@ -0,0 +1,74 @@
+from concurrent.futures.process import BrokenProcessPool
+
+import mock
+from flask import Flask
+
+from app import process_pool
+from app.process_pool import ProcessPool
+
+
+class TestProcessPool:
+    def setup_method(self, method):
+        self.flask_app = Flask(__name__)
+        self.executor_patch = mock.patch('app.process_pool.ProcessPoolExecutor')
+        self.ProcessPoolExecutor = self.executor_patch.start()
+        self.ProcessPoolExecutor.side_effect = lambda *args, **kwargs: mock.Mock(
+            map=mock.Mock(side_effect=lambda fn, *iterables: map(fn, *iterables)),
+        )
+
+    def teardown_method(self, method):
+        self.executor_patch.stop()
+
+    def test_started_when_first_needed_and_reused(self):
+        pool = ProcessPool(2)
+        assert self.ProcessPoolExecutor.called is False
+
+        assert pool.map(abs, [-1, 2, -3]) == [1, 2, 3]
+        assert pool.map(pow, (2, 3), (3, 2)) == [8, 9]
+
+        assert self.ProcessPoolExecutor.call_count == 1
+        assert self.ProcessPoolExecutor.call_args[1]["max_workers"] == 2
+        assert self.ProcessPoolExecutor.call_args[1]["mp_context"].get_start_method() == "spawn"
+
+    def test_restarted_in_forked_process(self):
+        pool = ProcessPool(2)
+        pool.map(abs, [-1])
+
+        with mock.patch("app.process_pool.os.getpid", return_value=-1):
+            pool.map(abs, [-1])
+
+        assert self.ProcessPoolExecutor.call_count == 2
+
+    def test_broken_pool_replaced(self):
+        broken_executor = mock.Mock(map=mock.Mock(side_effect=BrokenProcessPool))
+        working_executor = mock.Mock(map=mock.Mock(side_effect=map))
+        self.ProcessPoolExecutor.side_effect = [broken_executor, working_executor]
+        pool = ProcessPool(2)
+
+        with self.flask_app.app_context():
+            # made here instead
+            assert pool.map(abs, (x for x in [-1, -2])) == [1, 2]
+        broken_executor.shutdown.assert_called_once_with(wait=False)
+
+        assert pool.map(abs, [-3]) == [3]
+        assert working_executor.map.call_count == 1
+
+    def test_init_app(self):
+        self.flask_app.config["DM_PROCESS_POOL_MAX_WORKERS"] = 3
+        process_pool.init_app(self.flask_app)
+
+        with self.flask_app.app_context():
+            assert process_pool.process_pool().max_workers == 3
+
+    def test_init_app_disabled(self):
+        self.flask_app.config["DM_PROCESS_POOL_MAX_WORKERS"] = 0
+        process_pool.init_app(self.flask_app)
+
+        with self.flask_app.app_context():
+            assert process_pool.process_pool() is None
+
+
+def test_process_pool_round_trip():
+    pool = ProcessPool(2)
+
+    assert pool.map(abs, [-1, 2, -3]) == [1, 2, 3]
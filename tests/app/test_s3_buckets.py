@@ -0,0 +1,93 @@
+import threading
+
+import mock
+from flask import Flask
+
+from app import s3_buckets
+from app.s3_buckets import S3Buckets, s3_bucket
+
+
+class TestS3Buckets:
+    def setup_method(self, method):
+        self.s3_patch = mock.patch('app.s3_buckets.s3')
+        self.s3 = self.s3_patch.start()
+        self.s3.S3.side_effect = lambda *args, **kwargs: mock.Mock()
+
+    def teardown_method(self, method):
+        self.s3_patch.stop()
+
+    def test_bucket_built_once_and_reused(self):
+        buckets = S3Buckets(endpoint_url="http://localhost:4566")
+
+        bucket = buckets.get("agreements")
+
+        assert buckets.get("agreements") is bucket
+        assert self.s3.S3.call_args_list == [mock.call("agreements", endpoint_url="http://localhost:4566")]
+
+    def test_one_instance_per_bucket(self):
+        buckets = S3Buckets()
+
+        assert buckets.get("agreements") is not buckets.get("reports")
+        assert self.s3.S3.call_args_list == [
+            mock.call("agreements", endpoint_url=None),
+            mock.call("reports", endpoint_url=None),
+        ]
+
+    def test_pool_size_passed_to_boto(self):
+        S3Buckets(max_pool_connections=25).get("agreements")
+
+        assert self.s3.S3.call_args[1]["config"].max_pool_connections == 25
+
+    def test_one_instance_per_thread(self):
+        buckets = S3Buckets()
+        barrier = threading.Barrier(8, timeout=5)
+        results = {}
+
+        def get_bucket(index):
+            barrier.wait()
+            results[index] = (buckets.get("agreements"), buckets.get("agreements"))
+
+        threads = [threading.Thread(target=get_bucket, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # each thread reuses its own, boto3 resources not being safe to share
+        assert all(first is second for first, second in results.values())
+        assert len({id(first) for first, _ in results.values()}) == 8
+        assert self.s3.S3.call_count == 8
+
+    def test_botocore_config_shared_between_threads(self):
+        buckets = S3Buckets(max_pool_connections=4)
+        buckets.get("agreements")
+        thread = threading.Thread(target=buckets.get, args=("agreements",))
+        thread.start()
+        thread.join()
+
+        first_call, second_call = self.s3.S3.call_args_list
+        assert first_call[1]["config"] is second_call[1]["config"]
+
+    def test_rebuilt_in_forked_process(self):
+        buckets = S3Buckets()
+        bucket = buckets.get("agreements")
+
+        with mock.patch("app.s3_buckets.os.getpid", return_value=-1):
+            assert buckets.get("agreements") is not bucket
+
+        assert self.s3.S3.call_count == 2
+
+    def test_s3_bucket_uses_app_registry(self):
+        flask_app = Flask(__name__)
+        flask_app.config["DM_S3_ENDPOINT_URL"] = "http://localhost:4566"
+        flask_app.config["DM_S3_MAX_POOL_CONNECTIONS"] = 4
+        s3_buckets.init_app(flask_app)
+
+        with flask_app.app_context():
+            bucket = s3_bucket("reports")
+        with flask_app.app_context():
+            assert s3_bucket("reports") is bucket
+
+        assert self.s3.S3.call_args_list == [
+            mock.call("reports", endpoint_url="http://localhost:4566", config=mock.ANY),
+        ]